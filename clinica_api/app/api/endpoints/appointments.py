@@ -1,36 +1,192 @@
+import hashlib
 import uuid
-from typing import List, Optional
+from datetime import date as Date
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import delete, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, func, select
 
 from app.core.database import get_session
-from app.models.appointment_model import Appointment
-from app.schemas.appointment import (AppointmentCreate, AppointmentRead,
-                                     AppointmentUpdate)
+from app.core.security import get_current_user
+from app.models.appointment_model import (INACTIVE_STATUSES, Appointment,
+                                          AppointmentStatus)
+from app.models.patient_model import Patient
+from app.models.user_model import User
+from app.models.volunteer_model import Volunteer
+from app.schemas.appointment import (AppointmentCalendar, AppointmentCreate,
+                                     AppointmentRead, AppointmentSeriesCreate,
+                                     AppointmentSeriesRead,
+                                     AppointmentSeriesUpdate, AppointmentUpdate,
+                                     BulkStatusResult, BulkStatusUpdate,
+                                     CalendarAppointment, CalendarDay,
+                                     CalendarVolunteer)
+from app.services.appointment_service import (apply_appointment_changes,
+                                              book_series, bulk_transition,
+                                              expand_recurrence,
+                                              insert_appointment,
+                                              reschedule_series)
+from app.services.audit_service import create_audit_log
+from app.utils.dates import day_range, slot_end
+from app.utils.pagination import decode_cursor, encode_cursor
 
 router = APIRouter()
 
 
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+SLOT_CONFLICT = "Horário indisponível. Já existe um agendamento."
+# Occurrences a series edit/cancel may still touch (not started yet)
+OPEN_STATUSES = (
+    AppointmentStatus.SCHEDULED,
+    AppointmentStatus.CONFIRMED,
+    AppointmentStatus.NOT_STARTED,
+)
+
+
 @router.get("", response_model=List[AppointmentRead])
 def read_appointments(
+    response: Response,
     volunteer_id: Optional[str] = None,
     patient_id: Optional[str] = None,
     date: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias="from", pattern=DATE_PATTERN),
+    date_to: Optional[str] = Query(None, alias="to", pattern=DATE_PATTERN),
+    status: Optional[List[str]] = Query(None),
+    limit: int = Query(500, ge=1, le=2000),
+    cursor: Optional[str] = None,
+    with_total: bool = False,
     session: Session = Depends(get_session),
 ):
-    query = select(Appointment)
+    """
+    Agenda ordered by (date, time, id) with keyset pagination. When more
+    rows exist, `X-Next-Cursor` carries the token for the next page;
+    `with_total=true` adds `X-Total-Count` (one extra COUNT query).
+    """
+    filters = []
     if volunteer_id:
-        query = query.where(Appointment.volunteer_id == volunteer_id)
+        filters.append(Appointment.volunteer_id == volunteer_id)
     if patient_id:
-        query = query.where(Appointment.patient_id == patient_id)
+        filters.append(Appointment.patient_id == patient_id)
     if date:
-        query = query.where(Appointment.date == date)
+        filters.append(Appointment.date == date)
+    # date is "YYYY-MM-DD" text: range bounds compare as strings
+    if date_from:
+        filters.append(Appointment.date >= date_from)
+    if date_to:
+        filters.append(Appointment.date <= date_to)
+    if status:
+        filters.append(Appointment.status.in_(status))
+
+    after = decode_cursor(cursor, str, str, str)
+    query = select(Appointment).where(*filters)
+    if after:
+        query = query.where(
+            tuple_(Appointment.date, Appointment.time, Appointment.id) > tuple_(*after)
+        )
+    query = query.order_by(Appointment.date, Appointment.time, Appointment.id)
+
+    appointments = session.exec(query.limit(limit)).all()
+
+    if len(appointments) == limit:
+        last = appointments[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.date, last.time, last.id)
+    if with_total:
+        total = session.exec(
+            select(func.count()).select_from(Appointment).where(*filters)
+        ).one()
+        response.headers["X-Total-Count"] = str(total)
 
-    appointments = session.exec(query).all()
     return appointments
 
 
+MAX_CALENDAR_DAYS = 62
+
+
+@router.get("/calendar", response_model=AppointmentCalendar)
+def read_calendar(
+    request: Request,
+    start: Date = Query(..., alias="from"),
+    end: Date = Query(..., alias="to"),
+    volunteer_id: Optional[str] = None,
+    session: Session = Depends(get_session),
+):
+    """
+    Appointments of [from, to] grouped per day and per volunteer, with
+    patient name, volunteer name and specialty joined in one query. The
+    ETag is a hash of the payload: an unchanged week answers 304.
+    """
+    if end < start:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (end - start).days >= MAX_CALENDAR_DAYS:
+        raise HTTPException(
+            status_code=400, detail=f"Range limited to {MAX_CALENDAR_DAYS} days"
+        )
+
+    first, last = day_range(start, end)
+    query = (
+        select(
+            Appointment.id,
+            Appointment.date,
+            Appointment.time,
+            Appointment.duration,
+            Appointment.status,
+            Appointment.patient_id,
+            Appointment.payment_status,
+            Appointment.series_id,
+            Appointment.volunteer_id,
+            Patient.name.label("patient_name"),
+            Volunteer.name.label("volunteer_name"),
+            Volunteer.specialty,
+        )
+        .outerjoin(Patient, Patient.id == Appointment.patient_id)
+        .outerjoin(Volunteer, Volunteer.id == Appointment.volunteer_id)
+        .where(Appointment.starts_at >= first, Appointment.starts_at < last)
+        .order_by(Appointment.starts_at, Volunteer.name, Appointment.id)
+    )
+    if volunteer_id:
+        query = query.where(Appointment.volunteer_id == volunteer_id)
+
+    days: Dict[str, Dict[Optional[str], CalendarVolunteer]] = {}
+    for row in session.exec(query).all():
+        volunteers = days.setdefault(row.date, {})
+        if row.volunteer_id not in volunteers:
+            volunteers[row.volunteer_id] = CalendarVolunteer(
+                volunteer_id=row.volunteer_id,
+                volunteer_name=row.volunteer_name,
+                specialty=row.specialty,
+                appointments=[],
+            )
+        volunteers[row.volunteer_id].appointments.append(
+            CalendarAppointment(
+                id=row.id,
+                time=row.time,
+                end_time=slot_end(row.time, row.duration or 60),
+                status=row.status,
+                patient_id=row.patient_id,
+                patient_name=row.patient_name,
+                payment_status=row.payment_status,
+                series_id=row.series_id,
+            )
+        )
+
+    calendar = AppointmentCalendar(
+        start=start,
+        end=end,
+        days=[
+            CalendarDay(date=day, volunteers=list(volunteers.values()))
+            for day, volunteers in days.items()
+        ],
+    )
+    # Compact: nulls are dropped from the payload
+    body = calendar.model_dump_json(exclude_none=True).encode()
+    etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.get("/{appointment_id}", response_model=AppointmentRead)
 def read_appointment(appointment_id: str, session: Session = Depends(get_session)):
     appointment = session.get(Appointment, appointment_id)
@@ -39,33 +195,36 @@ def read_appointment(appointment_id: str, session: Session = Depends(get_session
     return appointment
 
 
+def _default_duration(session: Session, volunteer_id: Optional[str]) -> int:
+    volunteer = session.get(Volunteer, volunteer_id) if volunteer_id else None
+    return (volunteer and volunteer.appointment_duration) or 60
+
+
 @router.post("", response_model=AppointmentRead)
 def create_appointment(
     appointment_in: AppointmentCreate, session: Session = Depends(get_session)
 ):
-    # Check availability (Conflict Detection) only if volunteer is assigned
-    if appointment_in.volunteer_id:
-        # Ensure no other appointment exists for this volunteer at this date/time with status 'scheduled'
-        query = select(Appointment).where(
-            Appointment.volunteer_id == appointment_in.volunteer_id,
-            Appointment.date == appointment_in.date,
-            Appointment.time == appointment_in.time,
-            Appointment.status == "scheduled",
-        )
-        existing = session.exec(query).first()
-        if existing:
-            raise HTTPException(
-                status_code=409,
-                detail="Horário indisponível. Já existe um agendamento.",
-            )
-
-    db_appointment = Appointment.model_validate(appointment_in.model_dump())
+    db_appointment = Appointment.model_validate(
+        appointment_in.model_dump(exclude={"duration"})
+    )
     db_appointment.id = str(uuid.uuid4())
+    db_appointment.duration = appointment_in.duration or _default_duration(
+        session, db_appointment.volunteer_id
+    )
+
+    # Conflict check and insert in one statement (no check-then-insert race)
+    values = {c.name: getattr(db_appointment, c.name) for c in Appointment.__table__.c}
+    try:
+        booked = insert_appointment(session, values)
+    except IntegrityError:
+        # A concurrent booking won the slot (unique / exclusion constraint)
+        booked = False
+    if not booked:
+        session.rollback()
+        raise HTTPException(status_code=409, detail=SLOT_CONFLICT)
 
-    session.add(db_appointment)
     session.commit()
-    session.refresh(db_appointment)
-    return db_appointment
+    return session.get(Appointment, values["id"])
 
 
 @router.put("/{appointment_id}", response_model=AppointmentRead)
@@ -79,10 +238,14 @@ def update_appointment(
         raise HTTPException(status_code=404, detail="Appointment not found")
 
     data = appointment_in.model_dump(exclude_unset=True)
-    for key, value in data.items():
-        setattr(db_appointment, key, value)
+    try:
+        updated = apply_appointment_changes(session, db_appointment, data)
+    except IntegrityError:
+        updated = False
+    if not updated:
+        session.rollback()
+        raise HTTPException(status_code=409, detail=SLOT_CONFLICT)
 
-    session.add(db_appointment)
     session.commit()
     session.refresh(db_appointment)
     return db_appointment
@@ -95,16 +258,223 @@ def delete_appointment(appointment_id: str, session: Session = Depends(get_sessi
         raise HTTPException(status_code=404, detail="Appointment not found")
 
     # Delete linked transactions first to avoid FK constraint error
-    from app.models.transaction_model import Transaction
+    from app.models.transaction_model import Transaction, TransactionArchive
+    from app.services.financial_service import record_transactions
 
-    transactions = session.exec(
-        select(Transaction).where(Transaction.appointment_id == appointment_id)
+    archived = session.exec(
+        select(TransactionArchive.id).where(
+            TransactionArchive.appointment_id == appointment_id
+        )
+    ).first()
+    if archived:
+        raise HTTPException(
+            status_code=409,
+            detail="Appointment has transactions in a closed financial period",
+        )
+
+    # One DELETE for all linked transactions; RETURNING feeds the rollup
+    removed = session.execute(
+        delete(Transaction)
+        .where(Transaction.appointment_id == appointment_id)
+        .returning(
+            Transaction.date,
+            Transaction.type,
+            Transaction.payment_method,
+            Transaction.amount,
+        )
     ).all()
-    for t in transactions:
-        session.delete(t)
+    record_transactions(session, removed, -1)
 
-    session.flush()  # Ensure transactions are deleted before the appointment
+    # Queued reminders reference the appointment too
+    from app.models.reminder_model import ReminderOutbox
+
+    session.execute(
+        delete(ReminderOutbox).where(ReminderOutbox.appointment_id == appointment_id)
+    )
 
     session.delete(db_appointment)
     session.commit()
     return
+
+
+def _series_conflict(dates: List[str]) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"Horários indisponíveis em: {', '.join(dates)}",
+    )
+
+
+def _open_occurrences(
+    session: Session, series_id: str, from_date: Optional[Date]
+) -> List[Appointment]:
+    query = select(Appointment).where(
+        Appointment.series_id == series_id,
+        Appointment.status.in_(OPEN_STATUSES),
+    )
+    if from_date:
+        query = query.where(Appointment.date >= from_date.isoformat())
+    appointments = session.exec(query.order_by(Appointment.date)).all()
+    if not appointments:
+        raise HTTPException(status_code=404, detail="Series not found")
+    return list(appointments)
+
+
+def _series_read(session: Session, series_id: str, ids: List[str], skipped=()):
+    appointments = session.exec(
+        select(Appointment)
+        .where(Appointment.id.in_(ids))
+        .order_by(Appointment.date, Appointment.time)
+    ).all()
+    return AppointmentSeriesRead(
+        series_id=series_id, appointments=appointments, skipped=list(skipped)
+    )
+
+
+@router.post("/series", response_model=AppointmentSeriesRead)
+def create_appointment_series(
+    series_in: AppointmentSeriesCreate, session: Session = Depends(get_session)
+):
+    """
+    Books every occurrence of a recurrence rule at once: one conflict query
+    for the whole range and one batched insert. With skip_conflicts the
+    free occurrences are booked and the others reported in `skipped`.
+    """
+    try:
+        dates = expand_recurrence(series_in.start_date, series_in.rule)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    series_id = str(uuid.uuid4())
+    duration = series_in.duration or _default_duration(session, series_in.volunteer_id)
+    fields = series_in.model_dump(
+        exclude={"start_date", "rule", "skip_conflicts", "duration"}
+    )
+    rows = []
+    for day in dates:
+        occurrence = Appointment.model_validate({**fields, "date": day.isoformat()})
+        occurrence.id = str(uuid.uuid4())
+        occurrence.duration = duration
+        occurrence.series_id = series_id
+        rows.append(
+            {c.name: getattr(occurrence, c.name) for c in Appointment.__table__.c}
+        )
+
+    try:
+        booked, skipped = book_series(session, rows, series_in.skip_conflicts)
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(status_code=409, detail=SLOT_CONFLICT)
+    if not booked:
+        session.rollback()
+        raise _series_conflict(skipped)
+
+    session.commit()
+    return _series_read(session, series_id, [row["id"] for row in booked], skipped)
+
+
+@router.get("/series/{series_id}", response_model=AppointmentSeriesRead)
+def read_appointment_series(series_id: str, session: Session = Depends(get_session)):
+    ids = session.exec(
+        select(Appointment.id).where(Appointment.series_id == series_id)
+    ).all()
+    if not ids:
+        raise HTTPException(status_code=404, detail="Series not found")
+    return _series_read(session, series_id, list(ids))
+
+
+@router.put("/series/{series_id}", response_model=AppointmentSeriesRead)
+def update_appointment_series(
+    series_id: str,
+    series_in: AppointmentSeriesUpdate,
+    from_date: Optional[Date] = None,
+    session: Session = Depends(get_session),
+):
+    """Edits every occurrence not started yet (from `from_date` on, if given)."""
+    appointments = _open_occurrences(session, series_id, from_date)
+
+    try:
+        conflicts = reschedule_series(
+            session, appointments, series_in.model_dump(exclude_none=True)
+        )
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(status_code=409, detail=SLOT_CONFLICT)
+    if conflicts:
+        session.rollback()
+        raise _series_conflict(conflicts)
+
+    session.commit()
+    return _series_read(session, series_id, [a.id for a in appointments])
+
+
+@router.post("/series/{series_id}/cancel", response_model=AppointmentSeriesRead)
+def cancel_appointment_series(
+    series_id: str,
+    from_date: Optional[Date] = None,
+    session: Session = Depends(get_session),
+):
+    """Cancels every occurrence not started yet (from `from_date` on, if given)."""
+    appointments = _open_occurrences(session, series_id, from_date)
+    ids = [a.id for a in appointments]
+    session.execute(
+        update(Appointment)
+        .where(Appointment.id.in_(ids))
+        .values(status=AppointmentStatus.CANCELLED),
+        execution_options={"synchronize_session": False},
+    )
+    session.commit()
+    return _series_read(session, series_id, ids)
+
+
+@router.post("/bulk-status", response_model=BulkStatusResult)
+def bulk_update_status(
+    payload: BulkStatusUpdate,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Moves every matching appointment (ids, and/or volunteer, and/or date) to
+    one status in a single UPDATE, e.g. cancelling a volunteer's day. Only
+    appointments not started yet are touched, so no slot is reactivated;
+    those with payments are skipped unless `include_paid`. One audit entry
+    summarizes the batch.
+    """
+    if payload.status not in OPEN_STATUSES + INACTIVE_STATUSES:
+        raise HTTPException(status_code=400, detail="Status inválido para lote")
+    if not set(payload.from_statuses) <= set(OPEN_STATUSES):
+        raise HTTPException(
+            status_code=400,
+            detail="Só agendamentos não iniciados podem mudar em lote",
+        )
+
+    updated, skipped = bulk_transition(
+        session,
+        payload.status,
+        payload.from_statuses,
+        ids=payload.ids,
+        volunteer_id=payload.volunteer_id,
+        day=payload.date,
+        include_paid=payload.include_paid,
+    )
+    updated_ids = [row.id for row in updated]
+    create_audit_log(
+        session,
+        current_user,
+        "BULK_STATUS",
+        "Appointment",
+        details={
+            "new_status": payload.status,
+            "count": len(updated_ids),
+            "ids": updated_ids,
+            "skipped_paid": skipped,
+            "filters": payload.model_dump(
+                include={"ids", "volunteer_id", "date", "from_statuses"},
+                exclude_none=True,
+            ),
+            "reason": payload.reason,
+        },
+    )
+    session.commit()
+    return BulkStatusResult(
+        status=payload.status, updated_ids=updated_ids, skipped_paid_ids=skipped
+    )
@@ -1,43 +1,244 @@
-from typing import List, Optional
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Iterable, Iterator, List, Optional
 
-from fastapi import APIRouter, Depends, Query
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, func, select
 
 from app.core.database import get_session
 from app.core.security import get_current_user
-from app.models.audit_model import AuditLog
+from app.models.audit_model import AuditLog, AuditRollupDaily, AuditRollupHourly
 from app.models.user_model import User
+from app.schemas.audit import AuditActivityStat, AuditLogRead
+from app.services.audit_archive_service import AuditArchiveService
+from app.services.audit_service import create_audit_log
+from app.utils.dates import day_range
+from app.utils.pagination import decode_cursor, encode_cursor
 
 router = APIRouter()
 
+EXPORT_FIELDS = list(AuditLog.model_fields)
+EXPORT_BATCH = 500
+STATS_GROUPS = ("bucket", "user_id", "resource", "action")
 
-@router.get("/", response_model=List[AuditLog])
+
+@router.get("/", response_model=List[AuditLogRead])
 def get_audit_logs(
+    response: Response,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
-    limit: int = 100,
-    offset: int = 0,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     user_id: Optional[str] = None,
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
+    resource: Optional[str] = None,
+    resource_id: Optional[str] = None,
+    action: Optional[str] = None,
+    status: Optional[int] = None,
+    changed: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
 ):
-    query = select(AuditLog).order_by(AuditLog.timestamp.desc())
-
-    if user_id:
-        query = query.where(AuditLog.user_id == user_id)
+    """
+    Newest-first audit trail with keyset pagination on (timestamp, id).
+    When more rows exist, the `X-Next-Cursor` header carries the token for
+    the next page (pass it back as `cursor`).
 
-    if start_date:
-        query = query.where(AuditLog.timestamp >= start_date)
+    `status` and `changed` filter on the structured details, e.g.
+    `?action=UPDATE&changed=cpf` for updates that touched the CPF.
+    """
+    before = decode_cursor(cursor, str, int)
+    if before:
+        try:
+            before = (datetime.fromisoformat(before[0]), before[1])
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
 
-    if end_date:
-        # Append time to cover the whole day if only date is provided
-        if len(end_date) == 10:  # YYYY-MM-DD
-            end_date = f"{end_date} 23:59:59"
-        query = query.where(AuditLog.timestamp <= end_date)
+    start, end = day_range(start_date, end_date)
 
-    query = query.offset(offset).limit(limit)
-    results = session.exec(query).all()
-    print(
-        f"DEBUG AUDIT: user_id={user_id}, start={start_date}, end={end_date}, found={len(results)}"
+    # Reads live rows, monthly tables and compressed archives together
+    results = AuditArchiveService.query_logs(
+        session,
+        limit=limit,
+        before=before,
+        user_id=user_id,
+        resource=resource,
+        resource_id=resource_id,
+        action=action,
+        status=status,
+        changed=changed,
+        start=start,
+        end=end,
     )
+
+    if len(results) == limit:
+        last = results[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.timestamp, last.id)
+
     return results
+
+
+def _csv_lines(logs: Iterable[AuditLog]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for log in logs:
+        row = log.model_dump(mode="json")
+        writer.writerow(
+            [
+                json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+                for v in (row.get(f) for f in EXPORT_FIELDS)
+            ]
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+
+def _ndjson_lines(logs: Iterable[AuditLog]) -> Iterator[str]:
+    for log in logs:
+        yield json.dumps(log.model_dump(mode="json"), ensure_ascii=False) + "\n"
+
+
+def _batched(lines: Iterable[str]) -> Iterator[bytes]:
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= EXPORT_BATCH:
+            yield "".join(batch).encode("utf-8")
+            batch = []
+    if batch:
+        yield "".join(batch).encode("utf-8")
+
+
+def _gzipped(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@router.get("/export")
+def export_audit_logs(
+    request: Request,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    user_id: Optional[str] = None,
+    resource: Optional[str] = None,
+    resource_id: Optional[str] = None,
+    action: Optional[str] = None,
+    status: Optional[int] = None,
+    changed: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+):
+    """
+    Complete, oldest-first access log for compliance requests (period,
+    user or a single record). Streams CSV or NDJSON straight from a
+    server-side cursor and the archives; gzip when the client accepts it.
+    """
+    start, end = day_range(start_date, end_date)
+    filters = {
+        "user_id": user_id,
+        "resource": resource,
+        "resource_id": resource_id,
+        "action": action,
+        "status": status,
+        "changed": changed,
+        "start": start,
+        "end": end,
+    }
+
+    # Exporting the trail is itself an access worth recording
+    create_audit_log(
+        session,
+        current_user,
+        "EXPORT",
+        "AuditLog",
+        None,
+        {k: str(v) for k, v in filters.items() if v is not None},
+    )
+    session.commit()
+
+    bind = session.get_bind()
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    to_lines = _csv_lines if format == "csv" else _ndjson_lines
+
+    def stream() -> Iterator[bytes]:
+        # Own session: the request-scoped one may close before streaming ends
+        with Session(bind) as export_session:
+            logs = AuditArchiveService.iter_logs(export_session, **filters)
+            chunks = _batched(to_lines(logs))
+            yield from _gzipped(chunks) if use_gzip else chunks
+
+    filename = f"audit_logs_{date.today():%Y%m%d}.{format}"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Vary": "Accept-Encoding",
+    }
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type, headers=headers)
+
+
+@router.get("/stats", response_model=List[AuditActivityStat])
+def get_audit_stats(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    granularity: str = Query("day", pattern="^(hour|day)$"),
+    group_by: List[str] = Query(["user_id", "resource", "action"]),
+    user_id: Optional[str] = None,
+    resource: Optional[str] = None,
+    action: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+):
+    """
+    "Who accessed what, and how often", read only from the hourly/daily
+    rollups (never from audit_logs). `group_by` picks any of bucket,
+    user_id, resource, action.
+    """
+    invalid = set(group_by) - set(STATS_GROUPS)
+    if invalid:
+        raise HTTPException(
+            status_code=422, detail=f"group_by inválido: {', '.join(sorted(invalid))}"
+        )
+
+    model = AuditRollupHourly if granularity == "hour" else AuditRollupDaily
+    columns = [getattr(model, g) for g in STATS_GROUPS if g in group_by]
+    selected = list(columns)
+    if "user_id" in group_by:
+        selected.append(func.max(model.user_name).label("user_name"))
+    total = func.sum(model.count).label("count")
+
+    query = select(*selected, total)
+    if columns:
+        query = query.group_by(*columns)
+
+    start, end = day_range(start_date, end_date)
+    if start:
+        query = query.where(model.bucket >= start)
+    if end:
+        query = query.where(model.bucket < end)
+    if user_id:
+        query = query.where(model.user_id == user_id)
+    if resource:
+        query = query.where(model.resource == resource)
+    if action:
+        query = query.where(model.action == action)
+
+    if "bucket" in group_by:
+        query = query.order_by(model.bucket, total.desc())
+    else:
+        query = query.order_by(total.desc())
+
+    rows = session.connection().execute(query).all()
+    return [AuditActivityStat(**row._mapping) for row in rows if row.count]
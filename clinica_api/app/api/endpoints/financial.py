@@ -1,66 +1,96 @@
+from collections import defaultdict
 from datetime import date, datetime
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import ValidationError
+from sqlalchemy import case
+from sqlalchemy.exc import SQLAlchemyError
 from sqlmodel import Session, func, select
 
 from app.core.database import get_session
+from app.core.security import get_current_user
 from app.models.appointment_model import Appointment
-from app.models.transaction_model import Transaction, TransactionType
-from app.schemas.transaction import (DailyStats, TransactionCreate,
-                                     TransactionResponse, TransactionUpdate)
+from app.models.patient_model import Patient
+from app.models.user_model import Role, User
+from app.models.transaction_model import (FinancialDailyRollup,
+                                          FinancialPeriod, Transaction,
+                                          TransactionArchive, TransactionType)
+from app.schemas.transaction import (AgingBuckets, AgingReport, AgingRow,
+                                     BulkItemResult, BulkTransactionRequest,
+                                     BulkTransactionResponse, CashFlowSeries,
+                                     DailyStats, LedgerEntry, PatientLedger,
+                                     TransactionCreate, TransactionResponse,
+                                     TransactionUpdate)
+from app.services.audit_service import create_audit_log
+from app.services.financial_service import (TRANSACTION_MODELS, apply_payment,
+                                            cash_flow_series, close_period,
+                                            closed_months, patient_ledger,
+                                            receivables_aging,
+                                            record_transaction, reopen_period,
+                                            signed_amount)
+from app.utils.dates import day_range, month_start
+from app.utils.pagination import decode_cursor, encode_cursor
 
 router = APIRouter()
 
 
+def _ensure_period_open(session: Session, *dates: Optional[datetime]):
+    """Refuses writes that touch a closed month (409 until it is reopened)."""
+    closed = closed_months(session, dates)
+    if closed:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Período {min(closed):%m/%Y} fechado. Reabra o mês para alterar.",
+        )
+
+
 def recalculate_appointment_financials(session: Session, appointment_id: str):
     """
     Recalculates amount_paid and payment_status for an appointment based on its transactions.
+
+    Full recomputation, used to repair drift (the transaction endpoints apply
+    deltas with `apply_payment`). One aggregate per transaction table (live
+    and archived), applied inside the caller's transaction (the caller
+    commits). The appointment row is locked first, so concurrent payments on
+    the same appointment serialize and the last writer sums every committed
+    transaction.
     """
     if not appointment_id:
         return
 
-    # Fetch appointment
-    appt = session.get(Appointment, appointment_id)
+    # Lock the appointment (FOR UPDATE is a no-op on SQLite)
+    appt = session.exec(
+        select(Appointment)
+        .where(Appointment.id == appointment_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).first()
     if not appt:
         return
 
-    # Fetch all transactions for this appointment
-    query = select(Transaction).where(Transaction.appointment_id == appointment_id)
-    transactions = session.exec(query).all()
-
-    # Sum payments (INCOME only?)
-    total_paid = 0.0
-    debug_log = f"Recalc Appt {appointment_id}:\n"
-
-    for t in transactions:
-        # Robust comparison: handle Enum or String
-        t_type = (
-            str(t.type).split(".")[-1] if "." in str(t.type) else str(t.type)
-        )  # Handle TransactionType.INCOME or "INCOME"
-
-        debug_log += f" - Tx {t.id}: {t.amount} ({t_type})\n"
-
-        if t_type == "INCOME":
-            total_paid += t.amount
-        elif t_type == "EXPENSE":
-            total_paid -= t.amount
+    total_paid, income_count = 0.0, 0
+    for model in TRANSACTION_MODELS:
+        is_income = model.type == TransactionType.INCOME
+        signed = case((is_income, model.amount), else_=-model.amount)
+        paid, incomes = session.exec(
+            select(
+                func.coalesce(func.sum(signed), 0.0),
+                func.coalesce(func.sum(case((is_income, 1), else_=0)), 0),
+            ).where(model.appointment_id == appointment_id)
+        ).one()
+        total_paid += paid
+        income_count += incomes
 
     appt.amount_paid = total_paid
 
     # Update Status
     price = appt.price or 0.0
-    debug_log += f" - TotalPaid: {total_paid}, Price: {price}\n"
 
     # Floating point tolerance
-    has_income_transaction = any(
-        (str(t.type).split(".")[-1] if "." in str(t.type) else str(t.type)) == "INCOME"
-        for t in transactions
-    )
-
     if price > 0 and total_paid >= (price - 0.01):
         appt.payment_status = "PAID"
-    elif price == 0 and has_income_transaction:
+    elif price == 0 and income_count > 0:
         # Gratuidade: Transaction happened (even if 0.00), so it is settled/paid
         appt.payment_status = "PAID"
     elif total_paid > 0:
@@ -68,18 +98,8 @@ def recalculate_appointment_financials(session: Session, appointment_id: str):
     else:
         appt.payment_status = "PENDING"
 
-    debug_log += f" - NewStatus: {appt.payment_status}\n"
-
-    # Write debug log to file
-    try:
-        with open("recalc_debug.log", "a") as f:
-            f.write(debug_log + "\n")
-    except:
-        pass
-
     session.add(appt)
-    session.commit()
-    session.refresh(appt)
+    session.flush()
 
 
 @router.post("/transactions", response_model=TransactionResponse)
@@ -87,20 +107,135 @@ def create_transaction(
     transaction: TransactionCreate, session: Session = Depends(get_session)
 ):
     db_transaction = Transaction.model_validate(transaction)
+    _ensure_period_open(session, db_transaction.date)
     session.add(db_transaction)
+    record_transaction(session, db_transaction)
+
+    # Update Appointment if linked (same transaction as the payment)
+    apply_payment(
+        session, db_transaction.appointment_id, signed_amount(db_transaction)
+    )
+
     session.commit()
     session.refresh(db_transaction)
+    return db_transaction
 
-    # Recalculate Appointment if linked
-    if db_transaction.appointment_id:
-        recalculate_appointment_financials(session, db_transaction.appointment_id)
 
-    return db_transaction
+def _validation_message(error: ValidationError) -> str:
+    first = error.errors()[0]
+    field = ".".join(str(part) for part in first["loc"])
+    return f"{field}: {first['msg']}" if field else first["msg"]
+
+
+@router.post("/transactions/bulk", response_model=BulkTransactionResponse)
+def create_transactions_bulk(
+    payload: BulkTransactionRequest, session: Session = Depends(get_session)
+):
+    """
+    Posts a batch of transactions in a single database transaction and
+    updates each linked appointment once, with the sum of its items.
+
+    - atomic: any invalid item rejects the whole batch (422, nothing saved).
+    - best_effort: each item runs in its own savepoint; valid ones are kept.
+
+    Atomic batches use no savepoints: everything is flushed in the outer
+    transaction and a database error rolls all of it back.
+    """
+    results = {}
+    pending = []
+    for index, item in enumerate(payload.items):
+        try:
+            data = TransactionCreate.model_validate(item)
+        except ValidationError as e:
+            results[index] = BulkItemResult(
+                index=index, ok=False, error=_validation_message(e)
+            )
+            continue
+        pending.append((index, Transaction.model_validate(data)))
+
+    # One lookup for every referenced appointment
+    appt_ids = {tx.appointment_id for _, tx in pending if tx.appointment_id}
+    existing = set()
+    if appt_ids:
+        existing = set(
+            session.exec(
+                select(Appointment.id).where(Appointment.id.in_(appt_ids))
+            ).all()
+        )
+    closed = closed_months(session, [tx.date for _, tx in pending])
+    for index, tx in pending:
+        if tx.appointment_id and tx.appointment_id not in existing:
+            results[index] = BulkItemResult(
+                index=index, ok=False, error="Appointment not found"
+            )
+        elif month_start(tx.date) in closed:
+            results[index] = BulkItemResult(
+                index=index, ok=False, error=f"Período {tx.date:%m/%Y} fechado"
+            )
+    pending = [(index, tx) for index, tx in pending if index not in results]
+
+    atomic = payload.mode == "atomic"
+    if atomic and results:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "message": "Lote rejeitado: nenhum lançamento foi salvo",
+                "results": [r.model_dump() for _, r in sorted(results.items())],
+            },
+        )
+
+    deltas = defaultdict(float)
+    try:
+        for index, tx in pending:
+            if atomic:
+                session.add(tx)
+                record_transaction(session, tx)
+                session.flush()
+            else:
+                try:
+                    # Savepoint per item: a failure undoes only this item
+                    with session.begin_nested():
+                        session.add(tx)
+                        record_transaction(session, tx)
+                        session.flush()
+                except SQLAlchemyError as e:
+                    results[index] = BulkItemResult(
+                        index=index,
+                        ok=False,
+                        error=str(getattr(e, "orig", None) or e),
+                    )
+                    continue
+            results[index] = BulkItemResult(index=index, ok=True, id=tx.id)
+            if tx.appointment_id:
+                deltas[tx.appointment_id] += signed_amount(tx)
+
+        # One update per appointment, in a stable order (no lock cycles)
+        for appt_id in sorted(deltas):
+            apply_payment(session, appt_id, deltas[appt_id])
+
+        session.commit()
+    except SQLAlchemyError as e:
+        session.rollback()
+        raise HTTPException(
+            status_code=422,
+            detail={"message": f"Lote rejeitado: {getattr(e, 'orig', None) or e}"},
+        )
+
+    ordered = [r for _, r in sorted(results.items())]
+    created = sum(1 for r in ordered if r.ok)
+    return BulkTransactionResponse(
+        mode=payload.mode,
+        created=created,
+        failed=len(ordered) - created,
+        results=ordered,
+    )
 
 
 @router.get("/transactions/detail/{transaction_id}", response_model=Transaction)
 def get_transaction(transaction_id: str, session: Session = Depends(get_session)):
-    transaction = session.get(Transaction, transaction_id)
+    transaction = session.get(Transaction, transaction_id) or session.get(
+        TransactionArchive, transaction_id
+    )
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     return transaction
@@ -115,90 +250,184 @@ def get_transactions(
     appointment_id: Optional[str] = None,
     session: Session = Depends(get_session),
 ):
-    query = select(Transaction)
-
     # Handle backward compatibility: if date_filter is present, treat as start=end=date_filter
     if date_filter:
-        query = query.where(func.date(Transaction.date) == date_filter)
-    else:
-        # Range filtering
-        if start_date:
-            query = query.where(func.date(Transaction.date) >= start_date)
-        if end_date:
-            query = query.where(func.date(Transaction.date) <= end_date)
+        start_date = end_date = date_filter
 
-    if patient_id:
-        query = query.where(Transaction.patient_id == patient_id)
+    # Half-open [start, end) on the raw column so the date index is used
+    start, end = day_range(start_date, end_date)
 
-    if appointment_id:
-        query = query.where(Transaction.appointment_id == appointment_id)
+    # Closed months live in transactions_archive: list both tables
+    results = []
+    for model in TRANSACTION_MODELS:
+        query = select(model)
+        if start:
+            query = query.where(model.date >= start)
+        if end:
+            query = query.where(model.date < end)
 
-    query = query.order_by(Transaction.date.desc())
-    return session.exec(query).all()
+        if patient_id:
+            query = query.where(model.patient_id == patient_id)
 
+        if appointment_id:
+            query = query.where(model.appointment_id == appointment_id)
 
-@router.get("/stats/daily", response_model=DailyStats)
-def get_daily_stats(target_date: date, session: Session = Depends(get_session)):
-    query = select(Transaction).where(func.date(Transaction.date) == target_date)
-    transactions = session.exec(query).all()
+        results.extend(session.exec(query.order_by(model.date.desc())).all())
 
-    total_income = sum(
-        t.amount for t in transactions if t.type == TransactionType.INCOME
-    )
-    total_expense = sum(
-        t.amount for t in transactions if t.type == TransactionType.EXPENSE
+    results.sort(key=lambda t: t.date, reverse=True)
+    return results
+
+
+def _stats_for_range(
+    session: Session, start_date: Optional[date], end_date: Optional[date]
+) -> DailyStats:
+    """
+    Totals for the inclusive date range read from `financial_daily_rollup`:
+    one GROUP BY (type, payment_method) over at most (days x 8) rows.
+    """
+    query = (
+        select(
+            FinancialDailyRollup.type,
+            FinancialDailyRollup.payment_method,
+            func.sum(FinancialDailyRollup.total),
+            func.sum(FinancialDailyRollup.count),
+        )
+        .group_by(FinancialDailyRollup.type, FinancialDailyRollup.payment_method)
+        .having(func.sum(FinancialDailyRollup.count) > 0)
     )
 
+    if start_date:
+        query = query.where(FinancialDailyRollup.day >= start_date)
+    if end_date:
+        query = query.where(FinancialDailyRollup.day <= end_date)
+
+    total_income = 0.0
+    total_expense = 0.0
+    transaction_count = 0
     by_method = {}
-    for t in transactions:
-        if t.type == TransactionType.INCOME:
-            method = t.payment_method.value
-            by_method[method] = by_method.get(method, 0) + t.amount
+
+    for tx_type, method, total, count in session.exec(query).all():
+        transaction_count += count
+        if tx_type == TransactionType.INCOME:
+            total_income += total
+            by_method[method.value] = by_method.get(method.value, 0) + total
+        elif tx_type == TransactionType.EXPENSE:
+            total_expense += total
 
     return DailyStats(
         total_income=total_income,
         total_expense=total_expense,
         balance=total_income - total_expense,
-        transaction_count=len(transactions),
+        transaction_count=transaction_count,
         by_method=by_method,
     )
 
 
+@router.get("/stats/daily", response_model=DailyStats)
+def get_daily_stats(target_date: date, session: Session = Depends(get_session)):
+    return _stats_for_range(session, target_date, target_date)
+
+
 @router.get("/stats/summary", response_model=DailyStats)
 def get_financial_summary(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     session: Session = Depends(get_session),
 ):
-    query = select(Transaction)
+    return _stats_for_range(session, start_date, end_date)
 
-    if start_date:
-        query = query.where(func.date(Transaction.date) >= start_date)
 
-    if end_date:
-        query = query.where(func.date(Transaction.date) <= end_date)
+@router.get("/timeseries", response_model=CashFlowSeries)
+def get_cash_flow_timeseries(
+    start_date: date,
+    end_date: date,
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    session: Session = Depends(get_session),
+):
+    """
+    Income and expense per day, week (Monday) or month, split by payment
+    method, as arrays aligned with `buckets`. Buckets without movement are 0.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date before start_date")
+    return cash_flow_series(session, start_date, end_date, granularity)
 
-    transactions = session.exec(query).all()
 
-    total_income = sum(
-        t.amount for t in transactions if t.type == TransactionType.INCOME
-    )
-    total_expense = sum(
-        t.amount for t in transactions if t.type == TransactionType.EXPENSE
+@router.get("/aging", response_model=AgingReport)
+def get_receivables_aging(
+    as_of: Optional[date] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_session),
+):
+    """
+    Who owes what and for how long: open balances (price - amount_paid) of
+    past appointments per patient, in 0-30, 31-60, 61-90 and 90+ day buckets.
+    Largest balance first; pass `next_cursor` back as `cursor`.
+    """
+    as_of = as_of or date.today()
+    after = decode_cursor(cursor, (int, float), str)
+
+    rows, totals = receivables_aging(session, as_of, limit, after)
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor(last["total"], last["patient_id"])
+
+    def rounded(values):
+        return {
+            k: round(v, 2) if isinstance(v, float) else v for k, v in values.items()
+        }
+
+    return AgingReport(
+        as_of=as_of,
+        totals=AgingBuckets(**rounded(totals)),
+        patients=[AgingRow(**rounded(row)) for row in rows],
+        next_cursor=next_cursor,
     )
 
-    by_method = {}
-    for t in transactions:
-        if t.type == TransactionType.INCOME:
-            method = t.payment_method.value
-            by_method[method] = by_method.get(method, 0) + t.amount
 
-    return DailyStats(
-        total_income=total_income,
-        total_expense=total_expense,
-        balance=total_income - total_expense,
-        transaction_count=len(transactions),
-        by_method=by_method,
+@router.get("/ledger/{patient_id}", response_model=PatientLedger)
+def get_patient_ledger(
+    patient_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_session),
+):
+    """
+    Patient statement: appointment charges and transactions interleaved by
+    date, oldest first, with the running balance and what is still owed.
+    Pass `next_cursor` back as `cursor` for the next page.
+    """
+    if not session.get(Patient, patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    after = decode_cursor(cursor, str, int, str)
+
+    rows, outstanding = patient_ledger(session, patient_id, limit, after)
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor(last["sort_key"], last["rank"], last["id"])
+
+    return PatientLedger(
+        patient_id=patient_id,
+        outstanding_balance=round(outstanding, 2),
+        entries=[
+            LedgerEntry(
+                id=row["id"],
+                kind=row["kind"],
+                occurred_at=row["sort_key"],
+                description=row["description"],
+                amount=row["amount"],
+                balance=round(row["balance"], 2),
+                appointment_id=row["appointment_id"],
+            )
+            for row in rows
+        ],
+        next_cursor=next_cursor,
     )
 
 
@@ -206,17 +435,20 @@ def get_financial_summary(
 def delete_transaction(id: str, session: Session = Depends(get_session)):
     transaction = session.get(Transaction, id)
     if not transaction:
+        if session.get(TransactionArchive, id):
+            raise HTTPException(
+                status_code=409, detail="Período fechado. Reabra o mês para alterar."
+            )
         raise HTTPException(status_code=404, detail="Transaction not found")
-
-    appt_id = transaction.appointment_id
+    _ensure_period_open(session, transaction.date)
 
     session.delete(transaction)
-    session.commit()
+    record_transaction(session, transaction, -1)
 
-    # Recalculate Appointment if linked
-    if appt_id:
-        recalculate_appointment_financials(session, appt_id)
+    # Take the payment back out of the linked Appointment
+    apply_payment(session, transaction.appointment_id, -signed_amount(transaction))
 
+    session.commit()
     return {"ok": True}
 
 
@@ -226,17 +458,90 @@ def update_transaction(
 ):
     db_transaction = session.get(Transaction, id)
     if not db_transaction:
+        if session.get(TransactionArchive, id):
+            raise HTTPException(
+                status_code=409, detail="Período fechado. Reabra o mês para alterar."
+            )
         raise HTTPException(status_code=404, detail="Transaction not found")
+    _ensure_period_open(session, db_transaction.date, transaction_in.date)
+
+    # Old values out, new values in (rollup and appointment totals)
+    deltas = defaultdict(float)
+    deltas[db_transaction.appointment_id] -= signed_amount(db_transaction)
+    record_transaction(session, db_transaction, -1)
 
     data = transaction_in.model_dump(exclude_unset=True)
     for key, value in data.items():
         setattr(db_transaction, key, value)
 
     session.add(db_transaction)
+    record_transaction(session, db_transaction)
+    deltas[db_transaction.appointment_id] += signed_amount(db_transaction)
+
+    # Moving a payment to another appointment updates both of them
+    for appt_id in sorted(a for a in deltas if a):
+        apply_payment(session, appt_id, deltas[appt_id])
+
     session.commit()
     session.refresh(db_transaction)
+    return db_transaction
 
-    if db_transaction.appointment_id:
-        recalculate_appointment_financials(session, db_transaction.appointment_id)
 
-    return db_transaction
+def _parse_month(month: str) -> date:
+    try:
+        year, number = month.split("-")
+        return date(int(year), int(number), 1)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Mês inválido (use AAAA-MM)")
+
+
+@router.get("/periods", response_model=List[FinancialPeriod])
+def get_financial_periods(session: Session = Depends(get_session)):
+    return session.exec(
+        select(FinancialPeriod).order_by(FinancialPeriod.month.desc())
+    ).all()
+
+
+def _require_admin(current_user):
+    # Closing/reopening the books is an administrator decision
+    role = getattr(current_user, "role", None) or current_user.get("role")
+    if role != Role.ADMIN:
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
+
+@router.post("/periods/{month}/close", response_model=FinancialPeriod)
+def close_financial_period(
+    month: str,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Closes a month (AAAA-MM): its rollup is refreshed, its transactions move
+    to the archive and any later edit is refused until it is reopened.
+    """
+    _require_admin(current_user)
+    period_month = _parse_month(month)
+    # User might be a dict (from token) or an object (from DB)
+    user_id = getattr(current_user, "id", None) or current_user.get("id")
+    create_audit_log(session, current_user, "CLOSE", "FinancialPeriod", month)
+    try:
+        return close_period(session, period_month, user_id)
+    except ValueError as e:
+        session.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/periods/{month}/reopen", response_model=FinancialPeriod)
+def reopen_financial_period(
+    month: str,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    _require_admin(current_user)
+    period_month = _parse_month(month)
+    create_audit_log(session, current_user, "REOPEN", "FinancialPeriod", month)
+    try:
+        return reopen_period(session, period_month)
+    except ValueError as e:
+        session.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
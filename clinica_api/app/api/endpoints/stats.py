@@ -1,12 +1,14 @@
 from datetime import date, timedelta
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session, func, select
 
 from app.core.database import get_session
+from app.models.appointment_model import AppointmentDailySummary
 from app.models.patient_model import Patient
 from app.models.volunteer_model import Volunteer
+from app.schemas.appointment import AppointmentDaySummary
 
 router = APIRouter()
 
@@ -84,3 +86,41 @@ def get_birthdays(session: Session = Depends(get_session)):
     )
 
     return results
+
+
+@router.get("/appointments/daily", response_model=List[AppointmentDaySummary])
+def get_daily_appointment_summary(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    volunteer_id: Optional[str] = None,
+    session: Session = Depends(get_session),
+):
+    """
+    Appointment counts per status of closed days in [from, to], read from
+    the summary written by the nightly day close (today is not included).
+    """
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' antes de 'from'")
+    query = select(
+        AppointmentDailySummary.day,
+        AppointmentDailySummary.status,
+        func.sum(AppointmentDailySummary.count),
+    ).where(
+        AppointmentDailySummary.day >= date_from,
+        AppointmentDailySummary.day <= date_to,
+    )
+    if volunteer_id:
+        query = query.where(AppointmentDailySummary.volunteer_id == volunteer_id)
+    rows = session.exec(
+        query.group_by(AppointmentDailySummary.day, AppointmentDailySummary.status)
+    ).all()
+
+    days: Dict[date, Dict[str, int]] = {}
+    for day, status, count in rows:
+        days.setdefault(day, {})[status] = count
+    return [
+        AppointmentDaySummary(
+            date=day.isoformat(), total=sum(by_status.values()), by_status=by_status
+        )
+        for day, by_status in sorted(days.items())
+    ]
@@ -1,16 +1,18 @@
 import uuid
+from datetime import date
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
 
 from app.core.database import get_session
 from app.core.security import get_current_user
 from app.models.user_model import User
 from app.models.volunteer_model import Volunteer
-from app.schemas.volunteer import (VolunteerCreate, VolunteerRead,
-                                   VolunteerUpdate)
+from app.schemas.volunteer import (SlotDay, VolunteerCreate, VolunteerRead,
+                                   VolunteerSlots, VolunteerUpdate)
 from app.services.audit_service import create_audit_log
+from app.services.availability_service import free_slots
 
 router = APIRouter()
 
@@ -21,6 +23,66 @@ def read_volunteers(session: Session = Depends(get_session)):
     return volunteers
 
 
+MAX_SLOT_RANGE_DAYS = 62
+
+
+def _slot_report(
+    session: Session, volunteers: List[Volunteer], start: date, end: date
+) -> List[VolunteerSlots]:
+    if end < start:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (end - start).days >= MAX_SLOT_RANGE_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range limited to {MAX_SLOT_RANGE_DAYS} days",
+        )
+
+    slots = free_slots(session, volunteers, start, end)
+    return [
+        VolunteerSlots(
+            volunteer_id=v.id,
+            volunteer_name=v.name,
+            specialty=v.specialty,
+            appointment_duration=v.appointment_duration or 60,
+            days=[
+                SlotDay(date=day, slots=times)
+                for day, times in sorted(slots[v.id].items())
+            ],
+        )
+        for v in volunteers
+    ]
+
+
+@router.get("/slots", response_model=List[VolunteerSlots])
+def read_slots_by_specialty(
+    specialty: str,
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    session: Session = Depends(get_session),
+):
+    """Free slots of every active volunteer of a specialty."""
+    volunteers = session.exec(
+        select(Volunteer)
+        .where(Volunteer.active == True, Volunteer.specialty == specialty)
+        .order_by(Volunteer.name)
+    ).all()
+    return _slot_report(session, list(volunteers), start, end)
+
+
+@router.get("/{volunteer_id}/slots", response_model=VolunteerSlots)
+def read_volunteer_slots(
+    volunteer_id: str,
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    session: Session = Depends(get_session),
+):
+    """Free slots per day: weekly availability minus booked appointments."""
+    volunteer = session.get(Volunteer, volunteer_id)
+    if not volunteer or not volunteer.active:
+        raise HTTPException(status_code=404, detail="Volunteer not found")
+    return _slot_report(session, [volunteer], start, end)[0]
+
+
 @router.post("/", response_model=VolunteerRead)
 def create_volunteer(
     volunteer_in: VolunteerCreate,
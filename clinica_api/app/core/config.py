@@ -15,6 +15,27 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./clinica.db"
 
+    # Audit Log Retention
+    # Closed months stay queryable in the database for AUDIT_LIVE_MONTHS,
+    # then are moved to compressed NDJSON files under AUDIT_ARCHIVE_DIR.
+    AUDIT_LIVE_MONTHS: int = 3
+    AUDIT_ARCHIVE_DIR: str = "backups/audit_archive"
+    # Identical read events (user, resource, resource_id, action) within this
+    # many seconds are folded into one row with a hit counter. 0 disables.
+    AUDIT_COALESCE_SECONDS: int = 60
+
+    # Appointment reminders: the day-before scan fills the outbox, the
+    # dispatcher sends up to REMINDER_BATCH_SIZE every
+    # REMINDER_DISPATCH_SECONDS through REMINDER_TRANSPORT ("file", "stub").
+    # Failed sends retry after REMINDER_RETRY_SECONDS * 2^(attempt - 1).
+    PUBLIC_APP_URL: str = "http://localhost:3000"
+    REMINDER_TRANSPORT: str = "file"
+    REMINDER_OUTBOX_FILE: str = "backups/reminders.ndjson"
+    REMINDER_BATCH_SIZE: int = 30
+    REMINDER_DISPATCH_SECONDS: int = 60
+    REMINDER_MAX_ATTEMPTS: int = 5
+    REMINDER_RETRY_SECONDS: int = 60
+
     @field_validator("BACKEND_CORS_ORIGINS", mode="before")
     @classmethod
     def assemble_cors_origins(cls, v: Union[str, List[str]]) -> Union[List[str], str]:
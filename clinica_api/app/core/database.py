@@ -1,7 +1,27 @@
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import event
 from sqlmodel import Session, SQLModel, create_engine
 
 from app.core.config import settings
 
+
+def enable_sqlite_savepoints(sqlite_engine):
+    """
+    pysqlite defers BEGIN until the first DML, so a SAVEPOINT opened
+    before it runs outside any transaction and its RELEASE commits.
+    Let SQLAlchemy emit BEGIN itself so `begin_nested()` really nests.
+    """
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(sqlite_engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
 # Determine connection args based on DB type
 connect_args = {}
 
@@ -9,6 +29,7 @@ if settings.DATABASE_URL.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
     # Create engine for SQLite
     engine = create_engine(settings.DATABASE_URL, connect_args=connect_args)
+    enable_sqlite_savepoints(engine)
 
 elif settings.DATABASE_URL.startswith("postgresql"):
     # Fix for Railway/Heroku "postgres://" vs SQLAlchemy "postgresql://"
@@ -30,3 +51,33 @@ def init_db():
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+def upsert(
+    session: Session,
+    table,
+    rows: List[Dict[str, Any]],
+    key_columns: Sequence[str],
+    increment_columns: Sequence[str] = (),
+    replace_columns: Sequence[str] = (),
+):
+    """
+    INSERT ... ON CONFLICT (key_columns) DO UPDATE in a single statement.
+    `increment_columns` are added to the stored value (counters/totals),
+    `replace_columns` overwrite it. Runs inside the caller's transaction.
+    """
+    if not rows:
+        return
+
+    table = getattr(table, "__table__", table)
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(table).values(rows)
+    updates = {c: table.c[c] + stmt.excluded[c] for c in increment_columns}
+    updates.update({c: stmt.excluded[c] for c in replace_columns})
+    stmt = stmt.on_conflict_do_update(index_elements=list(key_columns), set_=updates)
+    session.connection().execute(stmt)
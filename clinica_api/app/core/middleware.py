@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional
 
 from fastapi import Request
@@ -7,6 +8,7 @@ from starlette.middleware.base import BaseHTTPMiddleware
 
 from app.core.database import engine
 from app.models.audit_model import AuditLog
+from app.services.audit_service import coalesce_access, record_activity
 
 
 # Sync function to run in threadpool
@@ -22,16 +24,25 @@ def log_audit_action(
 ):
     try:
         with Session(engine) as session:
-            log = AuditLog(
-                user_id=user_id,
-                user_name=user_name,
-                action=method,
-                resource=resource,
-                resource_id=resource_id,
-                ip_address=ip,
-                details=f"Path: {path} | Status: {status}",
+            now = datetime.now()
+            # Polling screens re-read the same record: fold repeated reads
+            # into the open row instead of writing a new one each time
+            coalesced = method == "GET" and coalesce_access(
+                session, user_id, resource, resource_id, method, now
             )
-            session.add(log)
+            if not coalesced:
+                log = AuditLog(
+                    user_id=user_id,
+                    user_name=user_name,
+                    action=method,
+                    resource=resource,
+                    resource_id=resource_id,
+                    ip_address=ip,
+                    details={"path": path, "status": status},
+                    timestamp=now,
+                )
+                session.add(log)
+            record_activity(session, user_id, user_name, resource, method, now)
             session.commit()
     except Exception as e:
         print(f"Audit Log Error: {e}")
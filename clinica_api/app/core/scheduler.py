@@ -0,0 +1,12 @@
+from apscheduler.schedulers.background import BackgroundScheduler
+
+# Single in-process scheduler shared by every background service
+# (backups, audit archiving, ...). Each service registers its own jobs
+# with a stable id so it can reschedule them without touching the others.
+scheduler = BackgroundScheduler()
+
+
+def start_scheduler():
+    if not scheduler.running:
+        scheduler.start()
+        print("Background Scheduler Started", flush=True)
@@ -80,6 +80,7 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag"],
     )
 
     # Basic Health Check (with DB)
@@ -105,12 +106,18 @@ def create_app() -> FastAPI:
 
     app.include_router(api_router, prefix=settings.API_V1_STR)
 
-    # Initialize Backup Scheduler
+    # Initialize Background Jobs (Backup, Audit Archive, Day Close, Reminders)
+    from app.services.audit_archive_service import AuditArchiveService
     from app.services.backup_service import BackupService
+    from app.services.day_close_service import DayCloseService
+    from app.services.reminder_service import ReminderService
 
     @app.on_event("startup")
     def startup_event():
         BackupService.start_scheduler()
+        AuditArchiveService.schedule()
+        DayCloseService.schedule()
+        ReminderService.schedule()
 
     return app
 
@@ -1,20 +1,68 @@
 import uuid
-from datetime import date, time
+from datetime import date, datetime, time
 from typing import Optional
 
+from sqlalchemy import DDL, Index, event, text
 from sqlmodel import Field, SQLModel
 
+from app.utils.dates import slot_bounds, slot_end
+
+
+# Constants for Status
+class AppointmentStatus:
+    SCHEDULED = "scheduled"
+    NOT_STARTED = "not_started"
+    IN_PROGRESS = "in_progress"
+    FINISHED = "finished"
+    CANCELLED = "cancelled"
+    ABSENT = "absent"
+    CONFIRMED = "confirmed"
+
+
+# Statuses that give the time back to the volunteer; every other one holds it
+INACTIVE_STATUSES = (AppointmentStatus.CANCELLED, AppointmentStatus.ABSENT)
+ACTIVE_SLOT = text(
+    "status NOT IN (" + ", ".join(f"'{s}'" for s in INACTIVE_STATUSES) + ")"
+)
+MAX_DURATION_MINUTES = 720
+
 
 class Appointment(SQLModel, table=True):
     __tablename__ = "appointments"
+    __table_args__ = (
+        # Agenda listing: keyset on (date, time, id), optionally per volunteer
+        Index("ix_appointments_date_time", "date", "time"),
+        Index("ix_appointments_volunteer_date_time", "volunteer_id", "date", "time"),
+        # Overlap checks and slot/calendar range scans
+        Index("ix_appointments_volunteer_starts_at", "volunteer_id", "starts_at"),
+        Index("ix_appointments_starts_at", "starts_at"),
+        # One active appointment per volunteer and start
+        Index(
+            "uq_appointments_active_start",
+            "volunteer_id",
+            "starts_at",
+            unique=True,
+            sqlite_where=ACTIVE_SLOT,
+            postgresql_where=ACTIVE_SLOT,
+        ),
+        # Receivables: open balances by age
+        Index("ix_appointments_payment_status_date", "payment_status", "date"),
+    )
 
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
     patient_id: str = Field(foreign_key="patients.id", index=True)
     volunteer_id: Optional[str] = Field(
         default=None, foreign_key="volunteers.id", index=True
     )
-    date: str  # YYYY-MM-DD
-    time: str  # HH:MM
+    date: str  # YYYY-MM-DD (kept for API compatibility)
+    time: str  # HH:MM (kept for API compatibility)
+    duration: int = Field(
+        default=60, sa_column_kwargs={"server_default": "60"}
+    )  # Minutes
+    # Derived from date + time + duration on every write
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    series_id: Optional[str] = Field(default=None, index=True)  # Recurring series
     status: str = Field(
         default="scheduled"
     )  # scheduled, not_started, in_progress, finished, cancelled, absent
@@ -23,13 +71,58 @@ class Appointment(SQLModel, table=True):
     amount_paid: float = Field(default=0.0)  # Total amount paid so far
     payment_status: str = Field(default="PENDING")  # PENDING, PARTIAL, PAID
 
+    @property
+    def end_time(self) -> Optional[str]:
+        # "HH:MM" counterpart of ends_at (capped at 24:00)
+        try:
+            return slot_end(self.time, self.duration or 60)
+        except (AttributeError, TypeError, ValueError):
+            return None
 
-# Constants for Status
-class AppointmentStatus:
-    SCHEDULED = "scheduled"
-    NOT_STARTED = "not_started"
-    IN_PROGRESS = "in_progress"
-    FINISHED = "finished"
-    CANCELLED = "cancelled"
-    ABSENT = "absent"
-    CONFIRMED = "confirmed"
+
+def fill_slot_times(mapper, connection, target: Appointment):
+    """Keeps starts_at/ends_at in step with date/time/duration for ORM
+    writes (Core statements set them explicitly)."""
+    try:
+        target.starts_at, target.ends_at = slot_bounds(
+            target.date, target.time, target.duration or 60
+        )
+    except (TypeError, ValueError):
+        pass  # Malformed legacy date/time: reported by the backfill script
+
+
+event.listen(Appointment, "before_insert", fill_slot_times)
+event.listen(Appointment, "before_update", fill_slot_times)
+
+
+# Postgres: overlapping active appointments of a volunteer are rejected by the
+# database itself, so concurrent bookings cannot both pass the overlap check.
+OVERLAP_EXCLUSION_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    f"""
+    ALTER TABLE appointments ADD CONSTRAINT ex_appointments_volunteer_overlap
+    EXCLUDE USING gist (
+        volunteer_id WITH =,
+        tsrange(starts_at, ends_at) WITH &&
+    ) WHERE ({ACTIVE_SLOT.text} AND starts_at IS NOT NULL)
+    """,
+]
+
+for _statement in OVERLAP_EXCLUSION_DDL:
+    event.listen(
+        Appointment.__table__,
+        "after_create",
+        DDL(_statement).execute_if(dialect="postgresql"),
+    )
+
+
+class AppointmentDailySummary(SQLModel, table=True):
+    """Appointments per (day, volunteer, status) of closed days, rebuilt by
+    the day-close job so dashboard stats never scan `appointments`."""
+
+    __tablename__ = "appointment_daily_summary"
+
+    day: date = Field(primary_key=True)
+    volunteer_id: str = Field(primary_key=True)  # "" when unassigned
+    status: str = Field(primary_key=True)
+    count: int = Field(default=0)
@@ -1,12 +1,30 @@
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
+from sqlalchemy import JSON, Column, Index, Table, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import Field, SQLModel
 
+# JSONB on Postgres (GIN-indexable), JSON1 text on SQLite
+DetailsType = JSON(none_as_null=True).with_variant(
+    JSONB(none_as_null=True), "postgresql"
+)
+
 
 class AuditLog(SQLModel, table=True):
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # Keyset pagination (timestamp, id) and the common filters
+        Index("ix_audit_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_audit_logs_user_id_timestamp", "user_id", "timestamp"),
+        Index(
+            "ix_audit_logs_resource_timestamp", "resource", "resource_id", "timestamp"
+        ),
+        # Rows are moved out to monthly tables/archives, so SQLite must never
+        # reuse the ids of rows that left the live table.
+        {"sqlite_autoincrement": True},
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: str = Field(index=True)
@@ -14,6 +32,58 @@ class AuditLog(SQLModel, table=True):
     action: str  # ex: "VIEW", "CREATE", "DELETE", "LOGIN"
     resource: str  # ex: "Patient", "MedicalRecord", "Financial"
     resource_id: Optional[str] = None
-    details: Optional[str] = None  # JSON string com detalhes extras
+    # ex: {"path": "/api/v1/patients", "status": 200} ou {"changes": ["cpf"]}
+    details: Optional[Dict[str, Any]] = Field(
+        default=None, sa_column=Column(DetailsType)
+    )
     ip_address: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.now)
+    # Coalesced read access: repeated hits inside the window bump the counter
+    hit_count: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    last_seen_at: Optional[datetime] = None
+
+
+def add_details_indexes(table: Table) -> List[Index]:
+    """
+    Structured details: `details @> {...}` on Postgres, json_extract on
+    SQLite. Each index only exists on its own dialect; the monthly tables
+    get theirs from here too, since Table.to_metadata drops ddl_if.
+    """
+    indexes = [
+        Index(
+            f"ix_{table.name}_details",
+            "details",
+            postgresql_using="gin",
+            postgresql_ops={"details": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            f"ix_{table.name}_details_status",
+            text("json_extract(details, '$.status')"),
+        ).ddl_if(dialect="sqlite"),
+    ]
+    for index in indexes:
+        table.append_constraint(index)
+    return indexes
+
+
+DETAILS_INDEXES = add_details_indexes(AuditLog.__table__)
+
+
+class AuditRollupBase(SQLModel):
+    """Access counts per (bucket, user, resource, action), kept up to date
+    by the audit writers so dashboards never scan `audit_logs`."""
+
+    bucket: datetime = Field(primary_key=True)  # Start of the hour/day
+    user_id: str = Field(primary_key=True)
+    resource: str = Field(primary_key=True)
+    action: str = Field(primary_key=True)
+    user_name: Optional[str] = None
+    count: int = Field(default=0)
+
+
+class AuditRollupHourly(AuditRollupBase, table=True):
+    __tablename__ = "audit_rollup_hourly"
+
+
+class AuditRollupDaily(AuditRollupBase, table=True):
+    __tablename__ = "audit_rollup_daily"
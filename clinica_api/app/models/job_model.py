@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import JSON, Column
+from sqlmodel import Field, SQLModel
+
+
+class ScheduledJobRun(SQLModel, table=True):
+    """
+    One row per (job, run) claimed by a worker. Every gunicorn worker runs
+    its own scheduler; the primary key lets exactly one of them insert the
+    row and do the work, the others skip it.
+    """
+
+    __tablename__ = "scheduled_job_runs"
+
+    job_id: str = Field(primary_key=True)
+    run_key: str = Field(primary_key=True)  # e.g. the day being closed
+    owner: str  # host:pid of the worker that claimed it
+    started_at: datetime = Field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None  # NULL: running, or crashed
+    result: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
@@ -0,0 +1,43 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Index, UniqueConstraint
+from sqlmodel import Field, SQLModel
+
+
+class ReminderStatus:
+    PENDING = "PENDING"  # Waiting for next_attempt_at (first send or retry)
+    SENDING = "SENDING"  # Claimed by a dispatcher until next_attempt_at
+    SENT = "SENT"
+    FAILED = "FAILED"  # Gave up after REMINDER_MAX_ATTEMPTS
+    SKIPPED = "SKIPPED"  # Appointment cancelled/confirmed before sending
+
+
+class ReminderOutbox(SQLModel, table=True):
+    """
+    Reminders waiting to be sent. Rows are written by the nightly scan and
+    consumed by the dispatcher job; request handlers never send anything.
+    """
+
+    __tablename__ = "reminder_outbox"
+    __table_args__ = (
+        # One reminder per appointment and start: a rescheduled
+        # appointment gets a new one
+        UniqueConstraint("appointment_id", "starts_at", name="uq_reminder_slot"),
+        # Dispatcher: due rows of a status, oldest first
+        Index("ix_reminder_outbox_status_next", "status", "next_attempt_at"),
+    )
+
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
+    appointment_id: str = Field(foreign_key="appointments.id")
+    starts_at: datetime
+    channel: str = Field(default="whatsapp")
+    recipient: str
+    message: str
+    status: str = Field(default=ReminderStatus.PENDING)
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.now)
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    sent_at: Optional[datetime] = None
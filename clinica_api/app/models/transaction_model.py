@@ -1,8 +1,9 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 from typing import Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
@@ -20,16 +21,65 @@ class PaymentMethod(str, Enum):
 
 class Transaction(SQLModel, table=True):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Patient statements filtered/ordered by date
+        Index("ix_transactions_patient_id_date", "patient_id", "date"),
+    )
 
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
     amount: float
     type: TransactionType
-    date: datetime = Field(default_factory=datetime.now)
+    date: datetime = Field(default_factory=datetime.now, index=True)
     description: str
     patient_id: Optional[str] = Field(default=None, foreign_key="patients.id")
-    appointment_id: Optional[str] = Field(default=None, foreign_key="appointments.id")
+    appointment_id: Optional[str] = Field(
+        default=None, foreign_key="appointments.id", index=True
+    )
     payment_method: PaymentMethod = Field(default=PaymentMethod.CASH)
 
     # Audit
     created_at: datetime = Field(default_factory=datetime.now)
     created_by: Optional[str] = None  # User ID who registered
+
+
+class FinancialDailyRollup(SQLModel, table=True):
+    """Totals per (day, type, payment_method), kept in step with `transactions`
+    by the financial writers so cash-flow summaries never scan transactions."""
+
+    __tablename__ = "financial_daily_rollup"
+
+    day: date = Field(primary_key=True)
+    type: TransactionType = Field(primary_key=True)
+    payment_method: PaymentMethod = Field(primary_key=True)
+    total: float = Field(default=0.0)
+    count: int = Field(default=0)
+
+
+class TransactionArchive(SQLModel, table=True):
+    """Transactions of closed months, moved out of the hot `transactions`
+    table by the period close (same columns, no foreign keys)."""
+
+    __tablename__ = "transactions_archive"
+
+    id: str = Field(primary_key=True)
+    amount: float
+    type: TransactionType
+    date: datetime = Field(index=True)
+    description: str
+    patient_id: Optional[str] = Field(default=None, index=True)
+    appointment_id: Optional[str] = Field(default=None, index=True)
+    payment_method: PaymentMethod = Field(default=PaymentMethod.CASH)
+    created_at: datetime = Field(default_factory=datetime.now)
+    created_by: Optional[str] = None
+
+
+class FinancialPeriod(SQLModel, table=True):
+    __tablename__ = "financial_periods"
+
+    month: date = Field(primary_key=True)  # First day of the month
+    status: str = Field(default="OPEN")  # OPEN, CLOSED
+    closed_at: Optional[datetime] = None
+    closed_by: Optional[str] = None
+    transaction_count: int = Field(default=0)
+    total_income: float = Field(default=0.0)
+    total_expense: float = Field(default=0.0)
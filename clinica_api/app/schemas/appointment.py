@@ -1,6 +1,24 @@
-from typing import Optional
+from datetime import date, datetime
+from typing import Dict, List, Literal, Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import (BaseModel, ConfigDict, Field, field_validator,
+                      model_validator)
+
+from app.models.appointment_model import MAX_DURATION_MINUTES
+
+
+# A clock time of the day: "9:00", "09:00" or "09:00:00" ("24:30" is not)
+TIME_PATTERN = r"^([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d)?$"
+
+
+def _check_date(value: Optional[str]) -> Optional[str]:
+    # Parsed into starts_at on every write: reject what fromisoformat can't read
+    if value is None:
+        return value
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError("Data inválida, use AAAA-MM-DD")
 
 
 # Base for shared properties
@@ -9,6 +27,8 @@ class AppointmentBase(BaseModel):
     volunteer_id: Optional[str] = None
     date: str
     time: str
+    # Minutes; defaults to the volunteer's appointment_duration
+    duration: Optional[int] = Field(default=None, gt=0, le=MAX_DURATION_MINUTES)
     status: Optional[str] = "scheduled"
     notes: Optional[str] = None
     price: Optional[float] = 0.0
@@ -18,7 +38,9 @@ class AppointmentBase(BaseModel):
 
 # Properties to receive on creation
 class AppointmentCreate(AppointmentBase):
-    pass
+    time: str = Field(pattern=TIME_PATTERN)
+
+    _date = field_validator("date")(_check_date)
 
 
 # Properties to receive on update
@@ -28,18 +50,134 @@ class AppointmentUpdate(BaseModel):
     status: Optional[str] = None
     notes: Optional[str] = None
     date: Optional[str] = None
-    time: Optional[str] = None
+    time: Optional[str] = Field(default=None, pattern=TIME_PATTERN)
+    duration: Optional[int] = Field(default=None, gt=0, le=MAX_DURATION_MINUTES)
     price: Optional[float] = None
     amount_paid: Optional[float] = None
     payment_status: Optional[str] = None
 
+    _date = field_validator("date")(_check_date)
+
 
 # Properties to return to client
 class AppointmentRead(AppointmentBase):
     id: str
+    end_time: Optional[str] = None  # HH:MM, time + duration
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    series_id: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
 class AppointmentVolunteerRead(AppointmentRead):
     patient_name: str
+
+
+# Recurring series
+class RecurrenceRule(BaseModel):
+    frequency: Literal["daily", "weekly", "monthly"] = "weekly"
+    interval: int = Field(default=1, ge=1, le=12)  # Every N days/weeks/months
+    # Weekly only: 0 = Monday ... 6 = Sunday (defaults to the start weekday)
+    weekdays: Optional[List[int]] = None
+    count: Optional[int] = Field(default=None, ge=1)
+    until: Optional[date] = None  # Inclusive
+
+    @model_validator(mode="after")
+    def check_end(self):
+        if self.count is None and self.until is None:
+            raise ValueError("Informe 'count' ou 'until'")
+        if self.weekdays and any(d < 0 or d > 6 for d in self.weekdays):
+            raise ValueError("weekdays: 0 (segunda) a 6 (domingo)")
+        return self
+
+
+class AppointmentSeriesCreate(BaseModel):
+    patient_id: str
+    volunteer_id: Optional[str] = None
+    start_date: date
+    time: str = Field(pattern=TIME_PATTERN)
+    duration: Optional[int] = Field(default=None, gt=0, le=MAX_DURATION_MINUTES)
+    status: Optional[str] = "scheduled"
+    notes: Optional[str] = None
+    price: Optional[float] = 0.0
+    rule: RecurrenceRule
+    # Book the free occurrences and report the rest instead of failing
+    skip_conflicts: bool = False
+
+
+class AppointmentSeriesUpdate(BaseModel):
+    volunteer_id: Optional[str] = None
+    time: Optional[str] = Field(default=None, pattern=TIME_PATTERN)
+    duration: Optional[int] = Field(default=None, gt=0, le=MAX_DURATION_MINUTES)
+    notes: Optional[str] = None
+    price: Optional[float] = None
+
+
+class AppointmentSeriesRead(BaseModel):
+    series_id: str
+    appointments: List[AppointmentRead]
+    skipped: List[str] = []  # Occurrence dates left out (conflicts)
+
+
+# Calendar (week / month grids)
+class CalendarAppointment(BaseModel):
+    id: str
+    time: str
+    end_time: Optional[str] = None
+    status: str
+    patient_id: str
+    patient_name: Optional[str] = None
+    payment_status: Optional[str] = None
+    series_id: Optional[str] = None
+
+
+class CalendarVolunteer(BaseModel):
+    volunteer_id: Optional[str] = None  # None: not assigned yet
+    volunteer_name: Optional[str] = None
+    specialty: Optional[str] = None
+    appointments: List[CalendarAppointment]
+
+
+class CalendarDay(BaseModel):
+    date: str
+    volunteers: List[CalendarVolunteer]
+
+
+class AppointmentCalendar(BaseModel):
+    start: date
+    end: date
+    days: List[CalendarDay]
+
+
+# Bulk status transitions (e.g. volunteer called in sick)
+class BulkStatusUpdate(BaseModel):
+    status: str
+    ids: Optional[List[str]] = None
+    volunteer_id: Optional[str] = None
+    date: Optional[str] = Field(default=None, pattern=r"^\d{4}-\d{2}-\d{2}$")
+    # Only appointments currently in one of these statuses are touched
+    from_statuses: List[str] = ["scheduled", "confirmed", "not_started"]
+    # Also transition appointments that already have payments
+    include_paid: bool = False
+    reason: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_filters(self):
+        if not (self.ids or self.volunteer_id or self.date):
+            raise ValueError("Informe ids, volunteer_id ou date")
+        return self
+
+
+class BulkStatusResult(BaseModel):
+    status: str
+    updated_ids: List[str]
+    # Left untouched because they have linked transactions (see include_paid)
+    skipped_paid_ids: List[str] = []
+
+
+# Closed-day counts (day-close job), for the dashboard
+class AppointmentDaySummary(BaseModel):
+    date: str
+    total: int
+    by_status: Dict[str, int]
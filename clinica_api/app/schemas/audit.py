@@ -0,0 +1,66 @@
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class AuditActivityStat(BaseModel):
+    bucket: Optional[datetime] = None
+    user_id: Optional[str] = None
+    user_name: Optional[str] = None
+    resource: Optional[str] = None
+    action: Optional[str] = None
+    count: int
+
+
+class AuditDetails(BaseModel):
+    """Typed view of `AuditLog.details`; extra keys (name, filters...) pass through."""
+
+    model_config = ConfigDict(extra="allow")
+
+    path: Optional[str] = None
+    status: Optional[int] = None  # HTTP status (access middleware)
+    changes: Optional[List[str]] = None
+    new_status: Optional[str] = None  # Appointment status set by a bulk change
+
+
+LEGACY_DETAILS_RE = re.compile(r"^Path: (?P<path>.*) \| Status: (?P<status>\d+)$")
+
+
+def normalize_details(details: Any) -> Optional[Dict[str, Any]]:
+    """
+    Converts legacy free-text details into the structured form: the old
+    middleware string "Path: ... | Status: ..." and `json.dumps` payloads.
+    """
+    if details is None or isinstance(details, dict):
+        return details
+    if isinstance(details, str):
+        match = LEGACY_DETAILS_RE.match(details)
+        if match:
+            return {"path": match["path"], "status": int(match["status"])}
+        try:
+            parsed = json.loads(details)
+        except ValueError:
+            return {"text": details}
+        if isinstance(parsed, dict):
+            return parsed
+        details = parsed
+    return {"value": details}
+
+
+class AuditLogRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: Optional[int] = None
+    user_id: str
+    user_name: str
+    action: str
+    resource: str
+    resource_id: Optional[str] = None
+    details: Optional[AuditDetails] = None
+    ip_address: Optional[str] = None
+    timestamp: datetime
+    hit_count: int = 1
+    last_seen_at: Optional[datetime] = None
@@ -1,7 +1,7 @@
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from app.models.transaction_model import PaymentMethod, TransactionType
 
@@ -50,3 +50,73 @@ class DailyStats(BaseModel):
     balance: float
     transaction_count: int
     by_method: dict[str, float]
+
+
+# Patient Ledger (Extrato)
+class LedgerEntry(BaseModel):
+    id: str
+    kind: str  # CHARGE (consulta), PAYMENT (entrada), REFUND (estorno)
+    occurred_at: datetime
+    description: str
+    amount: float  # Effect on the balance: + charges/refunds, - payments
+    balance: float  # Running balance after this entry
+    appointment_id: Optional[str] = None
+
+
+class PatientLedger(BaseModel):
+    patient_id: str
+    outstanding_balance: float
+    entries: List[LedgerEntry]
+    next_cursor: Optional[str] = None
+
+
+# Bulk posting (end-of-day reconciliation)
+class BulkTransactionRequest(BaseModel):
+    # atomic: all or nothing; best_effort: valid items are kept
+    mode: str = Field("atomic", pattern="^(atomic|best_effort)$")
+    items: List[Dict[str, Any]] = Field(..., min_length=1, max_length=500)
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    ok: bool
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkTransactionResponse(BaseModel):
+    mode: str
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+# Cash-flow chart: one array per series, aligned with `buckets`
+class CashFlowSeries(BaseModel):
+    granularity: str
+    buckets: List[date]
+    income: List[float]
+    expense: List[float]
+    by_method: Dict[str, List[float]]  # Income per payment method
+
+
+# Accounts receivable aging (days since the appointment date)
+class AgingBuckets(BaseModel):
+    days_0_30: float = 0.0
+    days_31_60: float = 0.0
+    days_61_90: float = 0.0
+    days_90_plus: float = 0.0
+    total: float = 0.0
+
+
+class AgingRow(AgingBuckets):
+    patient_id: str
+    patient_name: Optional[str] = None
+    oldest_date: str  # YYYY-MM-DD of the oldest open appointment
+
+
+class AgingReport(BaseModel):
+    as_of: date
+    totals: AgingBuckets
+    patients: List[AgingRow]
+    next_cursor: Optional[str] = None
@@ -1,3 +1,4 @@
+from datetime import date
 from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, ConfigDict
@@ -44,3 +45,16 @@ class VolunteerRead(VolunteerBase):
     id: str
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class SlotDay(BaseModel):
+    date: date
+    slots: List[str]  # Free start times, "HH:MM"
+
+
+class VolunteerSlots(BaseModel):
+    volunteer_id: str
+    volunteer_name: str
+    specialty: str
+    appointment_duration: int
+    days: List[SlotDay]
@@ -0,0 +1,355 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, exists, insert, literal, or_, update
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select
+
+from app.models.appointment_model import (INACTIVE_STATUSES,
+                                          MAX_DURATION_MINUTES, Appointment)
+from app.schemas.appointment import RecurrenceRule
+from app.services.financial_service import TRANSACTION_MODELS
+from app.utils.dates import (add_months, hhmm_to_minutes, minutes_to_hhmm,
+                             slot_bounds)
+
+SLOT_FIELDS = ("volunteer_id", "date", "time", "duration", "status")
+MAX_SERIES_OCCURRENCES = 104  # Two years of weekly sessions
+# Nothing that starts earlier than this can still be running at a given start
+MAX_DURATION = timedelta(minutes=MAX_DURATION_MINUTES)
+
+
+def _with_slot(values: Dict[str, Any]) -> Dict[str, Any]:
+    duration = values.get("duration") or 60
+    # Raises on a start outside the day ("24:30") instead of moving it
+    starts_at, ends_at = slot_bounds(values["date"], values["time"], duration)
+    # Normalizes "9:00" -> "09:00" so the legacy text columns sort correctly
+    start = minutes_to_hhmm(hhmm_to_minutes(values["time"]))
+    return {
+        **values,
+        "time": start,
+        "duration": duration,
+        "starts_at": starts_at,
+        "ends_at": ends_at,
+    }
+
+
+def slot_taken(
+    volunteer_id: str,
+    starts_at: datetime,
+    ends_at: datetime,
+    exclude_id: Optional[str] = None,
+):
+    """EXISTS over active appointments of the volunteer intersecting
+    [starts_at, ends_at). A bounded range scan on
+    ix_appointments_volunteer_starts_at."""
+    # Aliased so it never correlates with an UPDATE of the same table
+    other = aliased(Appointment, name="other")
+    condition = and_(
+        other.volunteer_id == volunteer_id,
+        other.starts_at > starts_at - MAX_DURATION,
+        other.starts_at < ends_at,
+        other.ends_at > starts_at,
+        other.status.not_in(INACTIVE_STATUSES),
+    )
+    if exclude_id:
+        condition = and_(condition, other.id != exclude_id)
+    return exists().where(condition)
+
+
+def _is_active(values: Dict[str, Any]) -> bool:
+    return bool(values.get("volunteer_id")) and values.get("status") not in (
+        INACTIVE_STATUSES
+    )
+
+
+def insert_appointment(session: Session, values: Dict[str, Any]) -> bool:
+    """
+    INSERT ... SELECT ... WHERE NOT EXISTS (overlap): the conflict check and
+    the write are one statement, in the caller's transaction. Returns False
+    when the slot is taken. Concurrent inserts that both pass the check are
+    stopped by uq_appointments_active_start (same start) and, on Postgres, by
+    ex_appointments_volunteer_overlap; callers turn that IntegrityError into
+    the same conflict.
+    """
+    values = _with_slot(values)
+    table = Appointment.__table__
+    source = select(
+        *(literal(values.get(c.name), type_=c.type).label(c.name) for c in table.c)
+    )
+    if _is_active(values):
+        source = source.where(
+            ~slot_taken(values["volunteer_id"], values["starts_at"], values["ends_at"])
+        )
+    result = session.execute(
+        insert(table).from_select([c.name for c in table.c], source)
+    )
+    return result.rowcount == 1
+
+
+def apply_appointment_changes(
+    session: Session, appointment: Appointment, changes: Dict[str, Any]
+) -> bool:
+    """
+    Applies `changes` with a single guarded UPDATE when they move the
+    appointment in time (or reactivate it): the row is only written if the
+    new slot is still free. Returns False on conflict.
+    """
+    if not changes:
+        return True
+    values = {**changes}
+    slot = {f: values.get(f, getattr(appointment, f)) for f in SLOT_FIELDS}
+    statement = update(Appointment).where(Appointment.id == appointment.id)
+
+    if any(f in changes for f in SLOT_FIELDS):
+        slot = _with_slot(slot)
+        values.update(
+            {f: slot[f] for f in ("time", "duration", "starts_at", "ends_at")}
+        )
+        if _is_active(slot):
+            statement = statement.where(
+                ~slot_taken(
+                    slot["volunteer_id"],
+                    slot["starts_at"],
+                    slot["ends_at"],
+                    exclude_id=appointment.id,
+                )
+            )
+
+    result = session.execute(
+        statement.values(**values),
+        execution_options={"synchronize_session": False},
+    )
+    return result.rowcount == 1
+
+
+def expand_recurrence(start: date, rule: RecurrenceRule) -> List[date]:
+    """Occurrence dates of `rule` from `start` (inclusive). Raises ValueError
+    past MAX_SERIES_OCCURRENCES."""
+    limit = min(rule.count or MAX_SERIES_OCCURRENCES + 1, MAX_SERIES_OCCURRENCES + 1)
+
+    def candidates():
+        step = 0
+        while True:
+            if rule.frequency == "daily":
+                yield start + timedelta(days=step * rule.interval)
+            elif rule.frequency == "weekly":
+                monday = start - timedelta(days=start.weekday())
+                week = monday + timedelta(weeks=step * rule.interval)
+                for weekday in sorted(set(rule.weekdays or [start.weekday()])):
+                    yield week + timedelta(days=weekday)
+            else:
+                month = add_months(start.replace(day=1), step * rule.interval)
+                try:
+                    yield month.replace(day=start.day)
+                except ValueError:
+                    pass  # Day 31 in a 30-day month: no occurrence
+            step += 1
+
+    dates: List[date] = []
+    for day in candidates():
+        if day < start:
+            continue
+        if rule.until and day > rule.until:
+            break
+        dates.append(day)
+        if len(dates) >= limit:
+            break
+    if len(dates) > MAX_SERIES_OCCURRENCES:
+        raise ValueError(
+            f"Série limitada a {MAX_SERIES_OCCURRENCES} ocorrências"
+        )
+    return dates
+
+
+def find_conflicts(
+    session: Session,
+    volunteer_id: str,
+    slots: Sequence[Tuple[datetime, datetime]],
+    exclude_ids: Iterable[str] = (),
+) -> List[str]:
+    """
+    Dates ('YYYY-MM-DD') of the (starts_at, ends_at) `slots` that overlap an
+    active appointment of the volunteer. One range query for the whole batch
+    instead of one per occurrence.
+    """
+    if not slots:
+        return []
+    booked = session.exec(
+        select(Appointment.starts_at, Appointment.ends_at).where(
+            Appointment.volunteer_id == volunteer_id,
+            Appointment.starts_at > min(s for s, _ in slots) - MAX_DURATION,
+            Appointment.starts_at < max(e for _, e in slots),
+            Appointment.status.not_in(INACTIVE_STATUSES),
+            Appointment.id.not_in(list(exclude_ids)),
+        )
+    ).all()
+    return sorted(
+        {
+            start.date().isoformat()
+            for start, end in slots
+            for other_start, other_end in booked
+            if other_start < end and other_end > start
+        }
+    )
+
+
+def _conflicts_by_volunteer(
+    session: Session, rows: Sequence[Dict[str, Any]], exclude_ids: Iterable[str] = ()
+) -> List[str]:
+    by_volunteer: Dict[str, List[Tuple[datetime, datetime]]] = {}
+    for row in rows:
+        if _is_active(row):
+            by_volunteer.setdefault(row["volunteer_id"], []).append(
+                (row["starts_at"], row["ends_at"])
+            )
+    exclude_ids = list(exclude_ids)
+    return sorted(
+        {
+            day
+            for volunteer_id, slots in by_volunteer.items()
+            for day in find_conflicts(session, volunteer_id, slots, exclude_ids)
+        }
+    )
+
+
+def book_series(
+    session: Session, rows: List[Dict[str, Any]], skip_conflicts: bool = False
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Inserts the occurrences of a series in one batch, in the caller's
+    transaction. Returns (booked rows, conflicting dates). Nothing is written
+    on conflict unless `skip_conflicts`; a booking racing the batch is
+    stopped by the slot constraints (IntegrityError).
+    """
+    rows = [_with_slot(row) for row in rows]
+    conflicts = _conflicts_by_volunteer(session, rows)
+    if conflicts and not skip_conflicts:
+        return [], conflicts
+
+    rows = [row for row in rows if row["date"] not in conflicts]
+    if rows:
+        session.execute(insert(Appointment), rows)
+    return rows, conflicts
+
+
+def reschedule_series(
+    session: Session, appointments: Sequence[Appointment], changes: Dict[str, Any]
+) -> List[str]:
+    """
+    Applies `changes` to every appointment of the series with one conflict
+    query and one batched UPDATE. Returns the conflicting dates (nothing is
+    written then).
+    """
+    rows = []
+    for appt in appointments:
+        row = {f: changes.get(f, getattr(appt, f)) for f in SLOT_FIELDS}
+        rows.append({"id": appt.id, **_with_slot({**row, "date": appt.date})})
+
+    if any(f in changes for f in SLOT_FIELDS):
+        conflicts = _conflicts_by_volunteer(
+            session, rows, exclude_ids=[appt.id for appt in appointments]
+        )
+        if conflicts:
+            return conflicts
+
+    extra = {k: v for k, v in changes.items() if k not in SLOT_FIELDS}
+    session.execute(
+        update(Appointment),
+        [
+            {
+                "id": row["id"],
+                "volunteer_id": row["volunteer_id"],
+                "time": row["time"],
+                "duration": row["duration"],
+                "starts_at": row["starts_at"],
+                "ends_at": row["ends_at"],
+                **extra,
+            }
+            for row in rows
+        ],
+    )
+    return []
+
+
+def bulk_transition(
+    session: Session,
+    status: str,
+    from_statuses: Sequence[str],
+    ids: Optional[Sequence[str]] = None,
+    volunteer_id: Optional[str] = None,
+    day: Optional[str] = None,
+    include_paid: bool = False,
+) -> Tuple[List[Any], List[str]]:
+    """
+    Moves every matching appointment to `status` with one UPDATE ...
+    RETURNING, in the caller's transaction. Appointments with linked
+    transactions (live or archived) are left as they are unless
+    `include_paid`: their payments need a decision (refund, credit) first.
+    Returns (updated rows with id/volunteer_id/date, skipped ids).
+    """
+    conditions = [Appointment.status.in_(from_statuses)]
+    if ids:
+        conditions.append(Appointment.id.in_(ids))
+    if volunteer_id:
+        conditions.append(Appointment.volunteer_id == volunteer_id)
+    if day:
+        conditions.append(Appointment.date == day)
+
+    skipped: List[str] = []
+    if not include_paid:
+        has_transactions = or_(
+            *(
+                select(model.id).where(model.appointment_id == Appointment.id).exists()
+                for model in TRANSACTION_MODELS
+            )
+        )
+        skipped = list(
+            session.exec(
+                select(Appointment.id).where(*conditions, has_transactions)
+            ).all()
+        )
+        conditions.append(~has_transactions)
+
+    updated = session.execute(
+        update(Appointment)
+        .where(*conditions)
+        .values(status=status)
+        .returning(Appointment.id, Appointment.volunteer_id, Appointment.date),
+        execution_options={"synchronize_session": False},
+    ).all()
+    return list(updated), skipped
+
+
+def backfill_slot_times(session: Session, batch_size: int = 500) -> List[str]:
+    """
+    Fills starts_at/ends_at of appointments written before they existed, in
+    the caller's transaction. Returns the ids whose date/time could not be
+    parsed (left NULL, so they never block a slot).
+    """
+    invalid: List[str] = []
+    last_id = ""
+    while True:
+        rows = session.exec(
+            select(
+                Appointment.id, Appointment.date, Appointment.time, Appointment.duration
+            )
+            .where(Appointment.starts_at.is_(None), Appointment.id > last_id)
+            .order_by(Appointment.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return invalid
+        values = []
+        for appointment_id, day, start, duration in rows:
+            try:
+                starts_at, ends_at = slot_bounds(day, start, duration or 60)
+            except (TypeError, ValueError):
+                invalid.append(appointment_id)
+                continue
+            values.append(
+                {"id": appointment_id, "starts_at": starts_at, "ends_at": ends_at}
+            )
+        if values:
+            session.execute(update(Appointment), values)
+        last_id = rows[-1][0]
+        print(f"[Appointments] slot times filled up to id {last_id}")
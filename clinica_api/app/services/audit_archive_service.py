@@ -0,0 +1,524 @@
+import gzip
+import heapq
+import json
+import os
+import re
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import (Column, MetaData, Table, and_, delete, func, insert,
+                        inspect, literal_column, select, tuple_)
+from sqlmodel import Session, text
+
+from app.core.config import settings
+from app.core.database import engine
+from app.core.scheduler import scheduler
+from app.models.audit_model import (DETAILS_INDEXES, AuditLog,
+                                    add_details_indexes)
+from app.schemas.audit import normalize_details
+from app.services.job_run_service import run_once
+from app.utils.dates import add_months, month_start
+
+AUDIT_TABLE = AuditLog.__tablename__
+PARTITION_RE = re.compile(r"^audit_logs_(\d{4})_(\d{2})$")
+
+ARCHIVE_DIR = Path(settings.AUDIT_ARCHIVE_DIR)
+ARCHIVE_INDEX = "index.json"
+ARCHIVE_JOB_ID = "audit_archive"
+
+
+def partition_name(month: date) -> str:
+    return f"{AUDIT_TABLE}_{month:%Y_%m}"
+
+
+def _month_overlaps(
+    month: date, start: Optional[datetime], end: Optional[datetime]
+) -> bool:
+    if start and datetime.combine(add_months(month, 1), datetime.min.time()) <= start:
+        return False
+    if end and datetime.combine(month, datetime.min.time()) >= end:
+        return False
+    return True
+
+
+def _partition_table(name: str) -> Table:
+    """Copy of the audit_logs definition under a monthly table name."""
+    dialect_only = {index.name for index in DETAILS_INDEXES}
+    table = AuditLog.__table__.to_metadata(MetaData(), name=name)
+    for index in list(table.indexes):
+        if index.name in dialect_only:
+            # Copied without its ddl_if: rebuilt below for its own dialect
+            table.indexes.discard(index)
+        elif not index.name.startswith(f"ix_{name}_"):
+            index.name = index.name.replace(AUDIT_TABLE, name, 1)
+    add_details_indexes(table)
+    return table
+
+
+def _reflect(session: Session, name: str) -> Table:
+    """Columns of an existing monthly table, which may predate newer
+    audit_logs columns. Indexes are left out: maintenance only reads,
+    copies and drops these tables."""
+    columns = inspect(session.connection()).get_columns(name)
+    return Table(name, MetaData(), *(Column(c["name"], c["type"]) for c in columns))
+
+
+def _serialize(row: Dict[str, Any]) -> Dict[str, Any]:
+    data = dict(row)
+    for key, value in data.items():
+        if isinstance(value, datetime):
+            data[key] = value.isoformat()
+    return data
+
+
+def _deserialize(data: Dict[str, Any]) -> AuditLog:
+    if isinstance(data.get("timestamp"), str):
+        data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+    return _to_log(data)
+
+
+def _to_log(data) -> AuditLog:
+    """Row/archive mapping to AuditLog; legacy text details become dicts."""
+    data = dict(data)
+    data["details"] = normalize_details(data.get("details"))
+    return AuditLog(**data)
+
+
+def _load_index() -> List[Dict[str, Any]]:
+    path = ARCHIVE_DIR / ARCHIVE_INDEX
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("files", [])
+
+
+def _save_index(entries: List[Dict[str, Any]]):
+    path = ARCHIVE_DIR / ARCHIVE_INDEX
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"files": entries}, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _sort_key(log: AuditLog) -> Tuple[datetime, int]:
+    return (log.timestamp, log.id or 0)
+
+
+def _entry_bound(entry: Dict[str, Any]) -> Tuple[datetime, int]:
+    """Upper bound of the (timestamp, id) keys stored in an archive file."""
+    return (datetime.fromisoformat(entry["last_timestamp"]), entry["max_id"])
+
+
+def _details_conditions(table, dialect: str, filters: Dict[str, Any]) -> list:
+    """
+    Predicates on `details` written to hit the indexes: containment (GIN,
+    jsonb_path_ops) on Postgres, the json_extract expression index on SQLite.
+    """
+    status, changed = filters.get("status"), filters.get("changed")
+    details = table.c.details
+    if dialect == "postgresql":
+        conditions = []
+        if status is not None:
+            conditions.append(details.contains({"status": status}))
+        if changed:
+            conditions.append(details.contains({"changes": [changed]}))
+        return conditions
+
+    conditions = []
+    if status is not None:
+        # Literal path: must match the indexed expression text exactly
+        conditions.append(
+            func.json_extract(details, literal_column("'$.status'")) == status
+        )
+    if changed:
+        changes = func.json_each(details, literal_column("'$.changes'")).table_valued(
+            "value"
+        )
+        conditions.append(
+            select(changes.c.value).where(changes.c.value == changed).exists()
+        )
+    return conditions
+
+
+def _conditions(table, filters: Dict[str, Any], dialect: str) -> list:
+    """SQL predicates for the filters shared by listing and export."""
+    conditions = []
+    for key in ("user_id", "resource", "resource_id", "action"):
+        if filters.get(key):
+            conditions.append(table.c[key] == filters[key])
+    if filters.get("start"):
+        conditions.append(table.c.timestamp >= filters["start"])
+    if filters.get("end"):
+        conditions.append(table.c.timestamp < filters["end"])
+    conditions.extend(_details_conditions(table, dialect, filters))
+    return conditions
+
+
+def _matches(log: AuditLog, filters: Dict[str, Any]) -> bool:
+    """Same filters as `_conditions`, applied to archived rows in Python."""
+    for key in ("user_id", "resource", "resource_id", "action"):
+        if filters.get(key) and getattr(log, key) != filters[key]:
+            return False
+    if filters.get("start") and log.timestamp < filters["start"]:
+        return False
+    if filters.get("end") and log.timestamp >= filters["end"]:
+        return False
+    details = log.details or {}
+    status = filters.get("status")
+    if status is not None and details.get("status") != status:
+        return False
+    if filters.get("changed") and filters["changed"] not in (
+        details.get("changes") or []
+    ):
+        return False
+    return True
+
+
+class AuditArchiveService:
+    """
+    Monthly partitioning and archival of `audit_logs`.
+
+    - PostgreSQL (after `scripts/partition_audit_logs.py`): `audit_logs` is a
+      declaratively partitioned table with one `audit_logs_YYYY_MM` partition
+      per month, created ahead of time by `ensure_partitions`.
+    - SQLite (or a non-partitioned Postgres table): `rollover` moves rows of
+      closed months into `audit_logs_YYYY_MM` tables.
+
+    Months older than `AUDIT_LIVE_MONTHS` are written to gzip NDJSON files
+    listed in `index.json` and dropped from the database. `query_logs` reads
+    the live table, the monthly tables and the archives together.
+    """
+
+    @staticmethod
+    def is_partitioned(session: Session) -> bool:
+        if session.get_bind().dialect.name != "postgresql":
+            return False
+        row = session.connection().execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"
+            ),
+            {"t": AUDIT_TABLE},
+        )
+        return row.first() is not None
+
+    @staticmethod
+    def list_partitions(session: Session) -> List[Tuple[date, str]]:
+        partitions = []
+        for name in inspect(session.connection()).get_table_names():
+            match = PARTITION_RE.match(name)
+            if match:
+                partitions.append((date(int(match[1]), int(match[2]), 1), name))
+        return sorted(partitions)
+
+    @staticmethod
+    def ensure_partitions(session: Session, today: date):
+        """Creates the current and next month partitions on Postgres."""
+        if not AuditArchiveService.is_partitioned(session):
+            return
+
+        connection = session.connection()
+        for offset in (0, 1):
+            month = add_months(month_start(today), offset)
+            connection.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+                    f"PARTITION OF {AUDIT_TABLE} "
+                    f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+                )
+            )
+        session.commit()
+
+    @staticmethod
+    def rollover(session: Session, today: date) -> List[str]:
+        """Moves rows of closed months out of the live table (SQLite fallback)."""
+        if AuditArchiveService.is_partitioned(session):
+            return []
+
+        live = AuditLog.__table__
+        current = datetime.combine(month_start(today), datetime.min.time())
+        connection = session.connection()
+        moved = []
+
+        while True:
+            oldest = connection.execute(
+                select(func.min(live.c.timestamp)).where(live.c.timestamp < current)
+            ).scalar()
+            if oldest is None:
+                break
+
+            month = month_start(oldest)
+            in_month = and_(
+                live.c.timestamp >= datetime.combine(month, datetime.min.time()),
+                live.c.timestamp
+                < datetime.combine(add_months(month, 1), datetime.min.time()),
+            )
+
+            name = partition_name(month)
+            if inspect(connection).has_table(name):
+                # May predate newer audit_logs columns: copy the shared ones
+                table = _reflect(session, name)
+            else:
+                table = _partition_table(name)
+                table.create(connection)
+
+            columns = [c.name for c in live.columns if c.name in table.c]
+            connection.execute(
+                insert(table).from_select(
+                    columns,
+                    select(*[live.c[c] for c in columns]).where(in_month),
+                )
+            )
+            connection.execute(delete(live).where(in_month))
+            session.commit()
+
+            connection = session.connection()
+            moved.append(table.name)
+            print(f"Audit Rollover: moved {month:%Y-%m} to {table.name}", flush=True)
+
+        return moved
+
+    @staticmethod
+    def archive_closed_months(
+        session: Session, today: date, keep_months: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Writes monthly tables older than the retention window to gzip NDJSON."""
+        keep = settings.AUDIT_LIVE_MONTHS if keep_months is None else keep_months
+        cutoff = add_months(month_start(today), -keep)
+        partitioned = AuditArchiveService.is_partitioned(session)
+        archived = []
+
+        ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+
+        for month, name in AuditArchiveService.list_partitions(session):
+            if month >= cutoff:
+                continue
+
+            table = _reflect(session, name)
+            rows = session.connection().execute(
+                select(table)
+                .order_by(table.c.timestamp, table.c.id)
+                .execution_options(yield_per=1000)
+            )
+            entry = AuditArchiveService._write_archive(month, rows)
+            if entry:
+                archived.append(entry)
+
+            connection = session.connection()
+            if partitioned:
+                connection.execute(
+                    text(f"ALTER TABLE {AUDIT_TABLE} DETACH PARTITION {name}")
+                )
+            table.drop(connection)
+            session.commit()
+            print(f"Audit Archive: {name} archived and dropped", flush=True)
+
+        return archived
+
+    @staticmethod
+    def _write_archive(month: date, rows) -> Optional[Dict[str, Any]]:
+        index = _load_index()
+        label = f"{month:%Y-%m}"
+        chunk = sum(1 for e in index if e["month"] == label)
+        suffix = f".{chunk}" if chunk else ""
+        filename = f"{partition_name(month)}{suffix}.ndjson.gz"
+        tmp = ARCHIVE_DIR / f"{filename}.tmp"
+
+        count = 0
+        first = last = None
+        min_id = max_id = None
+        user_ids, resources = set(), set()
+
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for row in rows:
+                data = _serialize(row._mapping)
+                f.write(json.dumps(data, ensure_ascii=False) + "\n")
+                count += 1
+                first = first or data["timestamp"]
+                last = data["timestamp"]
+                min_id = data["id"] if min_id is None else min(min_id, data["id"])
+                max_id = data["id"] if max_id is None else max(max_id, data["id"])
+                user_ids.add(data["user_id"])
+                resources.add(data["resource"])
+
+        entry = {
+            "month": label,
+            "file": filename,
+            "rows": count,
+            "first_timestamp": first,
+            "last_timestamp": last,
+            "min_id": min_id,
+            "max_id": max_id,
+            "user_ids": sorted(user_ids),
+            "resources": sorted(resources),
+        }
+
+        # Re-run after a crash between writing the file and dropping the table
+        already_archived = any(
+            e["month"] == label
+            and (e["rows"], e["min_id"], e["max_id"]) == (count, min_id, max_id)
+            for e in index
+        )
+        if count == 0 or already_archived:
+            tmp.unlink()
+            return None
+
+        os.replace(tmp, ARCHIVE_DIR / filename)
+        index.append(entry)
+        _save_index(index)
+        return entry
+
+    @staticmethod
+    def _archive_entries(filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Index entries that may contain rows matching the filters."""
+        entries = []
+        for entry in _load_index():
+            if filters.get("start") and (
+                datetime.fromisoformat(entry["last_timestamp"]) < filters["start"]
+            ):
+                continue
+            if filters.get("end") and (
+                datetime.fromisoformat(entry["first_timestamp"]) >= filters["end"]
+            ):
+                continue
+            if filters.get("user_id") and filters["user_id"] not in entry["user_ids"]:
+                continue
+            if (
+                filters.get("resource")
+                and filters["resource"] not in entry["resources"]
+            ):
+                continue
+            entries.append(entry)
+        return entries
+
+    @staticmethod
+    def _iter_archive_file(entry: Dict[str, Any], filters: Dict[str, Any]):
+        with gzip.open(ARCHIVE_DIR / entry["file"], "rt", encoding="utf-8") as f:
+            for line in f:
+                log = _deserialize(json.loads(line))
+                if _matches(log, filters):
+                    yield log
+
+    @staticmethod
+    def _tables(session: Session, filters: Dict[str, Any]) -> List[Table]:
+        """Live table plus the monthly tables overlapping the date range."""
+        tables = [AuditLog.__table__]
+        if not AuditArchiveService.is_partitioned(session):
+            # Built from the model: no reflection round trips per request
+            tables += [
+                _partition_table(name)
+                for month, name in AuditArchiveService.list_partitions(session)
+                if _month_overlaps(month, filters.get("start"), filters.get("end"))
+            ]
+        return tables
+
+    @staticmethod
+    def query_logs(
+        session: Session,
+        limit: int = 100,
+        before: Optional[Tuple[datetime, int]] = None,
+        **filters,
+    ) -> List[AuditLog]:
+        """
+        Newest-first page over live rows, monthly tables and archives.
+        Filters: user_id, resource, resource_id, action, start, end
+        (exclusive), status and changed (keys inside `details`).
+        `before` is the (timestamp, id) keyset cursor.
+        """
+        dialect = session.get_bind().dialect.name
+        results = []
+        for table in AuditArchiveService._tables(session, filters):
+            query = select(table).where(*_conditions(table, filters, dialect))
+            if before:
+                query = query.where(tuple_(table.c.timestamp, table.c.id) < before)
+            query = query.order_by(
+                table.c.timestamp.desc(), table.c.id.desc()
+            ).limit(limit)
+            rows = session.connection().execute(query)
+            results.extend(_to_log(row._mapping) for row in rows)
+
+        # Newest archive first; no row of an entry is newer than its bound
+        entries = sorted(
+            (
+                (_entry_bound(entry), entry)
+                for entry in AuditArchiveService._archive_entries(filters)
+                if not before
+                or (datetime.fromisoformat(entry["first_timestamp"]), entry["min_id"])
+                < before
+            ),
+            key=lambda item: item[0],
+            reverse=True,
+        )
+        for bound, entry in entries:
+            # A full page is newer than anything left: skip the older files
+            if sum(1 for log in results if _sort_key(log) > bound) >= limit:
+                break
+            archived = (
+                log
+                for log in AuditArchiveService._iter_archive_file(entry, filters)
+                if not before or _sort_key(log) < before
+            )
+            results.extend(heapq.nlargest(limit, archived, key=_sort_key))
+
+        results.sort(key=_sort_key, reverse=True)
+        return results[:limit]
+
+    @staticmethod
+    def iter_logs(
+        session: Session, batch_size: int = 500, **filters
+    ) -> Iterator[AuditLog]:
+        """
+        Oldest-first stream over every source for exports. Database rows come
+        from server-side cursors (yield_per) and archives are read line by
+        line, so memory stays flat regardless of the period size.
+        """
+        dialect = session.get_bind().dialect.name
+        streams = [
+            AuditArchiveService._iter_archive_file(entry, filters)
+            for entry in AuditArchiveService._archive_entries(filters)
+        ]
+        for table in AuditArchiveService._tables(session, filters):
+            query = (
+                select(table)
+                .where(*_conditions(table, filters, dialect))
+                .order_by(table.c.timestamp, table.c.id)
+                .execution_options(yield_per=batch_size)
+            )
+            rows = session.connection().execute(query)
+            streams.append(_to_log(row._mapping) for row in rows)
+
+        return heapq.merge(*streams, key=_sort_key)
+
+    @staticmethod
+    def maintain(session: Session, today: date) -> Dict[str, Any]:
+        AuditArchiveService.ensure_partitions(session, today)
+        moved = AuditArchiveService.rollover(session, today)
+        archived = AuditArchiveService.archive_closed_months(session, today)
+        return {"rolled_over": moved, "archived": [e["file"] for e in archived]}
+
+    @staticmethod
+    def run_maintenance(today: Optional[date] = None):
+        """Scheduled in every worker; only the one that claims the day runs
+        it, so the workers never race on rollover, archive files or DROP."""
+        today = today or date.today()
+        try:
+            with Session(engine) as session:
+                run_once(
+                    session,
+                    ARCHIVE_JOB_ID,
+                    today.isoformat(),
+                    lambda: AuditArchiveService.maintain(session, today),
+                )
+        except Exception as e:
+            print(f"ERROR: Audit archive maintenance failed: {e}", flush=True)
+
+    @staticmethod
+    def schedule():
+        scheduler.add_job(
+            AuditArchiveService.run_maintenance,
+            CronTrigger(hour=2, minute=30),
+            id=ARCHIVE_JOB_ID,
+            replace_existing=True,
+        )
+        print("Audit Archive Scheduled: DAILY at 02:30", flush=True)
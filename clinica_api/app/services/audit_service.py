@@ -1,9 +1,153 @@
-import json
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
 
-from sqlmodel import Session
+from sqlalchemy import delete, update
+from sqlmodel import Session, select
 
-from app.models.audit_model import AuditLog
+from app.core.config import settings
+from app.core.database import upsert
+from app.models.audit_model import AuditLog, AuditRollupDaily, AuditRollupHourly
 from app.models.user_model import User
+from app.services.audit_archive_service import AuditArchiveService
+
+ROLLUP_KEYS = ("bucket", "user_id", "resource", "action")
+
+
+def _buckets(timestamp: datetime):
+    hour = timestamp.replace(minute=0, second=0, microsecond=0)
+    return ((AuditRollupHourly, hour), (AuditRollupDaily, hour.replace(hour=0)))
+
+
+def record_activity(
+    session: Session,
+    user_id: str,
+    user_name: Optional[str],
+    resource: str,
+    action: str,
+    timestamp: Optional[datetime] = None,
+    hits: int = 1,
+):
+    """
+    Increments the hourly and daily activity rollups in the caller's
+    transaction (one upsert per table, no read of `audit_logs`).
+    """
+    for model, bucket in _buckets(timestamp or datetime.now()):
+        upsert(
+            session,
+            model,
+            [
+                {
+                    "bucket": bucket,
+                    "user_id": user_id,
+                    "resource": resource,
+                    "action": action,
+                    "user_name": user_name,
+                    "count": hits,
+                }
+            ],
+            key_columns=ROLLUP_KEYS,
+            increment_columns=("count",),
+            replace_columns=("user_name",),
+        )
+
+
+def coalesce_access(
+    session: Session,
+    user_id: str,
+    resource: str,
+    resource_id: Optional[str],
+    action: str,
+    now: Optional[datetime] = None,
+    window_seconds: Optional[int] = None,
+) -> bool:
+    """
+    Folds a repeated read into the latest identical row opened less than
+    `AUDIT_COALESCE_SECONDS` ago (hit_count + 1, last_seen_at = now).
+    Returns False when there is no such row and a new one must be written.
+    """
+    window = (
+        settings.AUDIT_COALESCE_SECONDS if window_seconds is None else window_seconds
+    )
+    if window <= 0:
+        return False
+
+    now = now or datetime.now()
+    same_resource = (
+        AuditLog.resource_id == resource_id
+        if resource_id is not None
+        else AuditLog.resource_id.is_(None)
+    )
+    latest = (
+        select(AuditLog.id)
+        .where(
+            AuditLog.user_id == user_id,
+            AuditLog.resource == resource,
+            same_resource,
+            AuditLog.action == action,
+            AuditLog.timestamp >= now - timedelta(seconds=window),
+        )
+        .order_by(AuditLog.timestamp.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    result = session.connection().execute(
+        update(AuditLog)
+        .where(AuditLog.id == latest)
+        .values(hit_count=AuditLog.hit_count + 1, last_seen_at=now)
+    )
+    return result.rowcount > 0
+
+
+def rebuild_activity_rollups(
+    session: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Backfill: recomputes the rollups for whole days in [start, end) from the
+    raw trail (live rows, monthly tables and archives).
+    """
+    midnight = {"hour": 0, "minute": 0, "second": 0, "microsecond": 0}
+    if start:
+        start = start.replace(**midnight)
+    if end and end != end.replace(**midnight):
+        end = end.replace(**midnight) + timedelta(days=1)
+
+    counts = {AuditRollupHourly: Counter(), AuditRollupDaily: Counter()}
+    names = {}
+    for log in AuditArchiveService.iter_logs(session, start=start, end=end):
+        names[log.user_id] = log.user_name
+        for model, bucket in _buckets(log.timestamp):
+            key = (bucket, log.user_id, log.resource, log.action)
+            counts[model][key] += log.hit_count or 1
+
+    total = 0
+    for model, counter in counts.items():
+        query = delete(model)
+        if start:
+            query = query.where(model.bucket >= start)
+        if end:
+            query = query.where(model.bucket < end)
+        session.connection().execute(query)
+
+        rows = [
+            dict(zip(ROLLUP_KEYS, key), user_name=names.get(key[1]), count=count)
+            for key, count in counter.items()
+        ]
+        for i in range(0, len(rows), batch_size):
+            upsert(
+                session,
+                model,
+                rows[i : i + batch_size],
+                key_columns=ROLLUP_KEYS,
+                increment_columns=("count",),
+            )
+        total += len(rows)
+
+    session.commit()
+    return total
 
 
 def create_audit_log(
@@ -28,7 +172,7 @@ def create_audit_log(
             action=action,
             resource=resource,
             resource_id=str(resource_id) if resource_id else None,
-            details=json.dumps(details) if details else None,
+            details=details or None,
         )
         print(
             f"DEBUG AUDIT SERVICE: Created log for {action} on {resource} by {user_name}"
@@ -40,5 +184,13 @@ def create_audit_log(
         # Let's let the caller commit or we commit user specific logs?
         # For simplicity and consistency with transaction, we add to session.
         session.add(log_entry)
+        record_activity(
+            session,
+            log_entry.user_id,
+            log_entry.user_name,
+            resource,
+            action,
+            log_entry.timestamp,
+        )
     except Exception as e:
         print(f"Failed to create audit log: {e}")
@@ -0,0 +1,120 @@
+import unicodedata
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlmodel import Session, select
+
+from app.models.appointment_model import (INACTIVE_STATUSES,
+                                          MAX_DURATION_MINUTES, Appointment)
+from app.models.volunteer_model import Volunteer
+from app.utils.dates import day_range, hhmm_to_minutes, minutes_to_hhmm
+
+MAX_DURATION = timedelta(minutes=MAX_DURATION_MINUTES)
+
+# date.weekday() order
+WEEKDAYS = ("segunda", "terca", "quarta", "quinta", "sexta", "sabado", "domingo")
+
+
+def _weekday_index(day_name: str) -> Optional[int]:
+    # "Terça" / "terca" / " SÁBADO " all map to the same weekday
+    plain = unicodedata.normalize("NFKD", day_name.strip().lower())
+    plain = "".join(c for c in plain if not unicodedata.combining(c))
+    plain = plain.split("-")[0]  # "segunda-feira"
+    return WEEKDAYS.index(plain) if plain in WEEKDAYS else None
+
+
+@lru_cache(maxsize=512)
+def _compile(
+    availability: Tuple[Tuple[str, str, str], ...], duration: int
+) -> Tuple[Tuple[int, ...], ...]:
+    slots: List[set] = [set() for _ in WEEKDAYS]
+    for day_name, start, end in availability:
+        weekday = _weekday_index(day_name)
+        if weekday is None:
+            continue
+        # Same grid as the agenda screen: a slot every `duration` minutes
+        # starting inside the window
+        current, stop = hhmm_to_minutes(start), hhmm_to_minutes(end)
+        while current < stop:
+            slots[weekday].add(current)
+            current += duration
+    return tuple(tuple(sorted(day)) for day in slots)
+
+
+def compile_availability(volunteer: Volunteer) -> Tuple[Tuple[int, ...], ...]:
+    """Slot start minutes per weekday (Monday = 0) for the volunteer's
+    weekly availability. Compiled once per distinct availability."""
+    key = tuple(
+        (str(a.get("day", "")), str(a.get("start", "")), str(a.get("end", "")))
+        for a in volunteer.availability or []
+        if a.get("day") and a.get("start") and a.get("end")
+    )
+    return _compile(key, volunteer.appointment_duration or 60)
+
+
+def _booked_by_day(
+    session: Session, volunteer_ids: Sequence[str], start: date, end: date
+) -> Dict[Tuple[str, str], List[Tuple[int, int]]]:
+    """Booked [start, end) minutes per (volunteer_id, 'YYYY-MM-DD') in one
+    range query on ix_appointments_volunteer_starts_at."""
+    first, last = day_range(start, end)
+    rows = session.exec(
+        select(Appointment.volunteer_id, Appointment.starts_at, Appointment.ends_at)
+        .where(
+            Appointment.volunteer_id.in_(volunteer_ids),
+            # Appointments still running at midnight of the first day
+            Appointment.starts_at > first - MAX_DURATION,
+            Appointment.starts_at < last,
+            Appointment.status.not_in(INACTIVE_STATUSES),
+        )
+    ).all()
+    booked: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+    for volunteer_id, starts_at, ends_at in rows:
+        # Split at midnight so each day gets its own minutes
+        day = starts_at.date()
+        while day <= ends_at.date():
+            midnight = datetime.combine(day, datetime.min.time())
+            begin = max(0, int((starts_at - midnight).total_seconds() // 60))
+            finish = min(24 * 60, int((ends_at - midnight).total_seconds() // 60))
+            if finish > begin:
+                booked.setdefault((volunteer_id, day.isoformat()), []).append(
+                    (begin, finish)
+                )
+            day += timedelta(days=1)
+    return booked
+
+
+def _free_slots(
+    grid: Iterable[int], booked: Iterable[Tuple[int, int]], duration: int
+) -> List[str]:
+    booked = list(booked)
+    return [
+        minutes_to_hhmm(start)
+        for start in grid
+        if not any(b < start + duration and start < e for b, e in booked)
+    ]
+
+
+def free_slots(
+    session: Session, volunteers: Sequence[Volunteer], start: date, end: date
+) -> Dict[str, Dict[date, List[str]]]:
+    """
+    Free slot times per volunteer and day in [start, end], from a single
+    appointments query. Not cached across requests: each gunicorn worker
+    would keep its own copy and miss bookings made through the others.
+    """
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    booked = _booked_by_day(session, [v.id for v in volunteers], start, end)
+    result: Dict[str, Dict[date, List[str]]] = {}
+    for volunteer in volunteers:
+        grid = compile_availability(volunteer)
+        result[volunteer.id] = {
+            day: _free_slots(
+                grid[day.weekday()],
+                booked.get((volunteer.id, day.isoformat()), []),
+                volunteer.appointment_duration or 60,
+            )
+            for day in days
+        }
+    return result
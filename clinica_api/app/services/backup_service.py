@@ -3,12 +3,12 @@ import subprocess
 from datetime import datetime
 from pathlib import Path
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from cryptography.fernet import Fernet
 from sqlmodel import Session, select
 
 from app.core.database import engine
+from app.core.scheduler import scheduler, start_scheduler
 from app.core.security_fields import STABLE_KEY
 from app.models.clinic_settings import ClinicSettings
 
@@ -19,7 +19,7 @@ BACKUP_DIR.mkdir(exist_ok=True)
 # For now, using STABLE_KEY to ensure we can decrypt it later with the same app.
 cipher = Fernet(STABLE_KEY)
 
-scheduler = BackgroundScheduler()
+BACKUP_JOB_ID = "backup"
 
 
 class BackupService:
@@ -109,14 +109,13 @@ class BackupService:
 
     @staticmethod
     def start_scheduler():
-        if not scheduler.running:
-            scheduler.start()
-            print("Backup Scheduler Started", flush=True)
-            BackupService.reschedule_jobs()
+        start_scheduler()
+        BackupService.reschedule_jobs()
 
     @staticmethod
     def reschedule_jobs():
-        scheduler.remove_all_jobs()
+        if scheduler.get_job(BACKUP_JOB_ID):
+            scheduler.remove_job(BACKUP_JOB_ID)
 
         with Session(engine) as session:
             settings = session.exec(select(ClinicSettings)).first()
@@ -142,4 +141,6 @@ class BackupService:
                 print(f"Backup Scheduled: WEEKLY (Sun) at {hour}:{minute}", flush=True)
 
             if trigger:
-                scheduler.add_job(BackupService.perform_backup, trigger)
+                scheduler.add_job(
+                    BackupService.perform_backup, trigger, id=BACKUP_JOB_ID
+                )
@@ -0,0 +1,124 @@
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import Date, delete, func, insert, literal
+from sqlmodel import Session, select
+
+from app.core.database import engine
+from app.core.scheduler import scheduler
+from app.models.appointment_model import (Appointment, AppointmentDailySummary,
+                                          AppointmentStatus)
+from app.models.job_model import ScheduledJobRun
+from app.services.appointment_service import bulk_transition
+from app.services.audit_service import create_audit_log
+from app.services.job_run_service import run_once
+
+DAY_CLOSE_JOB_ID = "day_close"
+# Days looked back for closes missed while the server was down
+CATCH_UP_DAYS = 7
+# Still waiting for the patient when the day ended: nobody showed up
+STALE_STATUSES = (
+    AppointmentStatus.SCHEDULED,
+    AppointmentStatus.CONFIRMED,
+    AppointmentStatus.NOT_STARTED,
+)
+SYSTEM_USER = {"id": "system", "name": "Sistema"}
+
+
+class DayCloseService:
+    """
+    Nightly close of the clinic day: appointments still open once their
+    day has passed become `absent`, and the day's counts per volunteer and
+    status are written to `appointment_daily_summary`. Each day is closed
+    by a single worker (see job_run_service.run_once).
+    """
+
+    @staticmethod
+    def close_day(session: Session, day: date) -> Dict[str, Any]:
+        """Closes one day in a single transaction. Safe to re-run: the
+        summary is rebuilt from scratch."""
+        label = day.isoformat()
+        absent, _ = bulk_transition(
+            session,
+            AppointmentStatus.ABSENT,
+            STALE_STATUSES,
+            day=label,
+            include_paid=True,
+        )
+        absent_ids = [row.id for row in absent]
+        if absent_ids:
+            create_audit_log(
+                session,
+                SYSTEM_USER,
+                "BULK_STATUS",
+                "Appointment",
+                details={
+                    "new_status": AppointmentStatus.ABSENT,
+                    "count": len(absent_ids),
+                    "ids": absent_ids,
+                    "filters": {"date": label},
+                    "reason": "Fechamento do dia",
+                },
+            )
+
+        summary = AppointmentDailySummary.__table__
+        session.execute(delete(summary).where(summary.c.day == day))
+        volunteer = func.coalesce(Appointment.volunteer_id, "")
+        session.execute(
+            insert(summary).from_select(
+                ["day", "volunteer_id", "status", "count"],
+                select(
+                    literal(day, type_=Date).label("day"),
+                    volunteer,
+                    Appointment.status,
+                    func.count(),
+                )
+                .where(Appointment.date == label)
+                .group_by(volunteer, Appointment.status),
+            )
+        )
+        session.commit()
+        print(f"Day Close: {label} closed, {len(absent_ids)} absent", flush=True)
+        return {"absent": len(absent_ids)}
+
+    @staticmethod
+    def pending_days(session: Session, today: date) -> List[date]:
+        """Past days of the catch-up window without a finished close."""
+        first = today - timedelta(days=CATCH_UP_DAYS)
+        closed = set(
+            session.exec(
+                select(ScheduledJobRun.run_key).where(
+                    ScheduledJobRun.job_id == DAY_CLOSE_JOB_ID,
+                    ScheduledJobRun.run_key >= first.isoformat(),
+                    ScheduledJobRun.finished_at.is_not(None),
+                )
+            ).all()
+        )
+        days = [first + timedelta(days=i) for i in range(CATCH_UP_DAYS)]
+        return [day for day in days if day.isoformat() not in closed]
+
+    @staticmethod
+    def run(today: Optional[date] = None):
+        today = today or date.today()
+        try:
+            with Session(engine) as session:
+                for day in DayCloseService.pending_days(session, today):
+                    run_once(
+                        session,
+                        DAY_CLOSE_JOB_ID,
+                        day.isoformat(),
+                        lambda: DayCloseService.close_day(session, day),
+                    )
+        except Exception as e:
+            print(f"ERROR: Day close failed: {e}", flush=True)
+
+    @staticmethod
+    def schedule():
+        scheduler.add_job(
+            DayCloseService.run,
+            CronTrigger(hour=0, minute=15),
+            id=DAY_CLOSE_JOB_ID,
+            replace_existing=True,
+        )
+        print("Day Close Scheduled: DAILY at 00:15", flush=True)
@@ -0,0 +1,487 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (Date, String, and_, case, cast, delete, insert,
+                        literal, or_, tuple_, union_all, update)
+from sqlmodel import Session, func, select
+
+from app.core.database import upsert
+from app.models.appointment_model import Appointment, AppointmentStatus
+from app.models.patient_model import Patient
+from app.models.transaction_model import (FinancialDailyRollup,
+                                          FinancialPeriod, Transaction,
+                                          TransactionArchive, TransactionType)
+from app.utils.dates import add_months, day_range, month_start
+
+ROLLUP_KEYS = ("day", "type", "payment_method")
+
+# Hot table first; closed months live in the archive with the same columns
+TRANSACTION_MODELS = (Transaction, TransactionArchive)
+TRANSACTION_COLUMNS = [c.name for c in Transaction.__table__.columns]
+
+
+def record_transaction(session: Session, transaction: Transaction, sign: int = 1):
+    """
+    Applies a transaction to the daily rollup in the caller's transaction:
+    sign=1 when it is written, -1 when it is removed (or before an edit).
+    """
+    record_transactions(session, [transaction], sign)
+
+
+def record_transactions(session: Session, transactions: Iterable[Any], sign: int = 1):
+    """
+    Bulk form of record_transaction for anything with date/type/
+    payment_method/amount (models or RETURNING rows). Deltas are summed per
+    rollup key first, so a single upsert never touches a key twice.
+    """
+    deltas: Dict[Tuple, List[float]] = {}
+    for tx in transactions:
+        key = (tx.date.date(), tx.type, tx.payment_method)
+        total = deltas.setdefault(key, [0.0, 0])
+        total[0] += tx.amount
+        total[1] += 1
+
+    upsert(
+        session,
+        FinancialDailyRollup,
+        [
+            {
+                "day": day,
+                "type": type_,
+                "payment_method": payment_method,
+                "total": sign * total,
+                "count": sign * count,
+            }
+            for (day, type_, payment_method), (total, count) in deltas.items()
+        ],
+        key_columns=ROLLUP_KEYS,
+        increment_columns=("total", "count"),
+    )
+
+
+def signed_amount(transaction: Transaction) -> float:
+    """Effect of a transaction on the amount paid for its appointment."""
+    if transaction.type == TransactionType.INCOME:
+        return transaction.amount
+    return -transaction.amount
+
+
+def apply_payment(session: Session, appointment_id: Optional[str], delta: float):
+    """
+    Adds `delta` to the appointment's amount_paid and derives payment_status
+    in a single UPDATE, in the caller's transaction. The database computes
+    the increment on the current row, so two cashiers paying the same
+    appointment at once cannot overwrite each other (Postgres re-reads the
+    locked row before applying it; SQLite serializes writers).
+    """
+    if not appointment_id:
+        return
+
+    price = func.coalesce(Appointment.price, 0.0)
+    new_paid = Appointment.amount_paid + delta
+    has_income = or_(
+        *(
+            select(model.id)
+            .where(
+                model.appointment_id == appointment_id,
+                model.type == TransactionType.INCOME,
+            )
+            .exists()
+            for model in TRANSACTION_MODELS
+        )
+    )
+    session.execute(
+        update(Appointment)
+        .where(Appointment.id == appointment_id)
+        .values(
+            amount_paid=new_paid,
+            # Same rules as recalculate_appointment_financials
+            payment_status=case(
+                (and_(price > 0, new_paid >= price - 0.01), "PAID"),
+                # Gratuidade: any income settles it
+                (and_(price == 0, has_income), "PAID"),
+                (new_paid > 0, "PARTIAL"),
+                else_="PENDING",
+            ),
+        ),
+        execution_options={"synchronize_session": "fetch"},
+    )
+
+
+def _write_rollup(
+    session: Session, start: Optional[date] = None, end: Optional[date] = None
+) -> int:
+    movements = union_all(
+        *(
+            select(model.date, model.type, model.payment_method, model.amount)
+            for model in TRANSACTION_MODELS
+        )
+    ).subquery("movements")
+    day = func.date(movements.c.date)
+    source = select(
+        day,
+        movements.c.type,
+        movements.c.payment_method,
+        func.sum(movements.c.amount),
+        func.count(),
+    ).group_by(day, movements.c.type, movements.c.payment_method)
+
+    clear = delete(FinancialDailyRollup)
+    start_at, end_at = day_range(start, end)
+    if start:
+        source = source.where(movements.c.date >= start_at)
+        clear = clear.where(FinancialDailyRollup.day >= start)
+    if end:
+        source = source.where(movements.c.date < end_at)
+        clear = clear.where(FinancialDailyRollup.day <= end)
+
+    connection = session.connection()
+    connection.execute(clear)
+    result = connection.execute(
+        insert(FinancialDailyRollup).from_select(
+            [*ROLLUP_KEYS, "total", "count"], source
+        )
+    )
+    return result.rowcount
+
+
+def rebuild_financial_rollup(
+    session: Session, start: Optional[date] = None, end: Optional[date] = None
+) -> int:
+    """
+    Backfill: recomputes the rollup for the days in [start, end] (inclusive)
+    from `transactions` and `transactions_archive` with one
+    INSERT ... SELECT ... GROUP BY.
+    """
+    rows = _write_rollup(session, start, end)
+    session.commit()
+    return rows
+
+
+def closed_months(session: Session, dates) -> set:
+    """Months (first day) among `dates` that belong to a closed period."""
+    months = {month_start(d) for d in dates if d}
+    if not months:
+        return set()
+    return set(
+        session.exec(
+            select(FinancialPeriod.month).where(
+                FinancialPeriod.month.in_(months),
+                FinancialPeriod.status == "CLOSED",
+            )
+        ).all()
+    )
+
+
+def _move_transactions(session: Session, source, target, month: date) -> int:
+    src, dst = source.__table__, target.__table__
+    in_month = and_(
+        src.c.date >= datetime.combine(month, datetime.min.time()),
+        src.c.date < datetime.combine(add_months(month, 1), datetime.min.time()),
+    )
+    connection = session.connection()
+    connection.execute(
+        insert(dst).from_select(
+            TRANSACTION_COLUMNS,
+            select(*[src.c[c] for c in TRANSACTION_COLUMNS]).where(in_month),
+        )
+    )
+    return connection.execute(delete(src).where(in_month)).rowcount
+
+
+def close_period(
+    session: Session, month: date, user_id: Optional[str] = None
+) -> FinancialPeriod:
+    """
+    Freezes a month: refreshes its daily rollup, moves its rows from
+    `transactions` to `transactions_archive` and marks it CLOSED. Edits to
+    the month are refused until `reopen_period`. Commits.
+    """
+    month = month_start(month)
+    if add_months(month, 1) > date.today():
+        # Transactions may still be posted to the current (or a future) month
+        raise ValueError(f"Período {month:%m/%Y} ainda não terminou")
+    period = session.get(FinancialPeriod, month) or FinancialPeriod(month=month)
+    if period.status == "CLOSED":
+        raise ValueError(f"Período {month:%m/%Y} já está fechado")
+
+    last_day = add_months(month, 1) - timedelta(days=1)
+    _write_rollup(session, month, last_day)
+    totals = dict(
+        session.exec(
+            select(FinancialDailyRollup.type, func.sum(FinancialDailyRollup.total))
+            .where(
+                FinancialDailyRollup.day >= month,
+                FinancialDailyRollup.day <= last_day,
+            )
+            .group_by(FinancialDailyRollup.type)
+        ).all()
+    )
+
+    period.transaction_count = _move_transactions(
+        session, Transaction, TransactionArchive, month
+    )
+    period.total_income = totals.get(TransactionType.INCOME) or 0.0
+    period.total_expense = totals.get(TransactionType.EXPENSE) or 0.0
+    period.status = "CLOSED"
+    period.closed_at = datetime.now()
+    period.closed_by = user_id
+    session.add(period)
+    session.commit()
+    session.refresh(period)
+    return period
+
+
+def reopen_period(session: Session, month: date) -> FinancialPeriod:
+    """Moves a closed month back to `transactions` so it can be edited. Commits."""
+    month = month_start(month)
+    period = session.get(FinancialPeriod, month)
+    if not period or period.status != "CLOSED":
+        raise ValueError(f"Período {month:%m/%Y} não está fechado")
+
+    _move_transactions(session, TransactionArchive, Transaction, month)
+    period.status = "OPEN"
+    period.closed_at = None
+    period.closed_by = None
+    session.add(period)
+    session.commit()
+    session.refresh(period)
+    return period
+
+
+def _ledger_source(patient_id: str):
+    """
+    Appointment charges and transactions (live and archived) of a patient
+    as one row set.
+    `sort_key` is a text timestamp ("YYYY-MM-DD HH:MM:SS"), comparable across
+    both sources; charges sort before payments made at the same instant.
+    """
+    charges = select(
+        (Appointment.date + " " + Appointment.time + ":00").label("sort_key"),
+        literal(0).label("rank"),
+        Appointment.id.label("id"),
+        literal("CHARGE").label("kind"),
+        literal("Consulta").label("description"),
+        Appointment.price.label("amount"),
+        Appointment.id.label("appointment_id"),
+    ).where(
+        Appointment.patient_id == patient_id,
+        Appointment.status != AppointmentStatus.CANCELLED,
+        Appointment.price > 0,
+    )
+
+    movements = []
+    for model in TRANSACTION_MODELS:
+        is_income = model.type == TransactionType.INCOME
+        movements.append(
+            select(
+                cast(model.date, String).label("sort_key"),
+                literal(1).label("rank"),
+                model.id.label("id"),
+                case((is_income, literal("PAYMENT")), else_=literal("REFUND")).label(
+                    "kind"
+                ),
+                model.description.label("description"),
+                case((is_income, -model.amount), else_=model.amount).label("amount"),
+                model.appointment_id.label("appointment_id"),
+            ).where(model.patient_id == patient_id)
+        )
+
+    return union_all(charges, *movements).subquery("ledger")
+
+
+def patient_ledger(
+    session: Session,
+    patient_id: str,
+    limit: int = 50,
+    after: Optional[Tuple[str, int, str]] = None,
+) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Chronological statement of a patient with the running balance computed
+    by a SQL window function, plus the outstanding balance.
+    `after` is the (sort_key, rank, id) keyset cursor of the previous page.
+    """
+    ledger = _ledger_source(patient_id)
+    order = (ledger.c.sort_key, ledger.c.rank, ledger.c.id)
+
+    # The window runs over the whole statement; the cursor filters afterwards
+    running = select(
+        ledger,
+        func.sum(ledger.c.amount).over(order_by=order).label("balance"),
+    ).subquery("running")
+
+    page = select(running).order_by(
+        running.c.sort_key, running.c.rank, running.c.id
+    )
+    if after:
+        page = page.where(
+            tuple_(running.c.sort_key, running.c.rank, running.c.id) > tuple_(*after)
+        )
+
+    connection = session.connection()
+    rows = connection.execute(page.limit(limit)).mappings().all()
+    outstanding = connection.execute(
+        select(func.coalesce(func.sum(ledger.c.amount), 0.0))
+    ).scalar()
+    return [dict(row) for row in rows], outstanding
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())  # Monday
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(bucket: date, granularity: str) -> date:
+    if granularity == "week":
+        return bucket + timedelta(days=7)
+    if granularity == "month":
+        return (bucket + timedelta(days=32)).replace(day=1)
+    return bucket + timedelta(days=1)
+
+
+def _bucket_expr(dialect: str, granularity: str, day):
+    """SQL expression truncating a date column to its day/week/month start."""
+    if granularity == "day":
+        return day
+    if dialect == "postgresql":
+        return cast(func.date_trunc(granularity, day), Date)
+    if granularity == "month":
+        return func.date(day, "start of month")
+    # SQLite: %w is 0 for Sunday, weeks start on Monday
+    return func.date(
+        day, "-" + cast((func.strftime("%w", day) + 6) % 7, String) + " days"
+    )
+
+
+def cash_flow_series(
+    session: Session, start: date, end: date, granularity: str = "day"
+) -> Dict[str, Any]:
+    """
+    Income/expense per bucket from the daily rollup, grouped in SQL, with
+    empty buckets filled with zeros. Returns parallel arrays for charts.
+    """
+    dialect = session.get_bind().dialect.name
+    rollup = FinancialDailyRollup
+    bucket = _bucket_expr(dialect, granularity, rollup.day).label("bucket")
+    rows = session.connection().execute(
+        select(bucket, rollup.type, rollup.payment_method, func.sum(rollup.total))
+        .where(rollup.day >= start, rollup.day <= end)
+        .group_by(bucket, rollup.type, rollup.payment_method)
+    )
+
+    buckets = []
+    current = bucket_start(start, granularity)
+    while current <= end:
+        buckets.append(current)
+        current = next_bucket(current, granularity)
+    position = {b: i for i, b in enumerate(buckets)}
+
+    income = [0.0] * len(buckets)
+    expense = [0.0] * len(buckets)
+    by_method: Dict[str, List[float]] = {}
+
+    for key, tx_type, method, total in rows:
+        if isinstance(key, str):
+            key = date.fromisoformat(key)
+        i = position[key]
+        if tx_type == TransactionType.INCOME:
+            income[i] += total
+            series = by_method.setdefault(method.value, [0.0] * len(buckets))
+            series[i] += total
+        else:
+            expense[i] += total
+
+    return {
+        "granularity": granularity,
+        "buckets": buckets,
+        "income": income,
+        "expense": expense,
+        "by_method": by_method,
+    }
+
+
+AGING_BUCKETS = (
+    ("days_0_30", 0, 30),
+    ("days_31_60", 31, 60),
+    ("days_61_90", 61, 90),
+    ("days_90_plus", 91, None),
+)
+
+
+def _aging_columns(as_of: date) -> list:
+    """
+    Open balance summed per age bucket. Appointment.date is "YYYY-MM-DD"
+    text, so the age bounds become plain string comparisons (index friendly
+    and the same on SQLite and Postgres).
+    """
+    outstanding = Appointment.price - Appointment.amount_paid
+    columns = []
+    for name, min_days, max_days in AGING_BUCKETS:
+        newest = (as_of - timedelta(days=min_days)).isoformat()
+        conditions = [Appointment.date <= newest]
+        if max_days is not None:
+            oldest = (as_of - timedelta(days=max_days)).isoformat()
+            conditions.append(Appointment.date >= oldest)
+        columns.append(
+            func.coalesce(
+                func.sum(case((and_(*conditions), outstanding), else_=0.0)), 0.0
+            ).label(name)
+        )
+    columns.append(func.coalesce(func.sum(outstanding), 0.0).label("total"))
+    return columns
+
+
+def _open_appointments(as_of: date) -> list:
+    return [
+        Appointment.payment_status.in_(("PENDING", "PARTIAL")),
+        Appointment.date <= as_of.isoformat(),
+        Appointment.status != AppointmentStatus.CANCELLED,
+        Appointment.price > 0,
+    ]
+
+
+def receivables_aging(
+    session: Session,
+    as_of: date,
+    limit: int = 50,
+    after: Optional[Tuple[float, str]] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Outstanding balances per patient split into 0-30/31-60/61-90/90+ days,
+    largest balance first. `after` is the (total, patient_id) cursor.
+    Returns the page and the clinic-wide totals.
+    """
+    columns = _aging_columns(as_of)
+    total = columns[-1]
+    query = (
+        select(
+            Appointment.patient_id,
+            func.max(Patient.name).label("patient_name"),
+            func.min(Appointment.date).label("oldest_date"),
+            *columns,
+        )
+        .outerjoin(Patient, Patient.id == Appointment.patient_id)
+        .where(*_open_appointments(as_of))
+        .group_by(Appointment.patient_id)
+        .having(func.sum(Appointment.price - Appointment.amount_paid) > 0.01)
+        .order_by(total.desc(), Appointment.patient_id)
+        .limit(limit)
+    )
+    if after:
+        balance = func.sum(Appointment.price - Appointment.amount_paid)
+        query = query.having(
+            or_(
+                balance < after[0],
+                and_(balance == after[0], Appointment.patient_id > after[1]),
+            )
+        )
+
+    connection = session.connection()
+    rows = [dict(row) for row in connection.execute(query).mappings()]
+    totals = connection.execute(
+        select(*columns).where(*_open_appointments(as_of))
+    ).mappings().one()
+    return rows, dict(totals)
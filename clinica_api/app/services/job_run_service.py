@@ -0,0 +1,103 @@
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.models.job_model import ScheduledJobRun
+
+# A claim not finished after this long belongs to a dead worker
+STALE_AFTER = timedelta(hours=1)
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_run(session: Session, job_id: str, run_key: str) -> bool:
+    """
+    Claims (job_id, run_key) for this worker. The INSERT is the lock: a
+    second worker hits the primary key and gets False. An unfinished claim
+    older than STALE_AFTER is taken over with a guarded UPDATE.
+    """
+    now = datetime.now()
+    try:
+        session.add(
+            ScheduledJobRun(job_id=job_id, run_key=run_key, owner=OWNER, started_at=now)
+        )
+        session.commit()
+        return True
+    except IntegrityError:
+        session.rollback()
+
+    result = session.execute(
+        update(ScheduledJobRun)
+        .where(
+            ScheduledJobRun.job_id == job_id,
+            ScheduledJobRun.run_key == run_key,
+            ScheduledJobRun.finished_at.is_(None),
+            ScheduledJobRun.started_at < now - STALE_AFTER,
+        )
+        .values(owner=OWNER, started_at=now)
+    )
+    session.commit()
+    return result.rowcount == 1
+
+
+def claim_interval(
+    session: Session, job_id: str, interval: timedelta, now: Optional[datetime] = None
+) -> bool:
+    """
+    Rate gate shared by every worker: True at most once per `interval` for
+    `job_id`, whichever worker asks first. A single (job_id, "interval")
+    row holds the last grant; the guarded UPDATE only moves it forward
+    once the interval has passed.
+    """
+    now = now or datetime.now()
+    result = session.execute(
+        update(ScheduledJobRun)
+        .where(
+            ScheduledJobRun.job_id == job_id,
+            ScheduledJobRun.run_key == "interval",
+            ScheduledJobRun.started_at <= now - interval,
+        )
+        .values(owner=OWNER, started_at=now)
+    )
+    session.commit()
+    if result.rowcount == 1:
+        return True
+    try:
+        session.add(
+            ScheduledJobRun(
+                job_id=job_id, run_key="interval", owner=OWNER, started_at=now
+            )
+        )
+        session.commit()
+        return True
+    except IntegrityError:
+        session.rollback()
+        return False
+
+
+def finish_run(
+    session: Session, job_id: str, run_key: str, result: Optional[Dict] = None
+):
+    session.execute(
+        update(ScheduledJobRun)
+        .where(ScheduledJobRun.job_id == job_id, ScheduledJobRun.run_key == run_key)
+        .values(finished_at=datetime.now(), result=result)
+    )
+    session.commit()
+
+
+def run_once(
+    session: Session, job_id: str, run_key: str, work: Callable[[], Any]
+) -> Optional[Any]:
+    """Runs `work` only if this worker wins the claim; returns its result, or
+    None when another worker has it (or already did it)."""
+    if not claim_run(session, job_id, run_key):
+        return None
+    result = work()
+    finish_run(session, job_id, run_key, result)
+    return result
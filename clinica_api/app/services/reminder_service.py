@@ -0,0 +1,296 @@
+import json
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import and_, update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.database import engine
+from app.core.scheduler import scheduler
+from app.models.appointment_model import Appointment, AppointmentStatus
+from app.models.clinic_settings import ClinicSettings
+from app.models.patient_model import Patient
+from app.models.reminder_model import ReminderOutbox, ReminderStatus
+from app.services.job_run_service import claim_interval, run_once
+
+REMINDER_SCAN_JOB_ID = "reminder_scan"
+REMINDER_DISPATCH_JOB_ID = "reminder_dispatch"
+# Not confirmed yet: the reminder carries the confirmation link
+REMIND_STATUSES = (AppointmentStatus.SCHEDULED, AppointmentStatus.NOT_STARTED)
+# A claimed row not resolved within this window is picked up again
+CLAIM_LEASE = timedelta(minutes=5)
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+
+class ReminderTransport(ABC):
+    """Delivers one reminder. Raises on failure; the dispatcher retries."""
+
+    @abstractmethod
+    def send(self, reminder: ReminderOutbox):
+        ...
+
+
+class FileTransport(ReminderTransport):
+    """Appends each reminder as a JSON line to a local file (development,
+    or until a messaging provider is configured)."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or settings.REMINDER_OUTBOX_FILE)
+
+    def send(self, reminder: ReminderOutbox):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        line = {
+            "id": reminder.id,
+            "channel": reminder.channel,
+            "to": reminder.recipient,
+            "message": reminder.message,
+            "sent_at": datetime.now().isoformat(),
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+class StubTransport(ReminderTransport):
+    """Keeps sent reminders in memory; `fail` makes every send raise."""
+
+    def __init__(self, fail: Optional[Exception] = None):
+        self.sent: List[ReminderOutbox] = []
+        self.fail = fail
+
+    def send(self, reminder: ReminderOutbox):
+        if self.fail:
+            raise self.fail
+        self.sent.append(reminder)
+
+
+TRANSPORTS: Dict[str, Callable[[], ReminderTransport]] = {
+    "file": FileTransport,
+    "stub": StubTransport,
+}
+
+
+def register_transport(name: str, factory: Callable[[], ReminderTransport]):
+    """Plugs in a provider (WhatsApp API, SMS, e-mail) under a
+    REMINDER_TRANSPORT name."""
+    TRANSPORTS[name] = factory
+
+
+def get_transport(name: Optional[str] = None) -> ReminderTransport:
+    name = name or settings.REMINDER_TRANSPORT
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown reminder transport: {name}")
+    return TRANSPORTS[name]()
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff after the `attempts`-th failure."""
+    delay = timedelta(seconds=settings.REMINDER_RETRY_SECONDS * 2 ** (attempts - 1))
+    return min(delay, MAX_RETRY_DELAY)
+
+
+class ReminderService:
+    """
+    Day-before appointment reminders through an outbox:
+
+    - `enqueue` (nightly scan) writes one `reminder_outbox` row per
+      appointment of the day that still needs confirmation.
+    - `dispatch` claims up to REMINDER_BATCH_SIZE due rows and sends them
+      through the configured transport, rescheduling failures with
+      exponential backoff. `run_dispatch` fires in every worker, but only
+      one batch per REMINDER_DISPATCH_SECONDS goes out across all of them.
+
+    Both run from the scheduler only; no request handler sends messages.
+    """
+
+    @staticmethod
+    def build_message(
+        clinic_name: str, patient_name: str, appointment: Appointment
+    ) -> str:
+        first_name = (patient_name or "").split(" ")[0]
+        day = date.fromisoformat(appointment.date)
+        link = f"{settings.PUBLIC_APP_URL}/confirmar-consulta/{appointment.id}"
+        return (
+            f"Olá, {first_name}! Lembrete da sua consulta na {clinic_name} "
+            f"em {day:%d/%m} às {appointment.time}. "
+            f"Confirme sua presença: {link}"
+        )
+
+    @staticmethod
+    def enqueue(session: Session, day: date) -> int:
+        """Queues reminders for the appointments of `day`. Idempotent:
+        appointments already queued for the same start are left alone."""
+        rows = session.exec(
+            select(Appointment, Patient.name, Patient.whatsapp)
+            .join(Patient, Patient.id == Appointment.patient_id)
+            .where(
+                Appointment.date == day.isoformat(),
+                Appointment.status.in_(REMIND_STATUSES),
+                Appointment.starts_at.is_not(None),
+                Patient.active == True,  # noqa: E712
+            )
+        ).all()
+        if not rows:
+            return 0
+
+        queued = set(
+            session.exec(
+                select(ReminderOutbox.appointment_id, ReminderOutbox.starts_at).where(
+                    ReminderOutbox.appointment_id.in_([a.id for a, _, _ in rows])
+                )
+            ).all()
+        )
+        clinic = session.exec(select(ClinicSettings.clinic_name)).first()
+        reminders = [
+            ReminderOutbox(
+                appointment_id=appt.id,
+                starts_at=appt.starts_at,
+                recipient=whatsapp,
+                message=ReminderService.build_message(
+                    clinic or "clínica", name, appt
+                ),
+            )
+            for appt, name, whatsapp in rows
+            if whatsapp and (appt.id, appt.starts_at) not in queued
+        ]
+        session.add_all(reminders)
+        session.commit()
+        print(f"Reminders: {len(reminders)} queued for {day}", flush=True)
+        return len(reminders)
+
+    @staticmethod
+    def _claim(session: Session, now: datetime, batch_size: int) -> List[str]:
+        """Marks up to `batch_size` due rows as SENDING for CLAIM_LEASE. The
+        guarded UPDATE keeps two dispatchers from taking the same row."""
+        due = and_(
+            ReminderOutbox.status.in_([ReminderStatus.PENDING, ReminderStatus.SENDING]),
+            ReminderOutbox.next_attempt_at <= now,
+        )
+        ids = session.exec(
+            select(ReminderOutbox.id)
+            .where(due)
+            .order_by(ReminderOutbox.next_attempt_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not ids:
+            session.commit()
+            return []
+        claimed = session.execute(
+            update(ReminderOutbox)
+            .where(ReminderOutbox.id.in_(ids), due)
+            .values(status=ReminderStatus.SENDING, next_attempt_at=now + CLAIM_LEASE)
+            .returning(ReminderOutbox.id),
+            execution_options={"synchronize_session": False},
+        ).scalars().all()
+        session.commit()
+        return list(claimed)
+
+    @staticmethod
+    def dispatch(
+        session: Session,
+        transport: Optional[ReminderTransport] = None,
+        now: Optional[datetime] = None,
+        batch_size: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Sends one batch of due reminders. Each outcome is committed right
+        after its send, so a crash never re-sends the whole batch."""
+        transport = transport or get_transport()
+        now = now or datetime.now()
+        claimed = ReminderService._claim(
+            session, now, batch_size or settings.REMINDER_BATCH_SIZE
+        )
+        counts = {"sent": 0, "retry": 0, "failed": 0, "skipped": 0}
+        if not claimed:
+            return counts
+
+        # Outer join: a row whose appointment is gone comes back with a None
+        # status and is skipped below instead of being re-claimed forever
+        rows = session.exec(
+            select(ReminderOutbox, Appointment.status, Appointment.starts_at)
+            .outerjoin(Appointment, Appointment.id == ReminderOutbox.appointment_id)
+            .where(ReminderOutbox.id.in_(claimed))
+            .order_by(ReminderOutbox.next_attempt_at, ReminderOutbox.id)
+        ).all()
+        for reminder, status, starts_at in rows:
+            if status not in REMIND_STATUSES or starts_at != reminder.starts_at:
+                # Confirmed, cancelled, moved or deleted since it was queued
+                reminder.status = ReminderStatus.SKIPPED
+                counts["skipped"] += 1
+            else:
+                try:
+                    transport.send(reminder)
+                    reminder.status = ReminderStatus.SENT
+                    reminder.sent_at = datetime.now()
+                    counts["sent"] += 1
+                except Exception as e:
+                    reminder.attempts += 1
+                    reminder.last_error = str(e)[:500]
+                    if reminder.attempts >= settings.REMINDER_MAX_ATTEMPTS:
+                        reminder.status = ReminderStatus.FAILED
+                        counts["failed"] += 1
+                    else:
+                        reminder.status = ReminderStatus.PENDING
+                        reminder.next_attempt_at = now + retry_delay(
+                            reminder.attempts
+                        )
+                        counts["retry"] += 1
+            session.add(reminder)
+            session.commit()
+        return counts
+
+    @staticmethod
+    def run_scan(today: Optional[date] = None):
+        tomorrow = (today or date.today()) + timedelta(days=1)
+        try:
+            with Session(engine) as session:
+                run_once(
+                    session,
+                    REMINDER_SCAN_JOB_ID,
+                    tomorrow.isoformat(),
+                    lambda: {"queued": ReminderService.enqueue(session, tomorrow)},
+                )
+        except Exception as e:
+            print(f"ERROR: Reminder scan failed: {e}", flush=True)
+
+    @staticmethod
+    def run_dispatch(now: Optional[datetime] = None):
+        interval = timedelta(seconds=settings.REMINDER_DISPATCH_SECONDS)
+        try:
+            with Session(engine) as session:
+                # The batch size is a global rate: one batch per interval
+                if not claim_interval(
+                    session, REMINDER_DISPATCH_JOB_ID, interval, now
+                ):
+                    return
+                counts = ReminderService.dispatch(session, now=now)
+            if any(counts.values()):
+                print(f"Reminders dispatched: {counts}", flush=True)
+        except Exception as e:
+            print(f"ERROR: Reminder dispatch failed: {e}", flush=True)
+
+    @staticmethod
+    def schedule():
+        scheduler.add_job(
+            ReminderService.run_scan,
+            CronTrigger(hour=8, minute=0),
+            id=REMINDER_SCAN_JOB_ID,
+            replace_existing=True,
+        )
+        scheduler.add_job(
+            ReminderService.run_dispatch,
+            IntervalTrigger(seconds=settings.REMINDER_DISPATCH_SECONDS),
+            id=REMINDER_DISPATCH_JOB_ID,
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        print(
+            "Reminders Scheduled: scan DAILY at 08:00, dispatch every "
+            f"{settings.REMINDER_DISPATCH_SECONDS}s",
+            flush=True,
+        )
@@ -3,7 +3,7 @@ import json
 import os
 import random
 import shutil
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, List
 
@@ -18,11 +18,14 @@ from app.models.medical_record_model import MedicalRecord
 from app.models.patient_model import Patient
 from app.models.payment_table_model import PaymentTable
 from app.models.specialty_model import Specialty
-from app.models.transaction_model import (PaymentMethod, Transaction,
+from app.models.transaction_model import (FinancialPeriod, PaymentMethod,
+                                          Transaction, TransactionArchive,
                                           TransactionType)
 # Import Models
 from app.models.user_model import Role, User
 from app.models.volunteer_model import Volunteer
+from app.services.appointment_service import backfill_slot_times
+from app.services.financial_service import rebuild_financial_rollup
 
 # Setup Paths
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -77,9 +80,9 @@ def ensure_backup_dir():
 def serialize_model(instance: Any) -> Dict[str, Any]:
     """Convert SQLModel instance to dict, handling dates."""
     data = instance.model_dump()
-    # Convert datetime objects to ISO strings
+    # Convert date/datetime objects to ISO strings
     for key, value in data.items():
-        if isinstance(value, datetime):
+        if isinstance(value, (date, datetime)):
             data[key] = value.isoformat()
     return data
 
@@ -101,6 +104,8 @@ def backup_data():
             Appointment,
             MedicalRecord,
             Transaction,
+            TransactionArchive,
+            FinancialPeriod,
             ClinicSettings,
             PaymentTable,
             FormTemplate,
@@ -135,6 +140,12 @@ def wipe_database(session: Session):
     print("[Wipe] Wiping Database...")
     # Order matters for foreign keys!
     tables = [
+        "appointment_daily_summary",
+        "scheduled_job_runs",
+        "reminder_outbox",
+        "financial_daily_rollup",
+        "financial_periods",
+        "transactions_archive",
         "medical_records",
         "transactions",
         "appointments",
@@ -203,10 +214,25 @@ def restore_data():
             insert_rows(Volunteer, data_dump["volunteers"])
         if "appointments" in data_dump:
             insert_rows(Appointment, data_dump["appointments"])
+            # Backups taken before starts_at/ends_at existed
+            backfill_slot_times(session)
+            session.commit()
         if "medical_records" in data_dump:
             insert_rows(MedicalRecord, data_dump["medical_records"])
         if "transactions" in data_dump:
             insert_rows(Transaction, data_dump["transactions"])
+        if "transactions_archive" in data_dump:
+            insert_rows(TransactionArchive, data_dump["transactions_archive"])
+        if "financial_periods" in data_dump:
+            insert_rows(
+                FinancialPeriod,
+                [
+                    {**row, "month": date.fromisoformat(row["month"])}
+                    for row in data_dump["financial_periods"]
+                ],
+            )
+
+        rebuild_financial_rollup(session)
 
     print("[Restore] Restore completed successfully!")
 
@@ -281,7 +307,9 @@ def seed_fake_data():
             session.refresh(p)
 
         # 5. Appointments & Financial
-        for _ in range(20):
+        # One hour apart: active slots of a volunteer may not overlap
+        first_slot = datetime.now().replace(hour=7, minute=0, second=0, microsecond=0)
+        for i in range(20):
             pat = random.choice(patients)
             vol = random.choice(volunteers)
             status = random.choice(
@@ -292,12 +320,13 @@ def seed_fake_data():
                 ]
             )
 
-            now = datetime.now()
+            now = first_slot + timedelta(hours=i)
             app = Appointment(
                 patient_id=pat.id,
                 volunteer_id=vol.id,
                 date=now.strftime("%Y-%m-%d"),
                 time=now.strftime("%H:%M"),
+                duration=60,
                 status=status,
                 notes="Consulta Demo Video",
                 price=100.00 if status == AppointmentStatus.FINISHED else 0.0,
@@ -319,6 +348,7 @@ def seed_fake_data():
                 session.add(trans)
 
         session.commit()
+        rebuild_financial_rollup(session)
     print("[Seed] Seed completed! Database is ready for video.")
 
 
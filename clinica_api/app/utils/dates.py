@@ -0,0 +1,57 @@
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+
+def day_range(
+    start_date: Optional[date], end_date: Optional[date]
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Inclusive dates -> half-open [start, end) datetimes.
+    Comparing the raw column against these bounds keeps the predicate
+    index friendly (no func.date() around the column).
+    """
+    start = datetime.combine(start_date, datetime.min.time()) if start_date else None
+    end = (
+        datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        if end_date
+        else None
+    )
+    return start, end
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def hhmm_to_minutes(value: str) -> int:
+    """'HH:MM' (or 'HH:MM:SS') -> minutes since midnight."""
+    hours, minutes = value.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def minutes_to_hhmm(minutes: int) -> str:
+    # Capped at "24:00" so an end time never wraps past a start time
+    minutes = min(minutes, 24 * 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def slot_end(start: str, minutes: int) -> str:
+    """'HH:MM' + duration -> 'HH:MM' end (capped at 24:00)."""
+    return minutes_to_hhmm(hhmm_to_minutes(start) + minutes)
+
+
+def slot_bounds(day, start: str, minutes: int) -> Tuple[datetime, datetime]:
+    """'YYYY-MM-DD' + 'HH:MM' + duration -> (starts_at, ends_at).
+    Raises ValueError when `start` is not a time of that day."""
+    offset = hhmm_to_minutes(start)
+    if not 0 <= offset < 24 * 60:
+        raise ValueError(f"Invalid start time: {start}")
+    starts_at = datetime.combine(
+        date.fromisoformat(str(day)[:10]), datetime.min.time()
+    ) + timedelta(minutes=offset)
+    return starts_at, starts_at + timedelta(minutes=minutes)
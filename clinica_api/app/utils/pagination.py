@@ -0,0 +1,34 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque token for keyset pagination (e.g. last row's timestamp + id)."""
+    raw = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(raw).encode()).decode()
+
+
+def decode_cursor(
+    cursor: Optional[str], *types: Union[type, Tuple[type, ...]]
+) -> Optional[List[Any]]:
+    """Values of a cursor from encode_cursor, one per expected type. A token
+    that was tampered with (wrong shape or types) is a 400, never reaches SQL."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        values = None
+    if (
+        not isinstance(values, list)
+        or len(values) != len(types)
+        or not all(
+            isinstance(v, t) and not isinstance(v, bool) for v, t in zip(values, types)
+        )
+    ):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return values
@@ -0,0 +1,50 @@
+"""
+Adds columns declared on the models that are missing in an existing
+database (SQLModel.metadata.create_all never alters existing tables).
+New NOT NULL columns must declare a server_default on the model.
+
+    python scripts/add_missing_columns.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from sqlmodel import SQLModel
+
+import app.main  # noqa: F401  (registers every model on the metadata)
+from app.core.database import engine
+
+
+def add_missing_columns():
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        added = 0
+
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" '
+                ddl += column.type.compile(dialect=engine.dialect)
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    ddl += f" DEFAULT {getattr(default, 'text', default)}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+
+                print(f"Adding {table.name}.{column.name}")
+                conn.execute(text(ddl))
+                added += 1
+
+    print(f"--- Done. Added {added} columns. ---")
+
+
+if __name__ == "__main__":
+    add_missing_columns()
@@ -0,0 +1,39 @@
+"""
+Creates indexes declared on the models that are missing in an existing
+database (SQLModel.metadata.create_all only creates missing tables).
+
+    python scripts/create_indexes.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect
+from sqlmodel import SQLModel
+
+import app.main  # noqa: F401  (registers every model on the metadata)
+from app.core.database import engine
+
+
+def create_missing_indexes():
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        created = 0
+
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    print(f"Creating {index.name} on {table.name}")
+                    index.create(conn)
+                    created += 1
+
+    print(f"--- Done. Created {created} indexes. ---")
+
+
+if __name__ == "__main__":
+    create_missing_indexes()
@@ -0,0 +1,101 @@
+"""
+Backfills appointments.starts_at / ends_at from the text date + time +
+duration, and on Postgres (re)creates the exclusion constraint that
+rejects overlapping active appointments of a volunteer on those columns.
+Also drops the text-based slot objects of the first version
+(end_time, uq_appointments_active_slot, appointment_slot()).
+
+Run scripts/add_missing_columns.py first (duration, starts_at, ends_at),
+then this, then scripts/create_indexes.py (uq_appointments_active_start).
+
+The constraints fail if the agenda already holds overlapping active
+appointments; the script lists them so they can be cancelled first.
+
+    python scripts/migrate_appointment_slots.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from sqlmodel import Session, select
+
+from app.core.database import engine
+from app.models.appointment_model import (INACTIVE_STATUSES,
+                                          OVERLAP_EXCLUSION_DDL, Appointment)
+from app.services.appointment_service import backfill_slot_times, slot_taken
+
+
+def find_conflicts(session: Session):
+    active = session.exec(
+        select(Appointment).where(
+            Appointment.volunteer_id.is_not(None),
+            Appointment.starts_at.is_not(None),
+            Appointment.status.not_in(INACTIVE_STATUSES),
+        )
+    ).all()
+    for appt in active:
+        taken = session.exec(
+            select(
+                slot_taken(
+                    appt.volunteer_id, appt.starts_at, appt.ends_at, exclude_id=appt.id
+                )
+            )
+        ).one()
+        if taken:
+            yield appt
+
+
+def drop_legacy_slot_objects(conn):
+    inspector = inspect(conn)
+    indexes = {i["name"] for i in inspector.get_indexes("appointments")}
+    if "uq_appointments_active_slot" in indexes:
+        print("Dropping uq_appointments_active_slot")
+        conn.execute(text("DROP INDEX uq_appointments_active_slot"))
+
+    if engine.dialect.name == "postgresql":
+        # Built on appointment_slot(date, time, end_time)
+        conn.execute(
+            text(
+                "ALTER TABLE appointments "
+                "DROP CONSTRAINT IF EXISTS ex_appointments_volunteer_overlap"
+            )
+        )
+        conn.execute(text("DROP FUNCTION IF EXISTS appointment_slot(text, text, text)"))
+
+    columns = {c["name"] for c in inspector.get_columns("appointments")}
+    if "end_time" in columns:
+        print("Dropping appointments.end_time (now derived from ends_at)")
+        conn.execute(text("ALTER TABLE appointments DROP COLUMN end_time"))
+
+
+def migrate_appointment_slots():
+    with Session(engine) as session:
+        invalid = backfill_slot_times(session)
+        session.commit()
+        for appointment_id in invalid:
+            print(f"INVALID date/time, left without starts_at: {appointment_id}")
+
+        conflicts = list(find_conflicts(session))
+        for appt in conflicts:
+            print(
+                f"CONFLICT: {appt.id} volunteer={appt.volunteer_id} "
+                f"{appt.starts_at} - {appt.ends_at} ({appt.status})"
+            )
+        if conflicts:
+            print("--- Resolve the conflicts above and run again. ---")
+            return
+
+    with engine.begin() as conn:
+        drop_legacy_slot_objects(conn)
+        if engine.dialect.name == "postgresql":
+            print("Adding ex_appointments_volunteer_overlap")
+            for statement in OVERLAP_EXCLUSION_DDL:
+                conn.execute(text(statement))
+
+    print("--- Done. Now run scripts/create_indexes.py ---")
+
+
+if __name__ == "__main__":
+    migrate_appointment_slots()
@@ -0,0 +1,94 @@
+"""
+Converts `audit_logs.details` (and the monthly audit_logs_YYYY_MM tables)
+from free text to structured JSON: JSONB on Postgres, JSON text on SQLite.
+Legacy "Path: ... | Status: ..." strings become {"path": ..., "status": ...}.
+Run it before scripts/create_indexes.py: the SQLite json_extract index
+rejects rows whose details are not valid JSON.
+
+    python scripts/migrate_audit_details.py
+"""
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import engine
+from app.schemas.audit import normalize_details
+from app.services.audit_archive_service import AUDIT_TABLE, PARTITION_RE
+
+
+def _rewrite(conn, table: str, where: str, to_sql: str) -> int:
+    rows = conn.execute(
+        text(f"SELECT id, details FROM {table} WHERE {where}")
+    ).all()
+    for row in rows:
+        details = row.details
+        if not isinstance(details, str):
+            # JSONB string scalar (Postgres) comes back already decoded
+            details = str(details)
+        conn.execute(
+            text(f"UPDATE {table} SET details = {to_sql} WHERE id = :id"),
+            {"id": row.id, "details": json.dumps(normalize_details(details))},
+        )
+    return len(rows)
+
+
+def migrate_audit_details():
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        tables = [
+            name
+            for name in inspector.get_table_names()
+            if name == AUDIT_TABLE or PARTITION_RE.match(name)
+        ]
+
+        for table in tables:
+            if engine.dialect.name == "postgresql":
+                column_type = conn.execute(
+                    text(
+                        "SELECT data_type FROM information_schema.columns "
+                        "WHERE table_name = :t AND column_name = 'details'"
+                    ),
+                    {"t": table},
+                ).scalar()
+                is_partition = conn.execute(
+                    text(
+                        "SELECT 1 FROM pg_inherits "
+                        "WHERE inhrelid = to_regclass(:t)"
+                    ),
+                    {"t": table},
+                ).first()
+                # Partitions follow the type change of the parent table
+                if column_type != "jsonb" and not is_partition:
+                    print(f"Converting {table}.details to JSONB")
+                    conn.execute(
+                        text(
+                            f"ALTER TABLE {table} ALTER COLUMN details TYPE JSONB "
+                            "USING CASE WHEN details ~ '^\\s*\\{' "
+                            "THEN details::jsonb ELSE to_jsonb(details) END"
+                        )
+                    )
+                count = _rewrite(
+                    conn,
+                    table,
+                    "jsonb_typeof(details) <> 'object'",
+                    "CAST(:details AS JSONB)",
+                )
+            else:
+                count = _rewrite(
+                    conn,
+                    table,
+                    "details IS NOT NULL AND (json_valid(details) = 0 "
+                    "OR json_type(details) <> 'object')",
+                    ":details",
+                )
+            print(f"{table}: {count} legacy details converted")
+
+    print("--- Done. Now run scripts/create_indexes.py ---")
+
+
+if __name__ == "__main__":
+    migrate_audit_details()
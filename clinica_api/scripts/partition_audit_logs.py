@@ -0,0 +1,84 @@
+"""
+Converts `audit_logs` into a monthly RANGE-partitioned table (PostgreSQL only).
+
+Run once per database:
+    python scripts/partition_audit_logs.py
+
+New partitions are then created ahead of time by the audit archive job
+(AuditArchiveService.ensure_partitions). SQLite keeps a plain table and uses
+monthly rollover tables instead.
+"""
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import text
+
+from app.core.database import engine
+from app.models.audit_model import AuditLog
+from app.services.audit_archive_service import (AUDIT_TABLE, add_months,
+                                                month_start, partition_name)
+
+
+def partition_audit_logs():
+    if engine.dialect.name != "postgresql":
+        print("Partitioning is only available on PostgreSQL. Nothing to do.")
+        return
+
+    with engine.begin() as conn:
+        already = conn.execute(
+            text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"),
+            {"t": AUDIT_TABLE},
+        ).first()
+        if already:
+            print(f"{AUDIT_TABLE} is already partitioned.")
+            return
+
+        print(f"--- Partitioning {AUDIT_TABLE} by month ---")
+        legacy = f"{AUDIT_TABLE}_legacy"
+        conn.execute(text(f"ALTER TABLE {AUDIT_TABLE} RENAME TO {legacy}"))
+        for index in AuditLog.__table__.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+        conn.execute(
+            text(
+                f"CREATE TABLE {AUDIT_TABLE} (LIKE {legacy} INCLUDING DEFAULTS) "
+                f'PARTITION BY RANGE ("timestamp")'
+            )
+        )
+        # The partition key must be part of the primary key
+        conn.execute(
+            text(f'ALTER TABLE {AUDIT_TABLE} ADD PRIMARY KEY (id, "timestamp")')
+        )
+        for index in AuditLog.__table__.indexes:
+            index.create(conn)
+
+        conn.execute(
+            text(f"CREATE TABLE {AUDIT_TABLE}_default PARTITION OF {AUDIT_TABLE} DEFAULT")
+        )
+
+        oldest = conn.execute(text(f'SELECT MIN("timestamp") FROM {legacy}')).scalar()
+        month = month_start(oldest or date.today())
+        last = add_months(month_start(date.today()), 1)
+        while month <= last:
+            conn.execute(
+                text(
+                    f"CREATE TABLE {partition_name(month)} PARTITION OF {AUDIT_TABLE} "
+                    f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+                )
+            )
+            month = add_months(month, 1)
+
+        moved = conn.execute(
+            text(f"INSERT INTO {AUDIT_TABLE} SELECT * FROM {legacy}")
+        ).rowcount
+        conn.execute(text(f"ALTER SEQUENCE {AUDIT_TABLE}_id_seq OWNED BY {AUDIT_TABLE}.id"))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+
+    print(f"--- Partitioning Complete. Moved {moved} rows. ---")
+
+
+if __name__ == "__main__":
+    partition_audit_logs()
@@ -0,0 +1,30 @@
+"""
+Recomputes the hourly/daily audit activity rollups from the raw trail.
+
+    python scripts/rebuild_audit_rollups.py                # everything
+    python scripts/rebuild_audit_rollups.py 2026-01-01 2026-02-01
+"""
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import Session
+
+from app.core.database import engine
+from app.services.audit_service import rebuild_activity_rollups
+
+
+def main():
+    start = datetime.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    end = datetime.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    with Session(engine) as session:
+        print("--- Rebuilding audit activity rollups ---")
+        rows = rebuild_activity_rollups(session, start, end)
+        print(f"--- Done. Wrote {rows} rollup rows. ---")
+
+
+if __name__ == "__main__":
+    main()
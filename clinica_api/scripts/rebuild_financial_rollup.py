@@ -0,0 +1,30 @@
+"""
+Recomputes the financial_daily_rollup table from `transactions`.
+
+    python scripts/rebuild_financial_rollup.py                # everything
+    python scripts/rebuild_financial_rollup.py 2026-01-01 2026-01-31
+"""
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import Session
+
+from app.core.database import engine
+from app.services.financial_service import rebuild_financial_rollup
+
+
+def main():
+    start = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    end = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    with Session(engine) as session:
+        print("--- Rebuilding financial daily rollup ---")
+        rows = rebuild_financial_rollup(session, start, end)
+        print(f"--- Done. Wrote {rows} rollup rows. ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -87,3 +87,294 @@ def test_create_appointment_success(session: Session, client: TestClient):
     else:
         assert response.status_code == 200
         assert response.json()["id"] is not None
+
+
+def test_overlapping_appointments_are_rejected(session: Session, client: TestClient):
+    from sqlalchemy.exc import IntegrityError
+
+    from app.models.appointment_model import Appointment
+
+    def book(time, duration=60, **extra):
+        payload = {
+            "patient_id": "p1",
+            "volunteer_id": "vol1",
+            "date": "2026-03-02",
+            "time": time,
+            "duration": duration,
+            **extra,
+        }
+        return client.post("/api/v1/appointments/", json=payload)
+
+    # 1. ARRANGE: 10:00-11:00 ocupado
+    first = book("10:00")
+    assert first.status_code == 200
+    assert first.json()["end_time"] == "11:00"
+
+    # 2. ACT / ASSERT: sobreposição parcial é conflito, horário colado não
+    assert book("10:30").status_code == 409
+    assert book("9:30").status_code == 409  # "9:30" normalizado para "09:30"
+    assert book("09:00").status_code == 200
+    second = book("11:00", duration=30)
+    assert second.status_code == 200
+
+    # Confirmado também segura o horário; cancelado libera
+    session.add(
+        Appointment(
+            id="conf",
+            patient_id="p2",
+            volunteer_id="vol1",
+            date="2026-03-02",
+            time="14:00",
+            duration=60,
+            status="confirmed",
+        )
+    )
+    session.add(
+        Appointment(
+            id="canc",
+            patient_id="p2",
+            volunteer_id="vol1",
+            date="2026-03-02",
+            time="16:00",
+            duration=60,
+            status="cancelled",
+        )
+    )
+    session.commit()
+    assert book("14:45", duration=15).status_code == 409
+    assert book("16:00").status_code == 200
+
+    # Remarcar também respeita a agenda (sem contar o próprio agendamento)
+    url = f"/api/v1/appointments/{second.json()['id']}"
+    assert client.put(url, json={"time": "10:15"}).status_code == 409
+    assert client.put(url, json={"duration": 60}).status_code == 200
+    moved = client.put(url, json={"time": "12:00"})
+    assert moved.status_code == 200
+    assert moved.json()["end_time"] == "13:00"
+
+    # Reativar um cancelado em cima de outro horário é conflito
+    cancelled = book("12:30", status="cancelled")
+    assert cancelled.status_code == 200
+    url = f"/api/v1/appointments/{cancelled.json()['id']}"
+    assert client.put(url, json={"status": "scheduled"}).status_code == 409
+
+    # O índice único parcial barra o mesmo início mesmo sem passar pela API
+    session.add(
+        Appointment(
+            id="dup",
+            patient_id="p3",
+            volunteer_id="vol1",
+            date="2026-03-02",
+            time="10:00",
+        )
+    )
+    with pytest.raises(IntegrityError):
+        session.commit()
+    session.rollback()
+
+
+def test_recurring_series(session: Session, client: TestClient):
+    from app.models.appointment_model import Appointment
+
+    # 1. ARRANGE: outro paciente já ocupa a segunda-feira 16/03 às 14:00
+    session.add(
+        Appointment(
+            id="busy",
+            patient_id="p9",
+            volunteer_id="vol1",
+            date="2026-03-16",
+            time="14:00",
+            duration=60,
+        )
+    )
+    session.commit()
+
+    payload = {
+        "patient_id": "p1",
+        "volunteer_id": "vol1",
+        "start_date": "2026-03-02",
+        "time": "14:00",
+        "duration": 50,
+        "rule": {"frequency": "weekly", "count": 4},
+    }
+
+    # 2. ACT / ASSERT: conflito em uma ocorrência barra a série inteira
+    resp = client.post("/api/v1/appointments/series", json=payload)
+    assert resp.status_code == 409
+    assert "2026-03-16" in resp.json()["detail"]
+    assert len(session.exec(select(Appointment)).all()) == 1
+
+    # Pulando conflitos: agenda as livres e informa as puladas
+    resp = client.post(
+        "/api/v1/appointments/series", json={**payload, "skip_conflicts": True}
+    )
+    assert resp.status_code == 200
+    series = resp.json()
+    assert [a["date"] for a in series["appointments"]] == [
+        "2026-03-02",
+        "2026-03-09",
+        "2026-03-23",
+    ]
+    assert series["skipped"] == ["2026-03-16"]
+    assert {a["end_time"] for a in series["appointments"]} == {"14:50"}
+    url = f"/api/v1/appointments/series/{series['series_id']}"
+
+    # Remarcar a série toda: 14:30-15:20 bate com um horário das 15:00 no dia 23
+    session.add(
+        Appointment(
+            id="busy2",
+            patient_id="p9",
+            volunteer_id="vol1",
+            date="2026-03-23",
+            time="15:00",
+            duration=60,
+        )
+    )
+    session.commit()
+    resp = client.put(url, json={"time": "14:30"})
+    assert resp.status_code == 409
+    assert "2026-03-23" in resp.json()["detail"]
+    resp = client.put(url + "?from_date=2026-03-09", json={"time": "16:00"})
+    assert resp.status_code == 200
+    assert [a["time"] for a in resp.json()["appointments"]] == ["16:00", "16:00"]
+    assert client.get(url).json()["appointments"][0]["time"] == "14:00"
+
+    # Cancelar a série libera os horários
+    resp = client.post(url + "/cancel")
+    assert {a["status"] for a in resp.json()["appointments"]} == {"cancelled"}
+    assert client.post(url + "/cancel").status_code == 404
+
+    # Regras inválidas
+    rule = {"frequency": "daily", "until": "2030-01-01"}
+    assert (
+        client.post("/api/v1/appointments/series", json={**payload, "rule": rule})
+        .status_code
+        == 400
+    )
+    rule = {"frequency": "weekly"}  # sem count nem until
+    assert (
+        client.post("/api/v1/appointments/series", json={**payload, "rule": rule})
+        .status_code
+        == 422
+    )
+
+
+def test_invalid_times_are_rejected(session: Session, client: TestClient):
+    from app.models.appointment_model import Appointment
+
+    session.add(
+        Appointment(
+            id="a1",
+            patient_id="p1",
+            volunteer_id="vol1",
+            date="2026-03-02",
+            time="09:00",
+            series_id="s1",
+        )
+    )
+    session.commit()
+    payload = {"patient_id": "p1", "volunteer_id": "vol1", "date": "2026-03-03"}
+    series = {
+        "patient_id": "p1",
+        "volunteer_id": "vol1",
+        "start_date": "2026-03-02",
+        "rule": {"frequency": "weekly", "count": 2},
+    }
+
+    # Sobra no fim, hora fora do dia ou minuto inválido: 422, nunca "24:00"
+    for time in ["10:30abc", "24:30", "25:00", "9:7", "09:60"]:
+        requests = [
+            ("post", "/api/v1/appointments/", {**payload, "time": time}),
+            ("put", "/api/v1/appointments/a1", {"time": time}),
+            ("post", "/api/v1/appointments/series", {**series, "time": time}),
+            ("put", "/api/v1/appointments/series/s1", {"time": time}),
+        ]
+        for method, url, body in requests:
+            resp = getattr(client, method)(url, json=body)
+            assert resp.status_code == 422, (method, url, time)
+    assert session.exec(select(Appointment.time)).all() == ["09:00"]
+
+    # Horas com um dígito continuam aceitas e são normalizadas
+    resp = client.post("/api/v1/appointments/", json={**payload, "time": "9:05"})
+    assert resp.status_code == 200
+    assert resp.json()["time"] == "09:05"
+
+
+def test_expand_recurrence_rules():
+    from datetime import date
+
+    from app.schemas.appointment import RecurrenceRule
+    from app.services.appointment_service import expand_recurrence
+
+    # Segundas e quartas, a cada duas semanas, começando numa quarta
+    rule = RecurrenceRule(frequency="weekly", interval=2, weekdays=[0, 2], count=4)
+    assert expand_recurrence(date(2026, 3, 4), rule) == [
+        date(2026, 3, 4),
+        date(2026, 3, 16),
+        date(2026, 3, 18),
+        date(2026, 3, 30),
+    ]
+    # Mensal no dia 31: meses sem dia 31 ficam de fora
+    rule = RecurrenceRule(frequency="monthly", until=date(2026, 5, 31))
+    assert expand_recurrence(date(2026, 1, 31), rule) == [
+        date(2026, 1, 31),
+        date(2026, 3, 31),
+        date(2026, 5, 31),
+    ]
+
+
+def test_slot_timestamps_backfill_and_index(session: Session, client: TestClient):
+    from datetime import datetime
+
+    from sqlmodel import text
+
+    from app.models.appointment_model import Appointment
+    from app.services.appointment_service import backfill_slot_times, slot_taken
+
+    # Escrita pelo ORM: starts_at/ends_at derivados de date + time + duration
+    session.add(
+        Appointment(
+            id="orm",
+            patient_id="p1",
+            volunteer_id="vol1",
+            date="2026-03-02",
+            time="23:30",
+            duration=60,
+        )
+    )
+    session.commit()
+    appt = session.get(Appointment, "orm")
+    assert (appt.starts_at, appt.ends_at) == (
+        datetime(2026, 3, 2, 23, 30),
+        datetime(2026, 3, 3, 0, 30),
+    )
+    assert client.get("/api/v1/appointments/orm").json()["end_time"] == "24:00"
+
+    # Linhas antigas (sem starts_at) são preenchidas pelo backfill
+    for appt_id, time in [("legacy", "08:00"), ("broken", "8h"), ("late", "24:30")]:
+        session.exec(
+            text(
+                "INSERT INTO appointments (id, patient_id, volunteer_id, date, time, "
+                "duration, status, price, amount_paid, payment_status) VALUES "
+                f"('{appt_id}', 'p1', 'vol1', '2026-03-04', '{time}', 45, "
+                "'scheduled', 0, 0, 'PENDING')"
+            )
+        )
+    session.commit()
+    assert backfill_slot_times(session) == ["broken", "late"]
+    session.commit()
+    legacy = session.get(Appointment, "legacy")
+    session.refresh(legacy)
+    assert legacy.ends_at == datetime(2026, 3, 4, 8, 45)
+
+    # A checagem de sobreposição é uma varredura de faixa no índice
+    query = select(
+        slot_taken("vol1", datetime(2026, 3, 4, 8, 0), datetime(2026, 3, 4, 9, 0))
+    )
+    compiled = query.compile(
+        session.get_bind(), compile_kwargs={"literal_binds": True}
+    )
+    plan = session.connection().execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    plan = " ".join(str(row) for row in plan)
+    assert "(volunteer_id=? AND starts_at>? AND starts_at<?)" in plan
+    assert session.exec(query).one() is True
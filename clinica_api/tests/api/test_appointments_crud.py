@@ -1,8 +1,8 @@
-from datetime import date
+from datetime import date, datetime
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel import Session, SQLModel, create_engine, select
 from sqlmodel.pool import StaticPool
 
 from app.api.deps import get_current_user, get_session
@@ -63,3 +63,266 @@ def test_list_delete_appointments(session: Session, client: TestClient):
     # Confirmar deleção
     resp_get = client.get("/api/v1/appointments/a_del")
     assert resp_get.status_code == 404
+
+
+def test_list_appointments_range_status_and_cursor(
+    session: Session, client: TestClient
+):
+    from app.models.appointment_model import Appointment, AppointmentStatus
+
+    # Dois horários iguais no mesmo dia: o desempate é pelo id
+    for appt_id, day, time, status in [
+        ("a3", "2026-03-02", "09:00", AppointmentStatus.SCHEDULED),
+        ("a1", "2026-03-01", "10:00", AppointmentStatus.SCHEDULED),
+        ("a2", "2026-03-01", "10:00", AppointmentStatus.CANCELLED),
+        ("a4", "2026-03-03", "08:00", AppointmentStatus.SCHEDULED),
+        ("a0", "2026-02-28", "08:00", AppointmentStatus.SCHEDULED),
+    ]:
+        session.add(
+            Appointment(
+                id=appt_id,
+                patient_id="p1",
+                volunteer_id="v1",
+                date=day,
+                time=time,
+                status=status,
+            )
+        )
+    session.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        url = "/api/v1/appointments/?from=2026-03-01&to=2026-03-03&limit=2"
+        url += "&with_total=true" + (f"&cursor={cursor}" if cursor else "")
+        resp = client.get(url)
+        assert resp.status_code == 200
+        assert resp.headers["X-Total-Count"] == "4"
+        seen.extend(a["id"] for a in resp.json())
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == ["a1", "a2", "a3", "a4"]
+
+    resp = client.get("/api/v1/appointments/?status=cancelled&status=finished")
+    assert [a["id"] for a in resp.json()] == ["a2"]
+
+    assert client.get("/api/v1/appointments/?cursor=lixo").status_code == 400
+    # Cursor adulterado: forma certa, tipos errados
+    from app.utils.pagination import encode_cursor
+
+    for tampered in (
+        encode_cursor("2026-03-01", {"a": 1}, "a1"),
+        encode_cursor(1, 2, 3),
+    ):
+        resp = client.get(f"/api/v1/appointments/?cursor={tampered}")
+        assert resp.status_code == 400
+    assert client.get("/api/v1/appointments/?from=01/03/2026").status_code == 422
+
+
+def test_calendar_groups_days_and_volunteers(session: Session, client: TestClient):
+    from app.models.appointment_model import Appointment
+    from app.models.patient_model import Patient
+    from app.models.volunteer_model import Volunteer
+
+    session.add(
+        Patient(
+            id="p1",
+            name="Maria",
+            cpf="111",
+            birth_date="1980-01-01",
+            whatsapp="1199",
+            personal_income=0,
+            family_income=0,
+        )
+    )
+    for vol_id, name in [("v1", "Dra. Ana"), ("v2", "Dr. Bruno")]:
+        session.add(
+            Volunteer(
+                id=vol_id,
+                name=name,
+                email=f"{vol_id}@teste.com",
+                password="x",
+                birth_date="1990-01-01",
+                phone="1",
+                specialty="Psicologia",
+                license_number="CRP",
+            )
+        )
+    for appt_id, vol_id, day, time in [
+        ("a1", "v1", "2026-03-02", "09:00"),
+        ("a2", "v2", "2026-03-02", "10:00"),
+        ("a3", "v1", "2026-03-02", "11:00"),
+        ("a4", "v1", "2026-03-03", "09:00"),
+        ("a5", "v1", "2026-03-09", "09:00"),  # Fora da semana
+    ]:
+        session.add(
+            Appointment(
+                id=appt_id,
+                patient_id="p1",
+                volunteer_id=vol_id,
+                date=day,
+                time=time,
+                duration=50,
+            )
+        )
+    session.commit()
+
+    url = "/api/v1/appointments/calendar?from=2026-03-02&to=2026-03-08"
+    resp = client.get(url)
+    assert resp.status_code == 200
+    days = resp.json()["days"]
+    assert [d["date"] for d in days] == ["2026-03-02", "2026-03-03"]
+    first_day = days[0]["volunteers"]
+    assert [(v["volunteer_name"], v["specialty"]) for v in first_day] == [
+        ("Dra. Ana", "Psicologia"),
+        ("Dr. Bruno", "Psicologia"),
+    ]
+    assert [a["id"] for a in first_day[0]["appointments"]] == ["a1", "a3"]
+    assert first_day[0]["appointments"][0] == {
+        "id": "a1",
+        "time": "09:00",
+        "end_time": "09:50",
+        "status": "scheduled",
+        "patient_id": "p1",
+        "patient_name": "Maria",
+        "payment_status": "PENDING",
+    }
+
+    # Semana sem mudanças: 304 sem corpo
+    etag = resp.headers["ETag"]
+    resp = client.get(url, headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+    # Qualquer alteração na semana muda o ETag
+    client.put("/api/v1/appointments/a4", json={"status": "cancelled"})
+    resp = client.get(url, headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+    resp = client.get(url + "&volunteer_id=v2")
+    assert [len(d["volunteers"]) for d in resp.json()["days"]] == [1]
+    assert client.get(
+        "/api/v1/appointments/calendar?from=2026-03-08&to=2026-03-02"
+    ).status_code == 400
+
+
+def test_bulk_status_skips_paid_and_audits(session: Session, client: TestClient):
+    from app.core import security
+    from app.models.appointment_model import Appointment
+    from app.models.audit_model import AuditLog
+    from app.models.transaction_model import Transaction
+
+    app.dependency_overrides[security.get_current_user] = lambda: {
+        "id": "admin",
+        "name": "Admin",
+    }
+    for appt_id, vol_id, day, time, status in [
+        ("b1", "v1", "2026-03-02", "09:00", "scheduled"),
+        ("b2", "v1", "2026-03-02", "10:00", "confirmed"),
+        ("b3", "v1", "2026-03-02", "11:00", "finished"),  # Já atendido
+        ("b4", "v1", "2026-03-02", "12:00", "scheduled"),  # Já pago
+        ("b5", "v1", "2026-03-03", "09:00", "scheduled"),  # Outro dia
+        ("b6", "v2", "2026-03-02", "09:00", "scheduled"),  # Outro voluntário
+    ]:
+        session.add(
+            Appointment(
+                id=appt_id,
+                patient_id="p1",
+                volunteer_id=vol_id,
+                date=day,
+                time=time,
+                status=status,
+            )
+        )
+    session.add(
+        Transaction(amount=50, type="INCOME", description="x", appointment_id="b4")
+    )
+    session.commit()
+
+    resp = client.post(
+        "/api/v1/appointments/bulk-status",
+        json={
+            "status": "cancelled",
+            "volunteer_id": "v1",
+            "date": "2026-03-02",
+            "reason": "Voluntário doente",
+        },
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert sorted(body["updated_ids"]) == ["b1", "b2"]
+    assert body["skipped_paid_ids"] == ["b4"]
+
+    session.expire_all()
+    statuses = {a.id: a.status for a in session.exec(select(Appointment)).all()}
+    assert statuses == {
+        "b1": "cancelled",
+        "b2": "cancelled",
+        "b3": "finished",
+        "b4": "scheduled",
+        "b5": "scheduled",
+        "b6": "scheduled",
+    }
+    logs = session.exec(select(AuditLog).where(AuditLog.action == "BULK_STATUS")).all()
+    assert len(logs) == 1
+    assert logs[0].details["count"] == 2
+    assert logs[0].details["reason"] == "Voluntário doente"
+
+    # O log aparece na listagem de auditoria (status HTTP fica em outra chave)
+    resp = client.get("/api/v1/audit/?action=BULK_STATUS")
+    assert resp.status_code == 200
+    details = resp.json()[0]["details"]
+    assert details["new_status"] == "cancelled"
+    assert details["status"] is None
+
+    # Sem filtro nenhum, ou para status já encerrado: recusado
+    url = "/api/v1/appointments/bulk-status"
+    assert client.post(url, json={"status": "cancelled"}).status_code == 422
+    assert client.post(
+        url, json={"status": "finished", "ids": ["b5"]}
+    ).status_code == 400
+
+
+def test_delete_appointment_reverts_rollup(session: Session, client: TestClient):
+    from app.models.appointment_model import Appointment
+    from app.models.transaction_model import FinancialDailyRollup, Transaction
+    from app.services.financial_service import record_transaction
+
+    session.add(
+        Appointment(id="d1", patient_id="p1", date="2026-03-02", time="09:00")
+    )
+    for amount in (30, 20):
+        tx = Transaction(
+            amount=amount,
+            type="INCOME",
+            description="x",
+            appointment_id="d1",
+            date=datetime(2026, 3, 2, 9),
+        )
+        session.add(tx)
+        record_transaction(session, tx)
+    session.commit()
+
+    assert client.delete("/api/v1/appointments/d1").status_code == 204
+    session.expire_all()
+    assert session.exec(select(Transaction)).all() == []
+    rollup = session.exec(select(FinancialDailyRollup)).one()
+    assert (rollup.total, rollup.count) == (0, 0)
+
+
+def test_create_and_update_reject_invalid_dates(session: Session, client: TestClient):
+    from app.models.appointment_model import Appointment
+
+    url = "/api/v1/appointments"
+    for bad in ("2026-13-01", "10/02/2026"):
+        resp = client.post(
+            url, json={"patient_id": "p1", "date": bad, "time": "09:00"}
+        )
+        assert resp.status_code == 422
+
+    session.add(Appointment(id="v1", patient_id="p1", date="2026-03-02", time="09:00"))
+    session.commit()
+    assert client.put(f"{url}/v1", json={"date": "2026-02-30"}).status_code == 422
+    assert client.put(f"{url}/v1", json={"date": "2026-03-03"}).status_code == 200
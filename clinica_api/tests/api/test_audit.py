@@ -0,0 +1,351 @@
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select, text
+from sqlmodel.pool import StaticPool
+
+from app.api.deps import get_session
+from app.core.security import get_current_user
+from app.main import app
+from app.models.audit_model import AuditLog
+from app.schemas.audit import normalize_details
+from app.services import audit_archive_service
+from app.services.audit_archive_service import AuditArchiveService, _conditions
+from app.services.audit_service import (coalesce_access, create_audit_log,
+                                        rebuild_activity_rollups)
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture(name="client")
+def client_fixture(session: Session):
+    app.dependency_overrides[get_session] = lambda: session
+    app.dependency_overrides[get_current_user] = lambda: {
+        "id": "admin",
+        "role": "ADMIN",
+        "name": "Admin",
+    }
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    # Arquivos comprimidos vão para uma pasta temporária do teste
+    monkeypatch.setattr(audit_archive_service, "ARCHIVE_DIR", tmp_path)
+    return tmp_path
+
+
+def add_log(session: Session, user_id: str, timestamp: datetime):
+    session.add(
+        AuditLog(
+            user_id=user_id,
+            user_name=user_id,
+            action="GET",
+            resource="patients",
+            timestamp=timestamp,
+        )
+    )
+
+
+def test_rollover_and_archive_stay_queryable(session: Session, archive_dir):
+    # 1. ARRANGE: logs de 4 meses diferentes na tabela viva
+    add_log(session, "u1", datetime(2026, 6, 10, 9, 0))
+    add_log(session, "u2", datetime(2026, 7, 5, 9, 0))
+    add_log(session, "u1", datetime(2026, 8, 20, 9, 0))
+    add_log(session, "u1", datetime(2026, 9, 1, 9, 0))
+    session.commit()
+
+    # 2. ACT: vira o mês e arquiva tudo que tem mais de 2 meses
+    today = date(2026, 9, 15)
+    moved = AuditArchiveService.rollover(session, today)
+    archived = AuditArchiveService.archive_closed_months(session, today, keep_months=2)
+
+    # 3. ASSERT: meses fechados saíram da tabela viva
+    assert moved == ["audit_logs_2026_06", "audit_logs_2026_07", "audit_logs_2026_08"]
+    assert [e["month"] for e in archived] == ["2026-06"]
+    assert (archive_dir / "audit_logs_2026_06.ndjson.gz").exists()
+    assert [name for _, name in AuditArchiveService.list_partitions(session)] == [
+        "audit_logs_2026_07",
+        "audit_logs_2026_08",
+    ]
+
+    # A consulta continua vendo tudo, do mais novo ao mais antigo
+    logs = AuditArchiveService.query_logs(session)
+    assert [log.timestamp.month for log in logs] == [9, 8, 7, 6]
+
+    logs = AuditArchiveService.query_logs(
+        session, user_id="u1", end=datetime(2026, 8, 31)
+    )
+    assert [log.timestamp.month for log in logs] == [8, 6]
+
+
+def test_monthly_tables_keep_dialect_indexes():
+    from sqlalchemy import create_mock_engine
+
+    # Cada índice de `details` só é criado no seu próprio banco
+    name = "audit_logs_2026_06"
+    table = audit_archive_service._partition_table(name)
+    assert all(index.name.startswith(f"ix_{name}_") for index in table.indexes)
+
+    for dialect, created, skipped in [
+        ("sqlite", f"ix_{name}_details_status", "USING gin"),
+        ("postgresql", "USING gin (details jsonb_path_ops)", "json_extract"),
+    ]:
+        ddl = []
+
+        def capture(statement, *args, **kwargs):
+            ddl.append(str(statement.compile(dialect=engine.dialect)))
+
+        engine = create_mock_engine(f"{dialect}://", capture)
+        table.create(engine)
+        statements = " ".join(ddl)
+        assert created in statements
+        assert skipped not in statements
+        assert f"ix_{name}_timestamp_id" in statements
+
+
+def test_maintenance_runs_once_per_day(session: Session, monkeypatch):
+    from app.models.job_model import ScheduledJobRun
+
+    # Cada worker agenda o job; só quem reivindica o dia executa
+    monkeypatch.setattr(audit_archive_service, "engine", session.get_bind())
+    add_log(session, "u1", datetime(2026, 8, 20, 9, 0))
+    session.commit()
+
+    today = date(2026, 9, 15)
+    AuditArchiveService.run_maintenance(today)
+    AuditArchiveService.run_maintenance(today)  # Segundo worker: não faz nada
+
+    runs = session.exec(select(ScheduledJobRun)).all()
+    assert [(r.job_id, r.run_key) for r in runs] == [("audit_archive", "2026-09-15")]
+    assert runs[0].finished_at is not None
+    assert runs[0].result["rolled_over"] == ["audit_logs_2026_08"]
+
+
+def test_get_audit_logs_reads_archives(session: Session, client: TestClient):
+    add_log(session, "u1", datetime(2026, 1, 10, 9, 0))
+    add_log(session, "u1", datetime(2026, 9, 10, 9, 0))
+    session.commit()
+
+    AuditArchiveService.rollover(session, date(2026, 9, 15))
+    AuditArchiveService.archive_closed_months(session, date(2026, 9, 15))
+
+    resp = client.get("/api/v1/audit/?start_date=2026-01-01&end_date=2026-01-31")
+    assert resp.status_code == 200
+    assert len(resp.json()) == 1
+    assert resp.json()[0]["timestamp"].startswith("2026-01-10")
+
+
+def test_keyset_pagination_with_cursor(session: Session, client: TestClient):
+    # 5 logs com o mesmo horário: o desempate é pelo id
+    for _ in range(5):
+        add_log(session, "u1", datetime(2026, 9, 10, 9, 0))
+    add_log(session, "u1", datetime(2026, 5, 10, 9, 0))
+    session.commit()
+    AuditArchiveService.rollover(session, date(2026, 9, 15))
+    AuditArchiveService.archive_closed_months(session, date(2026, 9, 15))
+
+    seen = []
+    cursor = None
+    while True:
+        url = "/api/v1/audit/?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        resp = client.get(url)
+        assert resp.status_code == 200
+        seen.extend(log["id"] for log in resp.json())
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    # Todas as páginas juntas: sem repetição, do mais novo ao mais antigo
+    assert seen == [5, 4, 3, 2, 1, 6]
+
+    assert client.get("/api/v1/audit/?cursor=lixo").status_code == 400
+    assert client.get("/api/v1/audit/?start_date=ontem").status_code == 422
+
+
+def test_query_stops_before_older_archives(session: Session, monkeypatch):
+    # Um log por mês de janeiro a maio, todos arquivados
+    for month in range(1, 6):
+        add_log(session, "u1", datetime(2026, month, 10, 9, 0))
+    session.commit()
+    AuditArchiveService.rollover(session, date(2026, 9, 15))
+    AuditArchiveService.archive_closed_months(session, date(2026, 9, 15))
+    assert AuditArchiveService.list_partitions(session) == []
+
+    opened = []
+    read_file = AuditArchiveService._iter_archive_file
+
+    def spy(entry, filters):
+        opened.append(entry["month"])
+        return read_file(entry, filters)
+
+    monkeypatch.setattr(AuditArchiveService, "_iter_archive_file", spy)
+
+    # Página de 2: só os dois arquivos mais novos são descomprimidos
+    logs = AuditArchiveService.query_logs(session, limit=2)
+    assert [log.timestamp.month for log in logs] == [5, 4]
+    assert opened == ["2026-05", "2026-04"]
+
+    opened.clear()
+    logs = AuditArchiveService.query_logs(
+        session, limit=2, before=(logs[-1].timestamp, logs[-1].id)
+    )
+    assert [log.timestamp.month for log in logs] == [3, 2]
+    assert opened == ["2026-03", "2026-02"]
+
+
+def test_export_streams_all_sources(session: Session, client: TestClient):
+    # Um acesso arquivado e um recente ao mesmo paciente, mais um de outro
+    for ts, resource_id in [
+        (datetime(2026, 2, 1, 8, 0), "p1"),
+        (datetime(2026, 9, 2, 8, 0), "p1"),
+        (datetime(2026, 9, 3, 8, 0), "p2"),
+    ]:
+        session.add(
+            AuditLog(
+                user_id="u1",
+                user_name="Recepção",
+                action="GET",
+                resource="patients",
+                resource_id=resource_id,
+                timestamp=ts,
+            )
+        )
+    session.commit()
+    AuditArchiveService.rollover(session, date(2026, 9, 15))
+    AuditArchiveService.archive_closed_months(session, date(2026, 9, 15))
+
+    resp = client.get(
+        "/api/v1/audit/export?format=ndjson&resource=patients&resource_id=p1",
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["timestamp"][:10] for r in rows] == ["2026-02-01", "2026-09-02"]
+
+    resp = client.get(
+        "/api/v1/audit/export?format=csv&start_date=2026-09-01&end_date=2026-09-30"
+    )
+    assert resp.status_code == 200
+    lines = resp.text.splitlines()
+    assert lines[0].startswith("id,")
+    assert len(lines) == 3  # cabeçalho + 2 linhas de setembro
+
+
+def test_activity_rollups_and_stats(session: Session, client: TestClient):
+    # Escritor incremental: cada log soma 1 nos agregados por hora e por dia
+    user = {"id": "u1", "name": "Recepção"}
+    create_audit_log(session, user, "UPDATE", "Patient", "p1", {"changes": ["cpf"]})
+    create_audit_log(session, user, "UPDATE", "Patient", "p2", {"changes": ["name"]})
+    create_audit_log(session, user, "CREATE", "Volunteer", "v1")
+    session.commit()
+
+    resp = client.get("/api/v1/audit/stats?group_by=user_id&group_by=resource")
+    assert resp.status_code == 200
+    stats = {(s["user_id"], s["resource"]): s["count"] for s in resp.json()}
+    assert stats == {("u1", "Patient"): 2, ("u1", "Volunteer"): 1}
+    assert resp.json()[0]["user_name"] == "Recepção"
+
+    resp = client.get("/api/v1/audit/stats?granularity=hour&group_by=bucket")
+    assert [s["count"] for s in resp.json()] == [3]
+
+    # Backfill a partir do histórico bruto (inclui logs sem agregado)
+    add_log(session, "u2", datetime(2026, 3, 1, 10, 15))
+    add_log(session, "u2", datetime(2026, 3, 1, 10, 45))
+    session.commit()
+    rebuild_activity_rollups(session, datetime(2026, 3, 1), datetime(2026, 3, 2))
+
+    resp = client.get(
+        "/api/v1/audit/stats?user_id=u2&start_date=2026-03-01&end_date=2026-03-01"
+    )
+    assert [(s["resource"], s["count"]) for s in resp.json()] == [("patients", 2)]
+
+    assert client.get("/api/v1/audit/stats?group_by=ip").status_code == 422
+
+
+def test_repeated_reads_are_coalesced(session: Session):
+    # Tela da recepção fazendo polling da lista de pacientes
+    first = datetime(2026, 9, 10, 9, 0, 0)
+    session.add(
+        AuditLog(
+            user_id="u1",
+            user_name="Recepção",
+            action="GET",
+            resource="patients",
+            timestamp=first,
+        )
+    )
+    session.commit()
+
+    def hit(seconds, resource_id=None):
+        return coalesce_access(
+            session,
+            "u1",
+            "patients",
+            resource_id,
+            "GET",
+            now=first + timedelta(seconds=seconds),
+            window_seconds=60,
+        )
+
+    assert hit(20) is True
+    assert hit(50) is True
+    assert hit(30, resource_id="p1") is False  # outro registro: nova linha
+    assert hit(90) is False  # janela expirou: nova linha
+    session.commit()
+
+    log = session.get(AuditLog, 1)
+    session.refresh(log)
+    assert log.hit_count == 3
+    assert log.last_seen_at == first + timedelta(seconds=50)
+
+
+def test_structured_details_filters(session: Session, client: TestClient):
+    user = {"id": "u1", "name": "Recepção"}
+    create_audit_log(session, user, "UPDATE", "Patient", "p1", {"changes": ["cpf"]})
+    create_audit_log(session, user, "UPDATE", "Patient", "p2", {"changes": ["name"]})
+    session.add(
+        AuditLog(
+            user_id="u1",
+            user_name="Recepção",
+            action="GET",
+            resource="patients",
+            details={"path": "/api/v1/patients/p9", "status": 404},
+        )
+    )
+    session.commit()
+    resp = client.get("/api/v1/audit/?action=UPDATE&changed=cpf")
+    assert resp.status_code == 200
+    assert [log["resource_id"] for log in resp.json()] == ["p1"]
+    assert resp.json()[0]["details"]["changes"] == ["cpf"]
+
+    resp = client.get("/api/v1/audit/?status=404")
+    assert [log["details"]["path"] for log in resp.json()] == ["/api/v1/patients/p9"]
+
+    # Texto livre gravado pelo middleware anterior (migração / arquivos antigos)
+    assert normalize_details("Path: /api/v1/patients | Status: 200") == {
+        "path": "/api/v1/patients",
+        "status": 200,
+    }
+    assert normalize_details('{"changes": ["cpf"]}') == {"changes": ["cpf"]}
+
+    # O filtro de status usa o índice de expressão JSON1
+    table = AuditLog.__table__
+    query = select(table.c.id).where(*_conditions(table, {"status": 404}, "sqlite"))
+    compiled = query.compile(session.get_bind(), compile_kwargs={"literal_binds": True})
+    plan = session.connection().execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    assert "ix_audit_logs_details_status" in " ".join(str(row) for row in plan)
@@ -0,0 +1,124 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+from app.api.deps import get_session
+from app.core.security import get_current_user
+from app.main import app
+from app.models.appointment_model import Appointment
+from app.models.audit_model import AuditLog
+from app.models.job_model import ScheduledJobRun
+from app.services.day_close_service import DAY_CLOSE_JOB_ID, DayCloseService
+from app.services.job_run_service import claim_run, finish_run, run_once
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture(name="client")
+def client_fixture(session: Session):
+    app.dependency_overrides[get_session] = lambda: session
+    app.dependency_overrides[get_current_user] = lambda: {
+        "id": "admin",
+        "role": "ADMIN",
+        "name": "Admin",
+    }
+    client = TestClient(app)
+    yield client
+    app.dependency_overrides.clear()
+
+
+def test_close_day_marks_absent_and_summarizes(session: Session, client: TestClient):
+    for appt_id, vol_id, day, time, status in [
+        ("c1", "v1", "2026-03-02", "09:00", "scheduled"),
+        ("c2", "v1", "2026-03-02", "10:00", "confirmed"),
+        ("c3", "v1", "2026-03-02", "11:00", "finished"),
+        ("c4", "v2", "2026-03-02", "09:00", "cancelled"),
+        ("c5", None, "2026-03-02", "09:00", "not_started"),  # Sem voluntário
+        ("c6", "v1", "2026-03-03", "09:00", "scheduled"),  # Dia seguinte
+    ]:
+        session.add(
+            Appointment(
+                id=appt_id,
+                patient_id="p1",
+                volunteer_id=vol_id,
+                date=day,
+                time=time,
+                status=status,
+            )
+        )
+    session.commit()
+
+    assert DayCloseService.close_day(session, date(2026, 3, 2)) == {"absent": 3}
+    session.expire_all()
+    statuses = {a.id: a.status for a in session.exec(select(Appointment)).all()}
+    assert statuses == {
+        "c1": "absent",
+        "c2": "absent",
+        "c3": "finished",
+        "c4": "cancelled",
+        "c5": "absent",
+        "c6": "scheduled",
+    }
+    logs = session.exec(select(AuditLog).where(AuditLog.action == "BULK_STATUS")).all()
+    assert [log.details["count"] for log in logs] == [3]
+    resp = client.get("/api/v1/audit/?action=BULK_STATUS")
+    assert resp.status_code == 200
+    assert resp.json()[0]["details"]["new_status"] == "absent"
+
+    # Rodar de novo não duplica o resumo
+    assert DayCloseService.close_day(session, date(2026, 3, 2)) == {"absent": 0}
+
+    resp = client.get("/api/v1/stats/appointments/daily?from=2026-03-01&to=2026-03-31")
+    assert resp.status_code == 200
+    assert resp.json() == [
+        {
+            "date": "2026-03-02",
+            "total": 5,
+            "by_status": {"absent": 3, "cancelled": 1, "finished": 1},
+        }
+    ]
+    resp = client.get(
+        "/api/v1/stats/appointments/daily?from=2026-03-01&to=2026-03-31"
+        "&volunteer_id=v1"
+    )
+    assert resp.json()[0]["by_status"] == {"absent": 2, "finished": 1}
+
+
+def test_run_once_claims_each_day_for_one_worker(session: Session):
+    calls = []
+    assert run_once(session, "job", "2026-03-02", lambda: calls.append(1) or "ok")
+    # Segundo worker (ou segunda execução): não roda de novo
+    assert run_once(session, "job", "2026-03-02", lambda: calls.append(2)) is None
+    assert calls == [1]
+
+    # Worker que morreu no meio: assumido só depois de STALE_AFTER
+    assert claim_run(session, "job", "2026-03-03")
+    assert not claim_run(session, "job", "2026-03-03")
+    run = session.get(ScheduledJobRun, ("job", "2026-03-03"))
+    run.started_at = datetime.now() - timedelta(hours=2)
+    session.add(run)
+    session.commit()
+    assert claim_run(session, "job", "2026-03-03")
+
+    # Só os dias sem fechamento concluído ficam pendentes
+    today = date(2026, 3, 10)
+    assert claim_run(session, DAY_CLOSE_JOB_ID, "2026-03-08")
+    finish_run(session, DAY_CLOSE_JOB_ID, "2026-03-08", {"absent": 0})
+    assert claim_run(session, DAY_CLOSE_JOB_ID, "2026-03-09")  # Ainda rodando
+    pending = DayCloseService.pending_days(session, today)
+    assert pending[0] == date(2026, 3, 3)
+    assert date(2026, 3, 8) not in pending
+    assert pending[-1] == date(2026, 3, 9)
@@ -0,0 +1,546 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, func, select, text
+from sqlmodel.pool import StaticPool
+
+from app.api.deps import get_session
+from app.api.endpoints.financial import recalculate_appointment_financials
+from app.core.database import enable_sqlite_savepoints
+from app.core.security import get_current_user
+from app.main import app
+from app.models.appointment_model import Appointment
+from app.models.patient_model import Patient
+from app.models.transaction_model import (FinancialDailyRollup, PaymentMethod,
+                                          Transaction, TransactionArchive,
+                                          TransactionType)
+from app.services.financial_service import rebuild_financial_rollup
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    enable_sqlite_savepoints(engine)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture(name="client")
+def client_fixture(session: Session):
+    app.dependency_overrides[get_session] = lambda: session
+    app.dependency_overrides[get_current_user] = lambda: {
+        "id": "admin",
+        "role": "ADMIN",
+        "name": "Admin",
+    }
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def add_tx(
+    session: Session,
+    amount: float,
+    when: datetime,
+    tx_type: TransactionType = TransactionType.INCOME,
+    method: PaymentMethod = PaymentMethod.PIX,
+    **kwargs,
+) -> Transaction:
+    tx = Transaction(
+        amount=amount,
+        type=tx_type,
+        payment_method=method,
+        date=when,
+        description="Movimento",
+        **kwargs,
+    )
+    session.add(tx)
+    return tx
+
+
+def test_daily_and_summary_stats(session: Session, client: TestClient):
+    # Dia 10: duas entradas (PIX e dinheiro) e uma saída
+    add_tx(session, 50.0, datetime(2026, 3, 10, 9, 0))
+    add_tx(session, 30.0, datetime(2026, 3, 10, 23, 59), method=PaymentMethod.CASH)
+    add_tx(session, 20.0, datetime(2026, 3, 10, 12, 0), TransactionType.EXPENSE)
+    # Dia 11, logo após a meia-noite: fica fora do dia 10
+    add_tx(session, 100.0, datetime(2026, 3, 11, 0, 0))
+    session.commit()
+    rebuild_financial_rollup(session)
+
+    resp = client.get("/api/v1/financial/stats/daily?target_date=2026-03-10")
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "total_income": 80.0,
+        "total_expense": 20.0,
+        "balance": 60.0,
+        "transaction_count": 3,
+        "by_method": {"PIX": 50.0, "DINHEIRO": 30.0},
+    }
+
+    resp = client.get(
+        "/api/v1/financial/stats/summary?start_date=2026-03-10&end_date=2026-03-11"
+    )
+    data = resp.json()
+    assert data["total_income"] == 180.0
+    assert data["transaction_count"] == 4
+    assert data["by_method"] == {"PIX": 150.0, "DINHEIRO": 30.0}
+
+
+def test_rollup_follows_transaction_writes(session: Session, client: TestClient):
+    def post(amount, day, method="PIX"):
+        resp = client.post(
+            "/api/v1/financial/transactions",
+            json={
+                "amount": amount,
+                "type": "INCOME",
+                "description": "Consulta",
+                "date": f"{day}T10:00:00",
+                "payment_method": method,
+            },
+        )
+        assert resp.status_code == 200
+        return resp.json()["id"]
+
+    first = post(40.0, "2026-04-01")
+    second = post(60.0, "2026-04-02")
+    post(25.0, "2026-04-02", "DINHEIRO")
+
+    # Edição muda dia e forma de pagamento: sai de um grupo e entra em outro
+    client.put(
+        f"/api/v1/financial/transactions/{first}",
+        json={"date": "2026-04-02T09:00:00", "payment_method": "DINHEIRO"},
+    )
+    client.delete(f"/api/v1/financial/transactions/{second}")
+
+    resp = client.get(
+        "/api/v1/financial/stats/summary?start_date=2026-04-01&end_date=2026-04-30"
+    )
+    assert resp.json()["by_method"] == {"DINHEIRO": 65.0}
+    assert resp.json()["transaction_count"] == 2
+
+    # O rebuild a partir das transações chega no mesmo resultado
+    before = {
+        (r.day, r.type, r.payment_method): (r.total, r.count)
+        for r in session.exec(select(FinancialDailyRollup)).all()
+        if r.count
+    }
+    rebuild_financial_rollup(session)
+    session.expire_all()
+    after = {
+        (r.day, r.type, r.payment_method): (r.total, r.count)
+        for r in session.exec(select(FinancialDailyRollup)).all()
+    }
+    assert before == after
+
+
+def test_transaction_filters_use_indexes(session: Session, client: TestClient):
+    add_tx(session, 10.0, datetime(2026, 5, 1, 23, 30), patient_id="p1")
+    add_tx(session, 10.0, datetime(2026, 5, 2, 0, 0), patient_id="p1")
+    session.commit()
+
+    # Intervalo semiaberto: 01/05 às 23:30 entra, 02/05 à meia-noite não
+    resp = client.get("/api/v1/financial/transactions?date_filter=2026-05-01")
+    assert [t["date"] for t in resp.json()] == ["2026-05-01T23:30:00"]
+
+    def plan(query) -> str:
+        compiled = query.compile(
+            session.get_bind(), compile_kwargs={"literal_binds": True}
+        )
+        rows = session.connection().execute(text(f"EXPLAIN QUERY PLAN {compiled}"))
+        return " ".join(str(row) for row in rows)
+
+    start, end = datetime(2026, 5, 1), datetime(2026, 5, 2)
+    by_date = select(Transaction).where(
+        Transaction.date >= start, Transaction.date < end
+    )
+    assert "ix_transactions_date" in plan(by_date)
+
+    by_appointment = select(func.sum(Transaction.amount)).where(
+        Transaction.appointment_id == "a1"
+    )
+    assert "ix_transactions_appointment_id" in plan(by_appointment)
+
+    statement = (
+        select(Transaction)
+        .where(Transaction.patient_id == "p1", Transaction.date >= start)
+        .order_by(Transaction.date)
+    )
+    assert "ix_transactions_patient_id_date" in plan(statement)
+
+
+def test_patient_ledger_running_balance(session: Session, client: TestClient):
+    session.add(
+        Patient(
+            id="p1",
+            name="Maria",
+            cpf="111.111.111-11",
+            birth_date="1980-01-01",
+            whatsapp="11999999999",
+            personal_income=0.0,
+            family_income=0.0,
+        )
+    )
+    # Duas consultas de R$ 100 (uma cancelada não entra no extrato)
+    for appt_id, day, status in [
+        ("a1", "2026-06-01", "finished"),
+        ("a2", "2026-06-08", "finished"),
+        ("a3", "2026-06-15", "cancelled"),
+    ]:
+        session.add(
+            Appointment(
+                id=appt_id,
+                patient_id="p1",
+                date=day,
+                time="09:00",
+                status=status,
+                price=100.0,
+            )
+        )
+    add_tx(session, 100.0, datetime(2026, 6, 1, 9, 0), patient_id="p1")
+    add_tx(session, 40.0, datetime(2026, 6, 8, 10, 0), patient_id="p1")
+    add_tx(
+        session,
+        10.0,
+        datetime(2026, 6, 9, 8, 0),
+        TransactionType.EXPENSE,
+        patient_id="p1",
+    )
+    session.commit()
+
+    entries, cursor = [], None
+    while True:
+        url = "/api/v1/financial/ledger/p1?limit=2"
+        resp = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["outstanding_balance"] == 70.0
+        entries.extend(data["entries"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+
+    # Consulta antes do pagamento feito no mesmo horário
+    assert [(e["kind"], e["balance"]) for e in entries] == [
+        ("CHARGE", 100.0),
+        ("PAYMENT", 0.0),
+        ("CHARGE", 100.0),
+        ("PAYMENT", 60.0),
+        ("REFUND", 70.0),
+    ]
+    assert entries[0]["occurred_at"] == "2026-06-01T09:00:00"
+
+    assert client.get("/api/v1/financial/ledger/nao-existe").status_code == 404
+
+
+def test_bulk_transactions_modes(session: Session, client: TestClient):
+    session.add(
+        Appointment(
+            id="a1", patient_id="p1", date="2026-07-01", time="09:00", price=90.0
+        )
+    )
+    session.commit()
+
+    def item(amount, appointment_id="a1", method="PIX"):
+        return {
+            "amount": amount,
+            "type": "INCOME",
+            "description": "Fechamento de caixa",
+            "date": "2026-07-01T18:00:00",
+            "appointment_id": appointment_id,
+            "payment_method": method,
+        }
+
+    # Tudo ou nada: um item inválido derruba o lote inteiro
+    resp = client.post(
+        "/api/v1/financial/transactions/bulk",
+        json={"mode": "atomic", "items": [item(50.0), item(40.0, method="CHEQUE")]},
+    )
+    assert resp.status_code == 422
+    assert [r["ok"] for r in resp.json()["detail"]["results"]] == [False]
+    assert session.exec(select(Transaction)).all() == []
+
+    # Melhor esforço: os válidos entram, consulta recalculada uma vez
+    resp = client.post(
+        "/api/v1/financial/transactions/bulk",
+        json={
+            "mode": "best_effort",
+            "items": [item(50.0), item(10.0, "nao-existe"), item(40.0)],
+        },
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert (data["created"], data["failed"]) == (2, 1)
+    assert data["results"][1] == {
+        "index": 1,
+        "ok": False,
+        "id": None,
+        "error": "Appointment not found",
+    }
+
+    appt = session.get(Appointment, "a1")
+    session.refresh(appt)
+    assert (appt.amount_paid, appt.payment_status) == (90.0, "PAID")
+
+    resp = client.get("/api/v1/financial/stats/daily?target_date=2026-07-01")
+    assert resp.json()["total_income"] == 90.0
+
+
+def test_bulk_atomic_rolls_back_database_errors(
+    session: Session, client: TestClient
+):
+    # O terceiro item falha no próprio banco, depois de os dois primeiros
+    # já terem sido gravados (flush) na mesma transação
+    session.exec(
+        text(
+            "CREATE TRIGGER recusa_13 BEFORE INSERT ON transactions "
+            "WHEN NEW.amount = 13 BEGIN SELECT RAISE(ABORT, 'valor recusado'); END"
+        )
+    )
+    session.commit()
+
+    def item(amount):
+        return {
+            "amount": amount,
+            "type": "INCOME",
+            "description": "Fechamento de caixa",
+            "date": "2026-07-01T18:00:00",
+            "payment_method": "PIX",
+        }
+
+    resp = client.post(
+        "/api/v1/financial/transactions/bulk",
+        json={"mode": "atomic", "items": [item(50.0), item(40.0), item(13.0)]},
+    )
+    assert resp.status_code == 422
+    assert "valor recusado" in resp.json()["detail"]["message"]
+    assert session.exec(select(Transaction)).all() == []
+    assert session.exec(select(FinancialDailyRollup)).all() == []
+
+    # Melhor esforço: só o item recusado fica de fora
+    resp = client.post(
+        "/api/v1/financial/transactions/bulk",
+        json={"mode": "best_effort", "items": [item(50.0), item(13.0), item(40.0)]},
+    )
+    assert resp.status_code == 200
+    assert [r["ok"] for r in resp.json()["results"]] == [True, False, True]
+    amounts = session.exec(select(Transaction.amount)).all()
+    assert sorted(amounts) == [40.0, 50.0]
+
+
+def test_cash_flow_timeseries(session: Session, client: TestClient):
+    # Quarta 04/03 e sexta 13/03 de 2026; nada na semana de 09/03 além disso
+    add_tx(session, 50.0, datetime(2026, 3, 4, 9, 0))
+    add_tx(session, 20.0, datetime(2026, 3, 4, 10, 0), method=PaymentMethod.CASH)
+    add_tx(session, 15.0, datetime(2026, 3, 13, 9, 0), TransactionType.EXPENSE)
+    add_tx(session, 70.0, datetime(2026, 4, 1, 9, 0))
+    session.commit()
+    rebuild_financial_rollup(session)
+
+    url = "/api/v1/financial/timeseries?start_date=2026-03-02&end_date=2026-03-22"
+    resp = client.get(url + "&granularity=week")
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "granularity": "week",
+        "buckets": ["2026-03-02", "2026-03-09", "2026-03-16"],
+        "income": [70.0, 0.0, 0.0],
+        "expense": [0.0, 15.0, 0.0],
+        "by_method": {"PIX": [50.0, 0.0, 0.0], "DINHEIRO": [20.0, 0.0, 0.0]},
+    }
+
+    resp = client.get(
+        "/api/v1/financial/timeseries?start_date=2026-02-15&end_date=2026-04-30"
+        "&granularity=month"
+    )
+    assert resp.json()["buckets"] == ["2026-02-01", "2026-03-01", "2026-04-01"]
+    assert resp.json()["income"] == [0.0, 70.0, 70.0]
+
+    resp = client.get(url + "&granularity=day")
+    assert len(resp.json()["buckets"]) == 21
+    assert resp.json()["income"][2] == 70.0
+
+
+def test_parallel_payments_do_not_lose_updates(tmp_path):
+    # Banco em arquivo: cada thread usa a sua própria conexão
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'stress.db'}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(
+            Appointment(
+                id="a1", patient_id="p1", date="2026-08-01", time="09:00", price=400.0
+            )
+        )
+        session.commit()
+
+    def new_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = new_session
+    app.dependency_overrides[get_current_user] = lambda: {"id": "admin"}
+    client = TestClient(app)
+
+    def pay(_):
+        for _ in range(5):
+            resp = client.post(
+                "/api/v1/financial/transactions",
+                json={
+                    "amount": 10.0,
+                    "type": "INCOME",
+                    "description": "Caixa",
+                    "date": "2026-08-01T10:00:00",
+                    "appointment_id": "a1",
+                    "payment_method": "PIX",
+                },
+            )
+            assert resp.status_code == 200
+
+    try:
+        # 8 caixas lançando ao mesmo tempo no mesmo atendimento
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(pay, range(8)))
+    finally:
+        app.dependency_overrides.clear()
+
+    with Session(engine) as session:
+        appt = session.get(Appointment, "a1")
+        assert appt.amount_paid == 400.0
+        assert appt.payment_status == "PAID"
+
+
+def test_receivables_aging(session: Session, client: TestClient):
+    for patient_id, name in [("p1", "Ana"), ("p2", "Bruno")]:
+        session.add(
+            Patient(
+                id=patient_id,
+                name=name,
+                cpf=f"{patient_id}-cpf",
+                birth_date="1980-01-01",
+                whatsapp="11999999999",
+                personal_income=0.0,
+                family_income=0.0,
+            )
+        )
+    # (paciente, data, preço, pago, status do pagamento)
+    for i, (patient_id, day, price, paid, status) in enumerate(
+        [
+            ("p1", "2026-06-20", 100.0, 40.0, "PARTIAL"),  # 11 dias
+            ("p1", "2026-05-01", 80.0, 0.0, "PENDING"),  # 61 dias
+            ("p1", "2026-01-10", 50.0, 0.0, "PENDING"),  # 90+
+            ("p2", "2026-05-20", 30.0, 0.0, "PENDING"),  # 42 dias
+            ("p2", "2026-06-25", 30.0, 30.0, "PAID"),  # quitado
+            ("p2", "2026-07-10", 30.0, 0.0, "PENDING"),  # futuro
+        ]
+    ):
+        session.add(
+            Appointment(
+                id=f"a{i}",
+                patient_id=patient_id,
+                date=day,
+                time="09:00",
+                price=price,
+                amount_paid=paid,
+                payment_status=status,
+            )
+        )
+    session.commit()
+
+    pages, cursor = [], None
+    while True:
+        url = "/api/v1/financial/aging?as_of=2026-07-01&limit=1"
+        resp = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert resp.status_code == 200
+        pages.append(resp.json())
+        cursor = resp.json()["next_cursor"]
+        if not cursor:
+            break
+
+    patients = [row for page in pages for row in page["patients"]]
+    assert [row["patient_id"] for row in patients] == ["p1", "p2"]
+    assert patients[0] == {
+        "patient_id": "p1",
+        "patient_name": "Ana",
+        "oldest_date": "2026-01-10",
+        "days_0_30": 60.0,
+        "days_31_60": 0.0,
+        "days_61_90": 80.0,
+        "days_90_plus": 50.0,
+        "total": 190.0,
+    }
+    assert patients[1]["days_31_60"] == 30.0
+    assert pages[0]["totals"]["total"] == 220.0
+
+
+def test_close_and_reopen_period(session: Session, client: TestClient):
+    session.add(
+        Appointment(
+            id="a1", patient_id="p1", date="2026-02-10", time="09:00", price=100.0
+        )
+    )
+    session.commit()
+    post = {
+        "amount": 60.0,
+        "type": "INCOME",
+        "description": "Consulta",
+        "date": "2026-02-10T10:00:00",
+        "appointment_id": "a1",
+        "payment_method": "PIX",
+    }
+    tx_id = client.post("/api/v1/financial/transactions", json=post).json()["id"]
+    client.post(
+        "/api/v1/financial/transactions",
+        json={**post, "date": "2026-03-02T10:00:00", "amount": 40.0},
+    )
+
+    resp = client.post("/api/v1/financial/periods/2026-02/close")
+    assert resp.status_code == 200
+    assert (resp.json()["status"], resp.json()["transaction_count"]) == ("CLOSED", 1)
+    assert resp.json()["total_income"] == 60.0
+
+    # Fevereiro saiu da tabela quente, mas continua visível
+    assert tx_id not in [t.id for t in session.exec(select(Transaction)).all()]
+    assert session.get(TransactionArchive, tx_id) is not None
+    resp = client.get("/api/v1/financial/transactions?appointment_id=a1")
+    assert [t["date"][:7] for t in resp.json()] == ["2026-03", "2026-02"]
+    resp = client.get("/api/v1/financial/stats/summary?start_date=2026-02-01")
+    assert resp.json()["total_income"] == 100.0
+
+    # Mês fechado não aceita alterações
+    assert client.delete(f"/api/v1/financial/transactions/{tx_id}").status_code == 409
+    assert client.post("/api/v1/financial/transactions", json=post).status_code == 409
+    resp = client.post("/api/v1/financial/periods/2026-02/close")
+    assert resp.status_code == 409
+
+    # O recálculo completo enxerga o arquivo
+    recalculate_appointment_financials(session, "a1")
+    appt = session.get(Appointment, "a1")
+    assert (appt.amount_paid, appt.payment_status) == (100.0, "PAID")
+
+    # Reabrir devolve as linhas e libera a edição
+    resp = client.post("/api/v1/financial/periods/2026-02/reopen")
+    assert resp.json()["status"] == "OPEN"
+    assert client.delete(f"/api/v1/financial/transactions/{tx_id}").status_code == 200
+    assert session.exec(select(TransactionArchive)).all() == []
+
+    # Mês corrente (ou futuro) ainda não terminou
+    current = f"{date.today():%Y-%m}"
+    resp = client.post(f"/api/v1/financial/periods/{current}/close")
+    assert resp.status_code == 409
+
+    # Só administradores fecham ou reabrem
+    app.dependency_overrides[get_current_user] = lambda: {
+        "id": "staff",
+        "role": "STAFF",
+        "name": "Recepção",
+    }
+    assert client.post("/api/v1/financial/periods/2026-01/close").status_code == 403
+    assert client.post("/api/v1/financial/periods/2026-02/reopen").status_code == 403
@@ -67,3 +67,36 @@ def test_recalc_partial_payment(session: Session):
 
     # "O Status mudou para PARCIAL?"
     assert appt.payment_status == "PARTIAL"
+
+
+def test_recalc_runs_in_callers_transaction(session: Session):
+    # Pagamento e estorno: o saldo vem de uma única soma no banco
+    session.add(
+        Appointment(
+            id="app2", patient_id="p1", date="2023-01-01", time="11:00", price=80.0
+        )
+    )
+    for amount, tx_type in [
+        (80.0, TransactionType.INCOME),
+        (30.0, TransactionType.EXPENSE),
+    ]:
+        session.add(
+            Transaction(
+                amount=amount,
+                type=tx_type,
+                payment_method=PaymentMethod.CASH,
+                date=datetime(2023, 1, 1, 11, 0),
+                description="Movimento",
+                appointment_id="app2",
+            )
+        )
+
+    # Sem commit prévio: a recalculação enxerga o que ainda não foi gravado
+    recalculate_appointment_financials(session, "app2")
+    appt = session.get(Appointment, "app2")
+    assert appt.amount_paid == 50.0
+    assert appt.payment_status == "PARTIAL"
+
+    # E não faz commit sozinha: quem chama decide
+    session.rollback()
+    assert session.get(Appointment, "app2") is None
@@ -0,0 +1,180 @@
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select, text
+from sqlmodel.pool import StaticPool
+
+from app.api.deps import get_session
+from app.core.config import settings
+from app.main import app
+from app.models.appointment_model import Appointment
+from app.models.patient_model import Patient
+from app.models.reminder_model import ReminderOutbox, ReminderStatus
+from app.services.reminder_service import (FileTransport, ReminderService,
+                                           StubTransport, retry_delay)
+
+DAY = date(2026, 3, 3)
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(
+            Patient(
+                id="p1",
+                name="Maria Silva",
+                cpf="111",
+                birth_date="1980-01-01",
+                whatsapp="11999990000",
+                personal_income=0,
+                family_income=0,
+            )
+        )
+        for appt_id, day, time, status in [
+            ("r1", "2026-03-03", "09:00", "scheduled"),
+            ("r2", "2026-03-03", "10:00", "not_started"),
+            ("r3", "2026-03-03", "11:00", "confirmed"),  # Já confirmou
+            ("r4", "2026-03-03", "12:00", "cancelled"),
+            ("r5", "2026-03-04", "09:00", "scheduled"),  # Outro dia
+        ]:
+            session.add(
+                Appointment(
+                    id=appt_id, patient_id="p1", date=day, time=time, status=status
+                )
+            )
+        session.commit()
+        yield session
+
+
+def test_enqueue_is_idempotent_and_dispatch_sends(session: Session):
+    assert ReminderService.enqueue(session, DAY) == 2
+    assert ReminderService.enqueue(session, DAY) == 0  # Nova varredura
+
+    reminder = session.exec(
+        select(ReminderOutbox).where(ReminderOutbox.appointment_id == "r1")
+    ).one()
+    assert reminder.recipient == "11999990000"
+    assert "Maria!" in reminder.message
+    assert "03/03 às 09:00" in reminder.message
+    assert reminder.message.endswith("/confirmar-consulta/r1")
+
+    # Paciente confirmou r2 antes do envio: lembrete descartado
+    session.get(Appointment, "r2").status = "confirmed"
+    session.commit()
+
+    transport = StubTransport()
+    counts = ReminderService.dispatch(session, transport, batch_size=10)
+    assert counts == {"sent": 1, "retry": 0, "failed": 0, "skipped": 1}
+    assert [r.appointment_id for r in transport.sent] == ["r1"]
+    reminders = session.exec(select(ReminderOutbox)).all()
+    statuses = {r.appointment_id: r.status for r in reminders}
+    assert statuses == {"r1": ReminderStatus.SENT, "r2": ReminderStatus.SKIPPED}
+
+    # Nada mais pendente
+    assert ReminderService.dispatch(session, transport)["sent"] == 0
+
+
+def test_dispatch_batches_and_backs_off(session: Session, tmp_path):
+    ReminderService.enqueue(session, DAY)
+    now = datetime.now() + timedelta(minutes=1)
+
+    # Lote de 1: o segundo fica para a próxima rodada
+    failing = StubTransport(fail=RuntimeError("gateway offline"))
+    counts = ReminderService.dispatch(session, failing, now=now, batch_size=1)
+    assert counts["retry"] == 1
+    failed = session.exec(
+        select(ReminderOutbox).where(ReminderOutbox.attempts == 1)
+    ).one()
+    assert failed.status == ReminderStatus.PENDING
+    assert failed.next_attempt_at == now + retry_delay(1)
+    assert failed.last_error == "gateway offline"
+    assert retry_delay(3) == 4 * retry_delay(1)
+
+    # Dentro do backoff só o outro lembrete está pronto
+    path = tmp_path / "reminders.ndjson"
+    counts = ReminderService.dispatch(session, FileTransport(str(path)), now=now)
+    assert counts["sent"] == 1
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 1 and lines[0]["to"] == "11999990000"
+
+    # Falha até o limite de tentativas
+    later = now
+    for _ in range(10):
+        later += timedelta(days=1)
+        ReminderService.dispatch(session, failing, now=later)
+    session.refresh(failed)
+    assert failed.status == ReminderStatus.FAILED
+    assert failed.attempts == 5
+
+
+def test_dispatch_rate_is_shared_by_workers(session: Session, monkeypatch):
+    from app.services import reminder_service
+    from app.services.reminder_service import ReminderTransport
+
+    # Transporte sem send() não pode ser instanciado
+    with pytest.raises(TypeError):
+        ReminderTransport()
+
+    monkeypatch.setattr(reminder_service, "engine", session.get_bind())
+    monkeypatch.setattr(settings, "REMINDER_TRANSPORT", "stub")
+    monkeypatch.setattr(settings, "REMINDER_BATCH_SIZE", 1)
+    ReminderService.enqueue(session, DAY)
+
+    # Quatro workers disparam no mesmo minuto: só um lote sai
+    now = datetime.now() + timedelta(minutes=1)
+    for _ in range(4):
+        ReminderService.run_dispatch(now)
+
+    def sent():
+        session.expire_all()
+        return session.exec(
+            select(ReminderOutbox).where(ReminderOutbox.status == ReminderStatus.SENT)
+        ).all()
+
+    assert len(sent()) == 1
+
+    # Passado o intervalo, o próximo lote é liberado
+    interval = timedelta(seconds=settings.REMINDER_DISPATCH_SECONDS)
+    ReminderService.run_dispatch(now + interval)
+    assert len(sent()) == 2
+
+
+def test_deleted_appointment_drops_its_reminders(session: Session):
+    ReminderService.enqueue(session, DAY)
+    session.exec(text("PRAGMA foreign_keys=ON"))
+
+    app.dependency_overrides[get_session] = lambda: session
+    try:
+        resp = TestClient(app).delete("/api/v1/appointments/r1")
+    finally:
+        app.dependency_overrides.clear()
+    assert resp.status_code == 204
+    remaining = session.exec(select(ReminderOutbox.appointment_id)).all()
+    assert remaining == ["r2"]
+
+
+def test_dispatch_skips_orphaned_reminders(session: Session):
+    ReminderService.enqueue(session, DAY)
+    # Linha órfã (gravada antes de a exclusão limpar a fila)
+    session.exec(text("DELETE FROM appointments WHERE id = 'r1'"))
+    session.commit()
+
+    transport = StubTransport()
+    counts = ReminderService.dispatch(session, transport, batch_size=10)
+    assert counts == {"sent": 1, "retry": 0, "failed": 0, "skipped": 1}
+    orphan = session.exec(
+        select(ReminderOutbox).where(ReminderOutbox.appointment_id == "r1")
+    ).one()
+    assert orphan.status == ReminderStatus.SKIPPED
+
+    # Resolvida: não volta a ser reivindicada depois do lease
+    later = datetime.now() + timedelta(hours=1)
+    assert ReminderService.dispatch(session, transport, now=later)["skipped"] == 0
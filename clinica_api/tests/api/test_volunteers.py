@@ -60,3 +60,90 @@ def test_create_volunteer_api(session: Session, client: TestClient):
     vol_db = session.get(Volunteer, data["id"])
     assert vol_db is not None
     assert vol_db.email == "dra.api@teste.com"
+
+
+def test_volunteer_slots_subtract_bookings(session: Session, client: TestClient):
+    from app.models.appointment_model import Appointment
+    from app.models.volunteer_model import Volunteer
+    # Segunda de manhã e Quarta à tarde, consultas de 60 minutos
+    for vol_id, name, availability in [
+        (
+            "v1",
+            "Dra. Ana",
+            [
+                {"day": "Segunda", "start": "08:00", "end": "12:00"},
+                {"day": "Quarta", "start": "14:00", "end": "16:00"},
+            ],
+        ),
+        (
+            "v2",
+            "Dr. Bruno",
+            [{"day": "segunda-feira", "start": "10:00", "end": "11:00"}],
+        ),
+    ]:
+        session.add(
+            Volunteer(
+                id=vol_id,
+                name=name,
+                email=f"{vol_id}@teste.com",
+                password="123",
+                birth_date="1990-01-01",
+                phone="11999999999",
+                specialty="Cardio",
+                license_number="CRM",
+                availability=availability,
+            )
+        )
+    # 09:30 ocupa os slots das 09:00 e das 10:00; o cancelado libera o das 11:00
+    session.add(
+        Appointment(
+            id="a1", patient_id="p1", volunteer_id="v1", date="2026-03-02", time="09:30"
+        )
+    )
+    session.add(
+        Appointment(
+            id="a2",
+            patient_id="p1",
+            volunteer_id="v1",
+            date="2026-03-02",
+            time="11:00",
+            status="cancelled",
+        )
+    )
+    session.commit()
+
+    resp = client.get("/api/v1/volunteers/v1/slots?from=2026-03-01&to=2026-03-04")
+    assert resp.status_code == 200
+    days = {d["date"]: d["slots"] for d in resp.json()["days"]}
+    assert days == {
+        "2026-03-01": [],
+        "2026-03-02": ["08:00", "11:00"],
+        "2026-03-03": [],
+        "2026-03-04": ["14:00", "15:00"],
+    }
+
+    # Novo agendamento invalida o cache daquele dia
+    payload = {
+        "patient_id": "p2",
+        "volunteer_id": "v1",
+        "date": "2026-03-02",
+        "time": "08:00",
+    }
+    assert client.post("/api/v1/appointments/", json=payload).status_code == 200
+    resp = client.get("/api/v1/volunteers/v1/slots?from=2026-03-02&to=2026-03-02")
+    assert resp.json()["days"][0]["slots"] == ["11:00"]
+
+    # Variante por especialidade: todos os voluntários ativos
+    resp = client.get(
+        "/api/v1/volunteers/slots?specialty=Cardio&from=2026-03-02&to=2026-03-02"
+    )
+    assert resp.status_code == 200
+    assert {v["volunteer_id"]: v["days"][0]["slots"] for v in resp.json()} == {
+        "v1": ["11:00"],
+        "v2": ["10:00"],
+    }
+
+    url = "/api/v1/volunteers/{}/slots?from={}&to={}"
+    assert client.get(url.format("v1", "2026-03-04", "2026-03-01")).status_code == 400
+    assert client.get(url.format("v1", "2026-01-01", "2026-12-31")).status_code == 400
+    assert client.get(url.format("nope", "2026-03-01", "2026-03-01")).status_code == 404
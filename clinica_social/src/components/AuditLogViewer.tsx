@@ -9,7 +9,7 @@ interface AuditLog {
     user_name: string;
     action: string;
     resource: string;
-    details: string;
+    details: { path?: string; status?: number; changes?: string[]; [key: string]: any } | string | null;
     timestamp: string;
     ip_address: string;
 }
@@ -71,9 +71,18 @@ const AuditLogViewer: React.FC = () => {
     const formatDetails = (log: AuditLog) => {
         const { action, details, resource } = log;
         try {
-            // Try to parse if it looks like JSON
-            if (details && (details.startsWith('{') || details.startsWith('['))) {
-                const parsed = JSON.parse(details);
+            // Structured details (object) or legacy JSON string
+            const parsed = details && typeof details === 'object'
+                ? details
+                : (details && (details.startsWith('{') || details.startsWith('[')) ? JSON.parse(details) : null);
+
+            // Middleware access logs: { path, status }
+            if (parsed && parsed.path) {
+                if (action === 'GET') return `Visualizou dados de ${resource}`;
+                return `Acesso em ${resource}`;
+            }
+
+            if (parsed) {
                 const name = parsed.name || 'Item';
 
                 if (action === 'POST' || action === 'CREATE') {
@@ -102,14 +111,14 @@ const AuditLogViewer: React.FC = () => {
             }
 
             // Clean up "Path: ..." logs (Middleware natural logs)
-            if (details && details.startsWith('Path:')) {
+            if (typeof details === 'string' && details.startsWith('Path:')) {
                 if (action === 'GET') return `Visualizou dados de ${resource}`;
                 return `Acesso em ${resource}`;
             }
 
-            return details || '-';
+            return (details as string) || '-';
         } catch (e) {
-            return details;
+            return String(details);
         }
     };
 
@@ -1,5 +1,6 @@
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef, useCallback } from 'react';
+import { format, startOfMonth, endOfMonth, addMonths } from 'date-fns';
 import Sidebar from '../components/organisms/Sidebar';
 import Dashboard from './Dashboard';
 import PatientManagement from './PatientManagement';
@@ -20,29 +21,53 @@ const AdminApp: React.FC = () => {
   const [volunteers, setVolunteers] = useState<Volunteer[]>(MOCK_VOLUNTEERS);
   const [appointments, setAppointments] = useState<Appointment[]>(MOCK_APPOINTMENTS);
 
+  // Months ('yyyy-MM') already fetched; the agenda asks for more as it is navigated
+  const loadedMonths = useRef<Set<string>>(new Set());
+
+  const loadAppointmentMonth = useCallback(async (day: Date) => {
+    const month = format(day, 'yyyy-MM');
+    if (loadedMonths.current.has(month)) return;
+    loadedMonths.current.add(month);
+    try {
+      const page = await api.getAppointments({
+        from: format(startOfMonth(day), 'yyyy-MM-dd'),
+        to: format(endOfMonth(day), 'yyyy-MM-dd'),
+      });
+      setAppointments(current => {
+        const ids = new Set(page.map(a => a.id));
+        return [...current.filter(a => !ids.has(a.id)), ...page];
+      });
+    } catch (error) {
+      loadedMonths.current.delete(month);
+      console.error('Falha ao carregar consultas:', error);
+    }
+  }, []);
+
   // Load data from API
   useEffect(() => {
     const loadData = async () => {
       try {
-        const [p, v, a] = await Promise.all([
+        const [p, v] = await Promise.all([
           api.getPatients(),
-          api.getVolunteers(),
-          api.getAppointments()
+          api.getVolunteers()
         ]);
         setPatients(p);
         setVolunteers(v);
-        setAppointments(a);
       } catch (error) {
         console.error('Falha ao carregar dados:', error);
       }
     };
     loadData();
+    // Current and next month: today's list and the upcoming appointments
+    setAppointments([]);
+    loadAppointmentMonth(new Date());
+    loadAppointmentMonth(addMonths(new Date(), 1));
 
     const savedUser = localStorage.getItem('clinic_user');
     if (savedUser) {
       setUser(JSON.parse(savedUser));
     }
-  }, []);
+  }, [loadAppointmentMonth]);
 
   const handleLogin = (userData: User) => {
     setUser(userData);
@@ -71,7 +96,7 @@ const AdminApp: React.FC = () => {
 
     switch (currentView) {
       case 'dashboard':
-        return <Dashboard patients={patients} volunteers={volunteers} appointments={filteredAppointments} />;
+        return <Dashboard patients={patients} volunteers={volunteers} appointments={filteredAppointments} onDateChange={loadAppointmentMonth} />;
       case 'patients':
         return <PatientManagement patients={patients} onAddPatient={handleAddPatient} />;
       case 'volunteers':
@@ -92,6 +117,7 @@ const AdminApp: React.FC = () => {
             onAddAppointment={handleAddAppointment}
             onUpdateAppointment={(updated) => setAppointments(appointments.map(a => a.id === updated.id ? updated : a))}
             onDeleteAppointment={(id) => setAppointments(appointments.filter(a => a.id !== id))}
+            onMonthChange={loadAppointmentMonth}
           />
         );
       case 'financial':
@@ -101,7 +127,7 @@ const AdminApp: React.FC = () => {
       case 'settings':
         return <AdminSettings currentUser={user} />;
       default:
-        return <Dashboard patients={patients} volunteers={volunteers} appointments={filteredAppointments} />;
+        return <Dashboard patients={patients} volunteers={volunteers} appointments={filteredAppointments} onDateChange={loadAppointmentMonth} />;
     }
   };
 
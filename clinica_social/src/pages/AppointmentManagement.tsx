@@ -12,9 +12,11 @@ interface AppointmentManagementProps {
   onAddAppointment: (appointment: Appointment) => void;
   onUpdateAppointment: (appointment: Appointment) => void;
   onDeleteAppointment: (id: string) => void;
+  // Asks the parent to load the appointments of the month shown
+  onMonthChange?: (day: Date) => void;
 }
 
-const AppointmentManagement: React.FC<AppointmentManagementProps> = ({ appointments, patients, volunteers, onAddAppointment, onUpdateAppointment, onDeleteAppointment }) => {
+const AppointmentManagement: React.FC<AppointmentManagementProps> = ({ appointments, patients, volunteers, onAddAppointment, onUpdateAppointment, onDeleteAppointment, onMonthChange }) => {
   // Selection State
   const [selectedVolunteer, setSelectedVolunteer] = useState<Volunteer | null>(null);
   const [selectedDate, setSelectedDate] = useState<Date | null>(null);
@@ -34,6 +36,15 @@ const AppointmentManagement: React.FC<AppointmentManagementProps> = ({ appointme
   // Calendar State
   const [currentMonth, setCurrentMonth] = useState(new Date());
 
+  // Appointments are loaded per month: fetch the one on screen (or searched)
+  useEffect(() => {
+    onMonthChange?.(currentMonth);
+  }, [currentMonth, onMonthChange]);
+
+  useEffect(() => {
+    if (searchDate) onMonthChange?.(parse(searchDate, 'yyyy-MM-dd', new Date()));
+  }, [searchDate, onMonthChange]);
+
   // Data & Loading State
   const [paymentTables, setPaymentTables] = useState<PaymentTable[]>([]);
   const [loading, setLoading] = useState(false);
@@ -11,9 +11,11 @@ interface DashboardProps {
   patients: Patient[];
   volunteers: Volunteer[];
   appointments: Appointment[];
+  // Asks the parent to load the month of the date being shown
+  onDateChange?: (day: Date) => void;
 }
 
-const Dashboard: React.FC<DashboardProps> = ({ patients, volunteers, appointments }) => {
+const Dashboard: React.FC<DashboardProps> = ({ patients, volunteers, appointments, onDateChange }) => {
   const [briefing, setBriefing] = useState<string>('Carregando mensagem do dia...');
   const [specialtiesCount, setSpecialtiesCount] = useState<number>(0);
   const [financialStats, setFinancialStats] = useState<any>(null);
@@ -29,6 +31,10 @@ const Dashboard: React.FC<DashboardProps> = ({ patients, volunteers, appointment
   const today = format(new Date(), 'yyyy-MM-dd');
   const todayAppointments = appointments.filter(app => app.date === today);
 
+  useEffect(() => {
+    onDateChange?.(new Date(`${appointmentsDate}T00:00:00`));
+  }, [appointmentsDate, onDateChange]);
+
   // Filtered list for display
   const displayAppointments = appointments.filter(app => app.date === appointmentsDate && app.volunteer_id);
 
@@ -308,10 +308,15 @@ const Reports: React.FC<ReportsProps> = ({ patients, volunteers, appointments, c
         let title = '';
         let columns: { header: string, dataKey: string }[] = [];
 
+        // The agenda only holds the months it has shown: fetch the report period
+        const source = dateRange.start || dateRange.end
+            ? await api.getAppointments({ from: dateRange.start || undefined, to: dateRange.end || undefined })
+            : appointments;
+
         if (apptReportType === 'daily_specialty') {
             title = 'Relatório de Consultas - Quantitativo por Especialidade';
 
-            const filtered = appointments.filter(a => {
+            const filtered = source.filter(a => {
                 if (['cancelled'].includes(a.status)) return false;
                 if (dateRange.start && a.date < dateRange.start) return false;
                 if (dateRange.end && a.date > dateRange.end) return false;
@@ -340,7 +345,7 @@ const Reports: React.FC<ReportsProps> = ({ patients, volunteers, appointments, c
             ];
 
         } else if (apptReportType === 'scheduled' || apptReportType === 'completed') {
-            data = appointments.filter(a => {
+            data = source.filter(a => {
                 const statusMatch = apptReportType === 'scheduled'
                     ? ['scheduled', 'not_started'].includes(a.status)
                     : ['completed', 'finished'].includes(a.status);
@@ -170,6 +170,18 @@ export const api = {
         if (!response.ok) throw new Error('Failed to update volunteer');
         return await response.json();
     },
+    getVolunteerSlots: async (volunteerId: string, from: string, to: string): Promise<import('../types').VolunteerSlots> => {
+        const params = new URLSearchParams({ from, to });
+        const response = await fetch(`${API_BASE}/volunteers/${volunteerId}/slots?${params}`);
+        if (!response.ok) throw new Error('Failed to fetch volunteer slots');
+        return await response.json();
+    },
+    getSlotsBySpecialty: async (specialty: string, from: string, to: string): Promise<import('../types').VolunteerSlots[]> => {
+        const params = new URLSearchParams({ specialty, from, to });
+        const response = await fetch(`${API_BASE}/volunteers/slots?${params}`);
+        if (!response.ok) throw new Error('Failed to fetch slots');
+        return await response.json();
+    },
     deleteVolunteer: async (id: string) => {
         const token = localStorage.getItem('@ClinicaSocial:token');
         const response = await fetch(`${API_BASE}/volunteers/${id}`, {
@@ -178,15 +190,29 @@ export const api = {
         });
         if (!response.ok) throw new Error('Failed to delete volunteer');
     },
-    getAppointments: async (filters?: { volunteer_id?: string, patient_id?: string, date?: string }): Promise<import('../types').Appointment[]> => {
+    getAppointments: async (filters?: { volunteer_id?: string, patient_id?: string, date?: string, from?: string, to?: string, status?: string[] }): Promise<import('../types').Appointment[]> => {
         const params = new URLSearchParams();
         if (filters?.volunteer_id) params.append('volunteer_id', filters.volunteer_id);
         if (filters?.patient_id) params.append('patient_id', filters.patient_id);
         if (filters?.date) params.append('date', filters.date);
+        if (filters?.from) params.append('from', filters.from);
+        if (filters?.to) params.append('to', filters.to);
+        filters?.status?.forEach(s => params.append('status', s));
 
-        const response = await fetch(`${API_BASE}/appointments/?${params}`);
-        if (!response.ok) throw new Error('Failed to fetch appointments');
-        return await response.json();
+        // Listing is paginated: follow X-Next-Cursor until the last page.
+        // Always scope the call (from/to window, patient or date); the agenda
+        // loads one month at a time as it is navigated.
+        const appointments: import('../types').Appointment[] = [];
+        let cursor: string | null = null;
+        do {
+            const pageParams = new URLSearchParams(params);
+            if (cursor) pageParams.set('cursor', cursor);
+            const response = await fetch(`${API_BASE}/appointments/?${pageParams}`);
+            if (!response.ok) throw new Error('Failed to fetch appointments');
+            appointments.push(...await response.json());
+            cursor = response.headers.get('X-Next-Cursor');
+        } while (cursor);
+        return appointments;
     },
     createAppointment: async (appointment: Omit<import('../types').Appointment, 'id'>) => {
         const response = await fetch(`${API_BASE}/appointments/`, {
@@ -214,6 +240,69 @@ export const api = {
         });
         if (!response.ok) throw new Error('Failed to delete appointment');
     },
+    getCalendar: async (from: string, to: string, volunteerId?: string): Promise<import('../types').AppointmentCalendar> => {
+        const params = new URLSearchParams({ from, to });
+        if (volunteerId) params.append('volunteer_id', volunteerId);
+        // Served with an ETag + no-cache: the browser revalidates and reuses
+        // its cached copy when the week did not change (304)
+        const response = await fetch(`${API_BASE}/appointments/calendar?${params}`);
+        if (!response.ok) throw new Error('Failed to fetch calendar');
+        return await response.json();
+    },
+    getDailyAppointmentSummary: async (from: string, to: string, volunteerId?: string): Promise<import('../types').AppointmentDaySummary[]> => {
+        const params = new URLSearchParams({ from, to });
+        if (volunteerId) params.append('volunteer_id', volunteerId);
+        // Closed days only: filled by the nightly day close
+        const response = await fetch(`${API_BASE}/stats/appointments/daily?${params}`);
+        if (!response.ok) throw new Error('Failed to fetch appointment summary');
+        return await response.json();
+    },
+    createAppointmentSeries: async (series: import('../types').AppointmentSeriesCreate): Promise<import('../types').AppointmentSeries> => {
+        const response = await fetch(`${API_BASE}/appointments/series`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(series),
+        });
+        if (!response.ok) {
+            const error = await response.json().catch(() => ({}));
+            throw new Error(error.detail || 'Failed to create appointment series');
+        }
+        return await response.json();
+    },
+    updateAppointmentSeries: async (seriesId: string, changes: { volunteer_id?: string, time?: string, duration?: number, notes?: string, price?: number }, fromDate?: string): Promise<import('../types').AppointmentSeries> => {
+        const params = fromDate ? `?${new URLSearchParams({ from_date: fromDate })}` : '';
+        const response = await fetch(`${API_BASE}/appointments/series/${seriesId}${params}`, {
+            method: 'PUT',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(changes),
+        });
+        if (!response.ok) {
+            const error = await response.json().catch(() => ({}));
+            throw new Error(error.detail || 'Failed to update appointment series');
+        }
+        return await response.json();
+    },
+    cancelAppointmentSeries: async (seriesId: string, fromDate?: string): Promise<import('../types').AppointmentSeries> => {
+        const params = fromDate ? `?${new URLSearchParams({ from_date: fromDate })}` : '';
+        const response = await fetch(`${API_BASE}/appointments/series/${seriesId}/cancel${params}`, {
+            method: 'POST',
+        });
+        if (!response.ok) throw new Error('Failed to cancel appointment series');
+        return await response.json();
+    },
+    bulkUpdateAppointmentStatus: async (payload: import('../types').BulkStatusUpdate): Promise<import('../types').BulkStatusResult> => {
+        const token = localStorage.getItem('@ClinicaSocial:token');
+        const response = await fetch(`${API_BASE}/appointments/bulk-status`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Authorization': `Bearer ${token}`
+            },
+            body: JSON.stringify(payload),
+        });
+        if (!response.ok) throw new Error('Failed to update appointments');
+        return await response.json();
+    },
     confirmAppointment: async (id: string) => {
         const response = await fetch(`${API_BASE}/public/appointments/${id}/confirm`, {
             method: 'POST',
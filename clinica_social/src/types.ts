@@ -96,6 +96,19 @@ export interface Volunteer {
   lgpd_consent_date?: string;
 }
 
+export interface SlotDay {
+  date: string; // YYYY-MM-DD
+  slots: string[]; // Free start times, HH:mm
+}
+
+export interface VolunteerSlots {
+  volunteer_id: string;
+  volunteer_name: string;
+  specialty: string;
+  appointment_duration: number;
+  days: SlotDay[];
+}
+
 // Financial
 export enum TransactionType {
   INCOME = "INCOME",
@@ -134,6 +147,11 @@ export interface Appointment {
   volunteer_id: string;
   date: string;
   time: string;
+  duration?: number; // Minutes; defaults to the volunteer's appointment_duration
+  end_time?: string;
+  starts_at?: string; // ISO timestamp (date + time)
+  ends_at?: string;
+  series_id?: string;
   status: AppointmentStatus;
   notes?: string;
   price?: number;
@@ -143,6 +161,78 @@ export interface Appointment {
 
 
 
+export interface RecurrenceRule {
+  frequency: 'daily' | 'weekly' | 'monthly';
+  interval?: number;
+  weekdays?: number[]; // 0 = Monday ... 6 = Sunday
+  count?: number;
+  until?: string; // YYYY-MM-DD, inclusive
+}
+
+export interface AppointmentSeriesCreate {
+  patient_id: string;
+  volunteer_id?: string;
+  start_date: string;
+  time: string;
+  duration?: number;
+  notes?: string;
+  price?: number;
+  rule: RecurrenceRule;
+  skip_conflicts?: boolean;
+}
+
+export interface AppointmentSeries {
+  series_id: string;
+  appointments: Appointment[];
+  skipped: string[];
+}
+
+export interface CalendarAppointment {
+  id: string;
+  time: string;
+  end_time?: string;
+  status: AppointmentStatus;
+  patient_id: string;
+  patient_name?: string;
+  payment_status?: 'PENDING' | 'PARTIAL' | 'PAID';
+  series_id?: string;
+}
+
+export interface CalendarVolunteer {
+  volunteer_id?: string;
+  volunteer_name?: string;
+  specialty?: string;
+  appointments: CalendarAppointment[];
+}
+
+export interface AppointmentCalendar {
+  start: string;
+  end: string;
+  days: { date: string; volunteers: CalendarVolunteer[] }[];
+}
+
+export interface AppointmentDaySummary {
+  date: string;
+  total: number;
+  by_status: Record<string, number>;
+}
+
+export interface BulkStatusUpdate {
+  status: string;
+  ids?: string[];
+  volunteer_id?: string;
+  date?: string;
+  from_statuses?: string[];
+  include_paid?: boolean;
+  reason?: string;
+}
+
+export interface BulkStatusResult {
+  status: string;
+  updated_ids: string[];
+  skipped_paid_ids: string[];
+}
+
 export interface PaymentTable {
   id: string;
   name: string;